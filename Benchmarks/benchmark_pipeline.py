@@ -0,0 +1,188 @@
+import argparse
+import functools
+import os
+import sys
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [os.path.join(ROOT, 'src'), os.path.join(ROOT, 'Unittest')]
+from benchmarking import compare_with_baseline, load_results, run_case, save_results
+from create_synthetic_data import ProteinVariantGenerator
+from data_processing import DataOutliers, MeanAndStd
+from numerical_representation import AMINO_ACIDS, OneHotEncoding
+
+REPLICATES = ['rep_1', 'rep_2', 'rep_3']
+BENCHMARKS = ('synthetic_data', 'one_hot', 'one_hot_batch', 'outliers', 'mean_and_std', 'esm1v', 'prott5')
+SEQUENCE_BENCHMARKS = ('one_hot', 'one_hot_batch')
+ENCODER_BENCHMARKS = ('esm1v', 'prott5')
+TABLE_BENCHMARKS = ('outliers', 'mean_and_std')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def random_sequences(n, length, seed=0):
+    """
+    Draws random protein sequences of a fixed length.
+
+    Args:
+        n (int): Number of sequences.
+        length (int): Number of residues of each sequence.
+        seed (int): Seed of the generator.
+
+    Returns:
+        list of str: The sequences.
+    """
+    letters = np.frombuffer(AMINO_ACIDS.encode('ascii'), dtype=np.uint8)
+    residues = letters[np.random.default_rng(seed).integers(0, len(letters), size=(n, length))]
+    return [row.tobytes().decode('ascii') for row in residues]
+
+
+def replicate_table(n, seed=0):
+    """
+    Builds a synthetic variant table with three noisy replicate columns of the log fitness.
+    """
+    data = ProteinVariantGenerator(seed=seed).generate_data_frame(n, batched=True)
+    rng = np.random.default_rng(seed)
+    for column in REPLICATES:
+        data[column] = data['Log_fitness'] + rng.normal(scale=0.5, size=n)
+    return data
+
+
+@functools.lru_cache(maxsize=None)
+def tiny_encoder(name):
+    """
+    Builds an encoder around a small randomly initialised model, so the benchmark runs offline on CPU.
+    """
+    from numerical_representation import Esm1v_Encoding, Prott5Encoding
+    from tiny_models import tiny_esm1v, tiny_prott5
+
+    if name == 'esm1v':
+        model, alphabet = tiny_esm1v()
+        return Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet, model_id='tiny-esm1v')
+    model, tokenizer = tiny_prott5()
+    return Prott5Encoding(device='cpu', model=model, tokenizer=tokenizer, model_id='tiny-prott5')
+
+
+def build_case(benchmark, size, length, max_tokens=4096):
+    """
+    Prepares the inputs of a benchmark case outside of the timed region.
+
+    Args:
+        benchmark (str): Name of the benchmark, from BENCHMARKS.
+        size (int): Number of rows or sequences.
+        length (int or None): Sequence length (the position range of the synthetic variants).
+        max_tokens (int): Token budget of the encoder batches.
+
+    Returns:
+        tuple: (func, n_items, n_residues), where func runs the case once.
+    """
+    if benchmark == 'synthetic_data':
+        generator = ProteinVariantGenerator(seed=0, position_range=(1, length))
+        return functools.partial(generator.generate_data_frame, size, batched=True), size, None
+    if benchmark in TABLE_BENCHMARKS:
+        data = replicate_table(size)
+        if benchmark == 'outliers':
+            return functools.partial(DataOutliers(data).detect_outliers, REPLICATES), size, None
+        return functools.partial(MeanAndStd(data).get_mean_and_std, REPLICATES), size, None
+
+    sequences = random_sequences(size, length)
+    if benchmark == 'one_hot':
+        # One sequence per call, as in the CLI; the vectors are dropped so that memory stays per call.
+        encoder = OneHotEncoding()
+
+        def encode_each():
+            for sequence in sequences:
+                encoder.encode(sequence)
+        return encode_each, size, size * length
+    if benchmark == 'one_hot_batch':
+        return functools.partial(OneHotEncoding().encode_batch, sequences), size, size * length
+    if benchmark == 'esm1v':
+        embed = tiny_encoder('esm1v').calculate_esm1v_embeddings
+    elif benchmark == 'prott5':
+        embed = tiny_encoder('prott5').calculate_prott5_embeddings
+    else:
+        raise ValueError(f'Unknown benchmark {benchmark!r}. Choose from {", ".join(BENCHMARKS)}.')
+    return functools.partial(embed, sequences, max_tokens=max_tokens), size, size * length
+
+
+def run_benchmarks(benchmarks=BENCHMARKS, sizes=(10000, 100000, 1000000), sequence_sizes=(1000, 10000),
+                   encoder_sizes=(16, 64), lengths=(100, 500), repeats=3, max_tokens=4096, verbose=True):
+    """
+    Runs every benchmark over the grid of dataset sizes and sequence lengths.
+
+    Each stage has its own range of dataset sizes: table rows for the synthetic data, outlier and
+    replicate statistics benchmarks, and numbers of sequences for the one-hot and language model
+    encoders. The outlier and replicate statistics benchmarks do not depend on the sequence length.
+
+    Args:
+        benchmarks (iterable of str): Benchmarks to run, from BENCHMARKS.
+        sizes (iterable of int): Numbers of rows of the synthetic data, outliers and mean_and_std benchmarks.
+        sequence_sizes (iterable of int): Numbers of sequences of the one-hot benchmarks.
+        encoder_sizes (iterable of int): Numbers of sequences of the esm1v and prott5 benchmarks.
+        lengths (iterable of int): Sequence lengths.
+        repeats (int): Timed runs per case, the fastest is kept.
+        max_tokens (int): Token budget of the encoder batches.
+        verbose (bool): Print each case as it completes.
+
+    Returns:
+        list of dict: One result per case, see `benchmarking.run_case`.
+    """
+    results = []
+    for benchmark in benchmarks:
+        grid_sizes = (encoder_sizes if benchmark in ENCODER_BENCHMARKS else
+                      sequence_sizes if benchmark in SEQUENCE_BENCHMARKS else sizes)
+        grid_lengths = [None] if benchmark in TABLE_BENCHMARKS else lengths
+        for size in grid_sizes:
+            for length in grid_lengths:
+                func, n_items, n_residues = build_case(benchmark, size, length, max_tokens)
+                result = run_case(benchmark, func, n_items, size=size, length=length, repeats=repeats,
+                                  n_residues=n_residues)
+                results.append(result)
+                if verbose:
+                    print(f'{benchmark:>15} size={size:<7} length={str(length):<5} {result["items_per_s"]:>12.1f} items/s '
+                          f'{result["peak_traced_mb"]:>9.1f} MB traced {result["rss_delta_mb"]:>9.1f} MB RSS')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the data generation, processing and encoding stages')
+    parser.add_argument('--benchmarks', type=str, nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS), help='Benchmarks to run')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='Number of rows of the table benchmarks')
+    parser.add_argument('--sequence_sizes', type=int, nargs='+', default=[1000, 10000], help='Number of sequences of the one-hot benchmarks')
+    parser.add_argument('--encoder_sizes', type=int, nargs='+', default=[16, 64], help='Number of sequences of the esm1v and prott5 benchmarks')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[100, 500], help='Sequence lengths')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per case, the fastest is kept')
+    parser.add_argument('--max_tokens', type=int, default=4096, help='Padded tokens per forward pass of the encoders')
+    parser.add_argument('--threads', type=int, default=None, help='Torch threads of the encoders (default: the torch default)')
+    parser.add_argument('--output', type=str, default=os.path.join(ROOT, 'Reports', 'benchmark_results.json'), help='JSON file receiving the results')
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE, help='JSON results the run is compared with')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='Relative throughput loss or memory growth flagged as a regression')
+    parser.add_argument('--update_baseline', action='store_true', help='Store this run as the new baseline')
+
+    args = parser.parse_args()
+
+    if args.threads is not None and any(benchmark in ENCODER_BENCHMARKS for benchmark in args.benchmarks):
+        import torch
+
+        torch.set_num_threads(args.threads)
+
+    results = run_benchmarks(args.benchmarks, args.sizes, args.sequence_sizes, args.encoder_sizes, args.lengths, args.repeats,
+                             args.max_tokens)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        regressions = compare_with_baseline(results, load_results(args.baseline), args.tolerance)
+    save_results(args.output, results, regressions, args.baseline)
+    print(f'Results saved to {args.output}')
+    if args.update_baseline:
+        save_results(args.baseline, results)
+        print(f'Baseline updated: {args.baseline}')
+
+    for regression in regressions:
+        print(f'REGRESSION {regression["benchmark"]} size={regression["size"]} length={regression["length"]}: '
+              f'{regression["metric"]} {regression["baseline"]:.4g} -> {regression["current"]:.4g} '
+              f'({regression["change"]:+.0%})')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
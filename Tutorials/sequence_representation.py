@@ -1,75 +1,428 @@
 import pandas as pd
 import numpy as np
 import argparse
-import sys 
 import h5py
+import functools
+import json
+import os
+import sys
+import time
 
 sys.path.insert(1, '/raid/data/fherrera/Protein_Engineering_Code_Center/src/')
-from numerical_representation import OneHotEncoding, IfeatproEncoding, Esm1v_Encoding, Prott5Encoding
+from numerical_representation import (DESCRIPTORS, POOLINGS, PRECISIONS, Esm1v_Encoding, ExtractionSpec, Prott5Encoding,
+                                       compare_precisions, compare_window_embeddings, get_encoder)
+from embedding_cache import EmbeddingCache
+from feature_store import FeatureStore
+from feature_writer import StreamingFeatureWriter
+from instrumentation import PROFILERS, Metrics
+from sharded_execution import ShardedEmbedder, length_balanced_shards
 
 
-def get_representations(data_file, seq_column, feature_types, output_dir):
+def stream_embeddings(output_file, name, ids, sequences, embed, block_size=1024, compression=None, embedder=None,
+                      metrics=None, attrs=None):
+    """
+    Embeds sequences block by block and streams the results into a resumable HDF5 file.
+
+    Blocks are written in input order, so the checkpoint is the number of completed rows and an
+    interrupted job resumes at the first missing row. Memory is bounded by the block size.
+
+    With an `embedder` the blocks are length-balanced shards of about `block_size` sequences,
+    embedded in its worker pool and merged back in input order.
+
+    When `embed` returns a dict of arrays, as the extraction methods do, each one is written as its
+    own `<name>_<key>` dataset.
+
+    Args:
+        output_file (str): Path of the HDF5 file.
+        name (str): Name of the feature dataset.
+        ids (list of str): Sequence IDs, stored next to the features.
+        sequences (list of str): Input sequences.
+        embed (callable): Maps a list of sequences to an (n, D) array, or to a dict of (n, D) arrays.
+        block_size (int): Number of sequences embedded and written at a time.
+        compression (str, optional): HDF5 compression filter, e.g. 'gzip' or 'lzf'.
+        embedder (ShardedEmbedder, optional): Worker pool used instead of `embed`.
+        metrics (Metrics, optional): Receives the time spent embedding and writing each block.
+        attrs (dict, optional): Encoder settings stored in `output_file`, e.g. the encoder, model id and precision.
+
+    Raises:
+        ValueError: If the rows already in `output_file` belong to different sequence IDs or were written with
+            different `attrs`.
+    """
+    with StreamingFeatureWriter(output_file, chunk_rows=min(block_size, 1024), compression=compression,
+                                attrs=attrs) as writer:
+        if writer.completed_ids() != list(ids[:writer.rows_done]):
+            raise ValueError(f'{output_file} holds rows for different sequence IDs, remove it to start over.')
+        if writer.rows_done:
+            print(f'Resuming {name} at row {writer.rows_done} of {len(sequences)}')
+
+        first = writer.rows_done
+        if embedder is None:
+            bounds = [(start, min(start + block_size, len(sequences))) for start in range(first, len(sequences), block_size)]
+            results = (embed(sequences[start:stop]) for start, stop in bounds)
+        else:
+            lengths = [len(seq) for seq in sequences[first:]]
+            bounds = [(first + start, first + stop) for start, stop in length_balanced_shards(lengths, block_size)]
+            results = embedder.imap(sequences[start:stop] for start, stop in bounds)
+
+        results = iter(results)
+        for start, stop in bounds:
+            started = time.perf_counter()
+            embeddings = next(results)
+            embedded = time.perf_counter()
+            features = ({f'{name}_{key}': values for key, values in embeddings.items()}
+                        if isinstance(embeddings, dict) else {name: embeddings})
+            writer.append(ids[start:stop], features)
+            if metrics is not None:
+                embed_s, write_s = embedded - started, time.perf_counter() - embedded
+                metrics.add(blocks=1, embed_s=embed_s, write_s=write_s)
+                metrics.emit('block', stage=name, start=start, stop=stop, embed_s=embed_s, write_s=write_s)
+
+
+def encoder_attrs(name, encoder_class, precision, spec=None, window=None, stride=None):
+    """
+    Describes how the rows of an encoder's HDF5 file are produced, so that a resumed file is checked against it.
+
+    Args:
+        name (str): Encoder name.
+        encoder_class (type): Encoder class, providing the pretrained model id and number of layers.
+        precision (str): Inference precision.
+        spec (ExtractionSpec, optional): Layers and poolings extracted instead of the last-layer mean.
+        window (int, optional): Window length of the mean embeddings. Encoders with a fixed context (esm1v) split
+            longer sequences anyway, so their window is capped at and defaults to the context.
+        stride (int, optional): Distance between window starts. Defaults to window // 2.
+
+    Returns:
+        dict: File attributes of `StreamingFeatureWriter`, with a window and stride of 0 for full-context rows.
+    """
+    context = getattr(encoder_class, 'PRETRAINED_CONTEXT', None)
+    if spec is None and context is not None:
+        window = context if window is None else min(window, context)
+    window = window if spec is None and window is not None else 0
+    stride = (stride or max(1, window // 2)) if window else 0
+    outputs = 'mean' if spec is None else ','.join(
+        spec.dataset_name(layer, pooling)
+        for layer in spec.resolve_layers(encoder_class.PRETRAINED_LAYERS) for pooling in spec.poolings)
+    return {'encoder': name, 'model_id': encoder_class.PRETRAINED_MODEL_ID, 'precision': precision, 'outputs': outputs,
+            'window': window, 'stride': stride}
+
+
+def open_feature_store(path, ids):
+    """
+    Opens the feature store of a dataset, registering its IDs when the store is new.
+
+    Args:
+        path (str): Directory of the feature store.
+        ids (list of str): Sequence IDs of the dataset, in row order.
+
+    Returns:
+        FeatureStore: The store, opened for writing.
+
+    Raises:
+        ValueError: If the store holds rows for different sequence IDs.
+    """
+    store = FeatureStore(path)
+    if len(store) == 0:
+        store.append(ids, {})
+    elif store.ids() != list(ids):
+        raise ValueError(f'{path} holds rows for different sequence IDs, remove it to start over.')
+    return store
+
+
+def write_precision_report(output_file, encoder_name, method, sequences, max_tokens=4096):
+    """
+    Compares the inference precisions of an encoder on reference sequences and saves the report as JSON.
+
+    Args:
+        output_file (str): Path of the JSON report.
+        encoder_name (str): Registered encoder name, 'esm1v' or 'prott5'.
+        method (str): Encoder method returning the (n, D) embeddings.
+        sequences (list of str): Reference sequences.
+        max_tokens (int): Maximum number of padded tokens per forward pass.
+    """
+    report = compare_precisions(functools.partial(get_encoder, encoder_name), method, sequences,
+                                max_tokens=max_tokens)
+    with open(output_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    for precision, metrics in report.items():
+        if 'skipped' in metrics:
+            print(f'{encoder_name} {precision}: skipped, {metrics["skipped"]}')
+        else:
+            print(f'{encoder_name} {precision}: ' + ', '.join(f'{key}={value:.4g}' for key, value in metrics.items()))
+
+
+def write_window_report(output_file, name, embed, sequences, window, stride=None, max_tokens=4096):
+    """
+    Compares windowed and full-context embeddings on the sequences longer than the window and saves the report.
+
+    Args:
+        output_file (str): Path of the JSON report.
+        name (str): Encoder name, used in the printed summary.
+        embed (callable): Encoder method with `window` and `stride` arguments.
+        sequences (list of str): Reference sequences; they must fit the model context.
+        window (int): Window length in residues.
+        stride (int, optional): Distance between window starts.
+        max_tokens (int): Maximum number of padded tokens per forward pass.
+    """
+    report = compare_window_embeddings(embed, sequences, window, stride, max_tokens=max_tokens)
+    with open(output_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'{name} windows: ' + ', '.join(f'{key}={value:.4g}' for key, value in report.items()))
+
+
+def get_representations(data_file, seq_column, feature_types, output_dir, max_tokens=4096, cache_dir=None,
+                        cache_max_bytes=None, id_column=None, block_size=1024, compression=None, num_workers=1,
+                        threads_per_worker=None, precision='fp32', precision_report=0, descriptors=DESCRIPTORS,
+                        ifeatpro_shard_size=None, feature_store=None, window=None, stride=None, window_report=0,
+                        layers=None, poolings=None, metrics_file=None, profile=None, profile_batches=3, profile_every=10):
     """
     Generate representations for the given sequences based on the specified feature types.
 
     Args:
         sequences (list): List of input sequences.
         feature_types (list): List of feature types to generate representations for.
-            Valid options: 'one_hot', 'ifeatpro', 'esmv1', 'prott5', 'all'.
+            Valid options: 'one_hot', 'ifeatpro', 'descriptors', 'esmv1', 'prott5', 'all'.
         output_file (str): Output file path to save the generated representations.
+        max_tokens (int): Maximum number of padded tokens per forward pass for the esm1v and prott5 encoders.
+        cache_dir (str, optional): Directory of a persistent embedding cache shared by the esm1v and prott5 encoders.
+        cache_max_bytes (int, optional): Size cap of the embedding cache, least recently used entries are evicted.
+        id_column (str, optional): Column with the sequence IDs stored next to the embeddings. Defaults to the row number.
+        block_size (int): Number of sequences embedded and written to the .h5 files at a time.
+        compression (str, optional): HDF5 compression filter for the .h5 files, e.g. 'gzip' or 'lzf'.
+        num_workers (int): Number of CPU worker processes for the esm1v and prott5 encoders. With more than one,
+            each worker loads the encoder once and embeds length-balanced shards of the input. Also the number of
+            iFeatPro processes when `ifeatpro_shard_size` is set.
+        threads_per_worker (int, optional): Torch threads per worker. Defaults to the cores pinned to the worker.
+        precision (str): Inference precision of the esm1v and prott5 encoders: 'fp32', 'bf16' (autocast) or 'int8'
+            (dynamic quantization of the linear layers, CPU only).
+        precision_report (int): If positive, run every precision on the first `precision_report` sequences and save
+            throughput, memory and drift versus fp32 to `<encoder>_precision_report.json`. int8 is skipped on GPU.
+        descriptors (tuple of str): Descriptors computed in memory by the 'descriptors' feature type, from
+            'aac', 'dpc', 'cksaap', 'ctdc', 'ctdt', 'ctdd', 'moran', 'geary' and 'nmbroto'.
+        ifeatpro_shard_size (int, optional): If set, iFeatPro runs on shards of this many sequences in `num_workers`
+            processes, and shards computed by a previous run on the same sequences are reused.
+        feature_store (str, optional): Directory of a FeatureStore that also receives every representation as a
+            memory-mapped array, with an index from sequence ID to row.
+        window (int, optional): Sequences longer than this many residues are embedded by the esm1v and prott5 encoders
+            through overlapping windows, stitched per residue before pooling. esm1v always splits sequences longer
+            than its 1022-residue context.
+        stride (int, optional): Distance between window starts. Defaults to window // 2.
+        window_report (int): If positive and `window` is set, compare windowed and full-context embeddings on the first
+            `window_report` sequences longer than the window and save the drift to `<encoder>_window_report.json`.
+        layers (list of int, optional): Layers extracted by the esm1v and prott5 encoders; negative values count from
+            the last layer. With `layers` or `poolings`, every (layer, pooling) pair is computed from the same forward
+            pass and written as its own `<encoder>_layer{layer}_{pooling}` dataset instead of the last-layer mean.
+            Defaults to the last layer. The extraction does not use windows, so it cannot be combined with `window`
+            and the esm1v sequences must fit the 1022-residue context.
+        poolings (list of str, optional): Poolings of the extracted layers, from 'mean', 'max', 'bos' (esm1v only) and
+            'mutated', the mean of the residues at the positions mutated in the `id_column` variant IDs. Defaults to 'mean'.
+        metrics_file (str, optional): JSON lines file receiving the metrics of each stage (wall time, sequences/s,
+            tokens/s, batch padding efficiency, time spent tokenizing, in forward passes and writing HDF5 blocks,
+            cache hit rate and peak RSS), of each written block and of the whole run. The window and precision
+            reports are timed as their own `<encoder>_window_report` and `<encoder>_precision_report` stages.
+        profile (str, optional): Profile a sampled subset of the esm1v and prott5 batches with 'cprofile' or 'torch'.
+            The profiles are written to `profile/` in the output directory. Not available with `num_workers` > 1.
+        profile_batches (int): Maximum number of profiled batches per encoder.
+        profile_every (int): Profile every `profile_every`-th batch of an encoder.
 
     Raises:
-        ValueError: If an invalid feature type is provided.
+        ValueError: If an invalid feature type is provided, `window` is combined with `layers` or `poolings`, a
+            sequence extracted by esm1v is longer than its context, 'bos' is pooled by prott5, or 'mutated' is
+            pooled without an `id_column`.
 
     Returns:
         None
 
     """
 
-    data = pd.read_csv(data_file)
-    sequences = data[seq_column]
+    if profile is not None and num_workers > 1 and any(name in feature_types for name in ['esm1v', 'prott5', 'all']):
+        raise ValueError('Profiling runs in the main process, it cannot be combined with num_workers > 1.')
+    if window is not None and (layers or poolings):
+        raise ValueError('Windows are not supported by the layer extraction, window cannot be combined with layers or poolings.')
+    metrics = Metrics(metrics_file, profile, os.path.join(output_dir, 'profile'), profile_every, profile_batches)
+    with metrics.stage('load') as stage:
+        data = pd.read_csv(data_file)
+        sequences = data[seq_column]
+        ids = data[id_column].astype(str).tolist() if id_column is not None else [str(i) for i in range(len(data))]
+        stage['rows'] = len(data)
+    cache = EmbeddingCache(cache_dir, max_bytes=cache_max_bytes) if cache_dir is not None else None
+    store = open_feature_store(feature_store, ids) if feature_store is not None else None
+    spec = ExtractionSpec(layers or [-1], poolings or ['mean']) if layers or poolings else None
+    # Workers receive the variant IDs keyed by sequence, since they only see blocks of sequences.
+    variant_ids = dict(zip(sequences, ids)) if spec is not None and 'mutated' in spec.poolings else None
+    # Fail before any model is loaded rather than in the middle of an encoder stage.
+    if spec is not None and 'bos' in spec.poolings and any(name in feature_types for name in ['prott5', 'all']):
+        raise ValueError("ProtT5 has no BOS token, the 'bos' pooling is only available for esm1v.")
+    if spec is not None and 'mutated' in spec.poolings and id_column is None:
+        raise ValueError("The 'mutated' pooling reads the mutated positions from the variant IDs of id_column.")
+    if spec is not None and any(name in feature_types for name in ['esm1v', 'all']):
+        too_long = [i for i, seq in enumerate(sequences) if len(seq) > Esm1v_Encoding.PRETRAINED_CONTEXT]
+        if too_long:
+            raise ValueError(f'Rows {too_long[:10]} are longer than the {Esm1v_Encoding.PRETRAINED_CONTEXT}-residue '
+                             'esm1v context, which layer extraction cannot split into windows.')
 
     if 'one_hot' in feature_types or 'all' in feature_types:
-        one_hot_encoder = OneHotEncoding()
-        one_hot_representations = [one_hot_encoder.encode(sequence) for sequence in sequences]
-        df_one_hot = pd.DataFrame(one_hot_representations)
-        df_one_hot.to_csv(f'{output_dir}/one_hot.csv', index=False)
-        print('One hot encoding done!')
+        with metrics.stage('one_hot', sequences):
+            one_hot_encoder = get_encoder('one_hot')
+            one_hot_representations = one_hot_encoder.encode_batch(sequences)
+            df_one_hot = pd.DataFrame(one_hot_representations.reshape(len(one_hot_representations), -1))
+            df_one_hot.to_csv(f'{output_dir}/one_hot.csv', index=False)
+            if store is not None:
+                store.write('one_hot', one_hot_representations)
+            print('One hot encoding done!')
 
     if 'ifeatpro' in feature_types or 'all' in feature_types:
-        ifeatpro_encoder = IfeatproEncoding(output_dir)
-        ifeatpro_encoder.get_fasta_file(sequences)
-        ifeatpro_encoder.get_ifeatpro_features()
-        print('Ifeatpro encoding done!')
+        with metrics.stage('ifeatpro', sequences):
+            ifeatpro_encoder = get_encoder('ifeatpro', output_dir)
+            if ifeatpro_shard_size is not None:
+                shards = ifeatpro_encoder.get_ifeatpro_features_sharded(sequences, ifeatpro_shard_size, num_workers)
+                print(f'Ifeatpro shards: {shards}')
+            else:
+                ifeatpro_encoder.get_fasta_file(sequences)
+                ifeatpro_encoder.get_ifeatpro_features()
+            if store is not None:
+                from ifeatpro.features import FEAT_TYPES
+
+                for feature_type in FEAT_TYPES:
+                    values = pd.read_csv(f'{output_dir}/{feature_type}.csv', header=None, index_col=0)
+                    store.write(f'ifeatpro_{feature_type}', values.to_numpy(dtype=np.float64))
+            print('Ifeatpro encoding done!')
+
+    if 'descriptors' in feature_types:
+        with metrics.stage('descriptors', sequences):
+            descriptor_encoder = get_encoder('descriptors', descriptors)
+            df_descriptors = descriptor_encoder.encode_frame(sequences, index=pd.Index(ids, name='ID'))
+            df_descriptors.to_csv(f'{output_dir}/descriptors.csv')
+            if store is not None:
+                store.write('descriptors', df_descriptors.to_numpy())
+            print('Descriptor encoding done!')
 
     if 'esm1v' in feature_types or 'all' in feature_types:
-        esm1v_encoder = Esm1v_Encoding()
-        esmv1_features = [esm1v_encoder.generate_esm1v_embedding(sequence) for sequence in sequences]
-        esmv1_features = np.array(esmv1_features)
-        with h5py.File(f'{output_dir}/esm1v.h5', 'w') as f:
-            f.create_dataset('esm1v', data=esmv1_features)
-        print('Esmv1 encoding done!')
+        if window is not None and window_report > 0:
+            with metrics.stage('esm1v_window_report'):
+                write_window_report(f'{output_dir}/esm1v_window_report.json', 'esm1v',
+                                    get_encoder('esm1v', precision=precision).calculate_esm1v_embeddings,
+                                    [seq for seq in sequences if window < len(seq) <= Esm1v_Encoding.PRETRAINED_CONTEXT][:window_report],
+                                    window, stride, max_tokens)
+        if precision_report > 0:
+            with metrics.stage('esm1v_precision_report', sequences[:precision_report]):
+                write_precision_report(f'{output_dir}/esm1v_precision_report.json', 'esm1v',
+                                       'calculate_esm1v_embeddings', sequences.tolist()[:precision_report], max_tokens)
+        # Workers look up their own copies of the cache, their counts are added from the embedder.
+        with metrics.stage('esm1v', sequences, cache=None if num_workers > 1 else cache) as stage:
+            esm1v_method = 'calculate_esm1v_embeddings' if spec is None else 'extract_esm1v_features'
+            esm1v_kwargs = {'max_tokens': max_tokens, 'window': window or 'auto', 'stride': stride}
+            if spec is not None:
+                esm1v_kwargs = {'max_tokens': max_tokens, 'spec': spec, 'variant_ids': variant_ids}
+            esm1v_attrs = encoder_attrs('esm1v', Esm1v_Encoding, precision, spec, window, stride)
+            if num_workers > 1:
+                embedder = ShardedEmbedder(functools.partial(get_encoder, 'esm1v', cache=cache, precision=precision),
+                                           esm1v_method, num_workers, threads_per_worker, esm1v_kwargs)
+                stream_embeddings(f'{output_dir}/esm1v.h5', 'esm1v', ids, sequences.tolist(), None,
+                                  block_size=block_size, compression=compression, embedder=embedder, metrics=metrics,
+                                  attrs=esm1v_attrs)
+                stage['workers'] = embedder.worker_stats()
+                if cache is not None:
+                    stage.update(embedder.cache_stats())
+                print(f'Esm1v worker throughput: {stage["workers"]}')
+            else:
+                esm1v_encoder = get_encoder('esm1v', cache=cache, precision=precision, metrics=metrics)
+                stream_embeddings(f'{output_dir}/esm1v.h5', 'esm1v', ids, sequences.tolist(),
+                                  lambda block: getattr(esm1v_encoder, esm1v_method)(block, **esm1v_kwargs),
+                                  block_size=block_size, compression=compression, metrics=metrics,
+                                  attrs=esm1v_attrs)
+            if store is not None:
+                with h5py.File(f'{output_dir}/esm1v.h5', 'r') as f:
+                    for name in f:
+                        if name != 'ids':
+                            store.write(name, f[name])
+            print('Esmv1 encoding done!')
 
     if 'prott5' in feature_types or 'all' in feature_types:
-        prott5_encoder = Prott5Encoding()
-        prott5_features = [prott5_encoder.generate_prott5_embedding(sequence) for sequence in sequences]
-        prott5_features = np.array(prott5_features)
-        with h5py.File(f'{output_dir}/prott5.h5', 'w') as f:
-            f.create_dataset('prott5', data=prott5_features)
-        print('Prott5 encoding done!')
+        if window is not None and window_report > 0:
+            with metrics.stage('prott5_window_report'):
+                write_window_report(f'{output_dir}/prott5_window_report.json', 'prott5',
+                                    get_encoder('prott5', precision=precision).calculate_prott5_embeddings,
+                                    [seq for seq in sequences if len(seq) > window][:window_report],
+                                    window, stride, max_tokens)
+        if precision_report > 0:
+            with metrics.stage('prott5_precision_report', sequences[:precision_report]):
+                write_precision_report(f'{output_dir}/prott5_precision_report.json', 'prott5',
+                                       'calculate_prott5_embeddings', sequences.tolist()[:precision_report], max_tokens)
+        # Workers look up their own copies of the cache, their counts are added from the embedder.
+        with metrics.stage('prott5', sequences, cache=None if num_workers > 1 else cache) as stage:
+            prott5_method = 'calculate_prott5_embeddings' if spec is None else 'extract_prott5_features'
+            prott5_kwargs = {'max_tokens': max_tokens, 'window': window, 'stride': stride}
+            if spec is not None:
+                prott5_kwargs = {'max_tokens': max_tokens, 'spec': spec, 'variant_ids': variant_ids}
+            prott5_attrs = encoder_attrs('prott5', Prott5Encoding, precision, spec, window, stride)
+            if num_workers > 1:
+                embedder = ShardedEmbedder(functools.partial(get_encoder, 'prott5', cache=cache, precision=precision),
+                                           prott5_method, num_workers, threads_per_worker, prott5_kwargs)
+                stream_embeddings(f'{output_dir}/prott5.h5', 'prott5', ids, sequences.tolist(), None,
+                                  block_size=block_size, compression=compression, embedder=embedder, metrics=metrics,
+                                  attrs=prott5_attrs)
+                stage['workers'] = embedder.worker_stats()
+                if cache is not None:
+                    stage.update(embedder.cache_stats())
+                print(f'Prott5 worker throughput: {stage["workers"]}')
+            else:
+                prott5_encoder = get_encoder('prott5', cache=cache, precision=precision, metrics=metrics)
+                stream_embeddings(f'{output_dir}/prott5.h5', 'prott5', ids, sequences.tolist(),
+                                  lambda block: getattr(prott5_encoder, prott5_method)(block, **prott5_kwargs),
+                                  block_size=block_size, compression=compression, metrics=metrics,
+                                  attrs=prott5_attrs)
+            if store is not None:
+                with h5py.File(f'{output_dir}/prott5.h5', 'r') as f:
+                    for name in f:
+                        if name != 'ids':
+                            store.write(name, f[name])
+            print('Prott5 encoding done!')
+
+    if cache is not None:
+        print(f'Embedding cache: {cache.stats()}')
+    metrics.finish(feature_types=list(feature_types), sequences=len(sequences))
 
-    if not any(feature_type in ['one_hot', 'ifeatpro', 'esm1v', 'prott5', 'all'] for feature_type in feature_types):
-        raise ValueError('Invalid feature type. Please choose from one_hot, ifeatpro, esm1v, prott5, or all.')
+    if not any(feature_type in ['one_hot', 'ifeatpro', 'descriptors', 'esm1v', 'prott5', 'all']
+               for feature_type in feature_types):
+        raise ValueError('Invalid feature type. Please choose from one_hot, ifeatpro, descriptors, esm1v, prott5, or all.')
 
 def main():
     parser = argparse.ArgumentParser(description='Generate numerical representations for protein sequences.')
     parser.add_argument('--data_file', type=str, help='Path to the data file containing sequences.')
     parser.add_argument('--seq_column', type=str, help='Name of the column containing sequences.')
-    parser.add_argument('--feature_types', type=str, nargs='+', help='Types of features to generate (one_hot, ifeatpro, esm1v, prott5, all).')
+    parser.add_argument('--feature_types', type=str, nargs='+', help='Types of features to generate (one_hot, ifeatpro, descriptors, esm1v, prott5, all).')
     parser.add_argument('--output_dir', type=str, help='Path to the output file to save the features.')
+    parser.add_argument('--max_tokens', type=int, default=4096, help='Maximum number of padded tokens per forward pass.')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Directory of a persistent embedding cache.')
+    parser.add_argument('--cache_max_gb', type=float, default=None, help='Size cap of the embedding cache in GB.')
+    parser.add_argument('--id_column', type=str, default=None, help='Column with the sequence IDs stored next to the embeddings.')
+    parser.add_argument('--block_size', type=int, default=1024, help='Number of sequences embedded and written at a time.')
+    parser.add_argument('--compression', type=str, default=None, help='HDF5 compression filter for the .h5 files (gzip, lzf).')
+    parser.add_argument('--num_workers', type=int, default=1, help='Number of CPU worker processes for the esm1v and prott5 encoders.')
+    parser.add_argument('--threads_per_worker', type=int, default=None, help='Torch threads per worker process.')
+    parser.add_argument('--precision', type=str, default='fp32', choices=PRECISIONS, help='Inference precision of the esm1v and prott5 encoders.')
+    parser.add_argument('--precision_report', type=int, default=0, help='Compare all precisions on this many sequences before encoding.')
+    parser.add_argument('--descriptors', type=str, nargs='+', default=list(DESCRIPTORS), choices=DESCRIPTORS, help='Descriptors computed by the descriptors feature type.')
+    parser.add_argument('--ifeatpro_shard_size', type=int, default=None, help='Run iFeatPro in parallel on shards of this many sequences, reusing unchanged shards.')
+    parser.add_argument('--feature_store', type=str, default=None, help='Directory of a memory-mapped feature store receiving every representation.')
+    parser.add_argument('--window', type=int, default=None, help='Embed sequences longer than this many residues through overlapping windows.')
+    parser.add_argument('--stride', type=int, default=None, help='Distance between window starts (default: window // 2).')
+    parser.add_argument('--window_report', type=int, default=0, help='Compare windowed and full-context embeddings on this many sequences.')
+    parser.add_argument('--layers', type=int, nargs='+', default=None, help='Layers extracted from one forward pass of the esm1v and prott5 encoders.')
+    parser.add_argument('--poolings', type=str, nargs='+', default=None, choices=POOLINGS, help='Poolings of the extracted layers.')
+    parser.add_argument('--metrics_file', type=str, default=None, help='JSON lines file receiving the metrics of each stage.')
+    parser.add_argument('--profile', type=str, default=None, choices=PROFILERS, help='Profile a sampled subset of the esm1v and prott5 batches.')
+    parser.add_argument('--profile_batches', type=int, default=3, help='Maximum number of profiled batches per encoder.')
+    parser.add_argument('--profile_every', type=int, default=10, help='Profile every n-th batch of an encoder.')
     args = parser.parse_args()
 
-    get_representations(args.data_file, args.seq_column, args.feature_types, args.output_dir)
+    cache_max_bytes = int(args.cache_max_gb * 1e9) if args.cache_max_gb is not None else None
+    get_representations(args.data_file, args.seq_column, args.feature_types, args.output_dir, args.max_tokens,
+                        args.cache_dir, cache_max_bytes, args.id_column, args.block_size, args.compression,
+                        args.num_workers, args.threads_per_worker, args.precision, args.precision_report, args.descriptors,
+                        args.ifeatpro_shard_size, args.feature_store, args.window, args.stride, args.window_report,
+                        args.layers, args.poolings, args.metrics_file, args.profile, args.profile_batches,
+                        args.profile_every)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+from src.benchmarking import PeakMemory, compare_with_baseline, load_results, run_case, save_results
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Benchmarks'))
+from benchmark_pipeline import BENCHMARKS, random_sequences, run_benchmarks
+
+class TestBenchmarking(unittest.TestCase):
+    """
+    This class contains unit tests for the benchmark suite and its regression tracking.
+    """
+
+    def setUp(self):
+        """
+        Set up a small result set to compare against.
+        """
+        self.baseline = [
+            {'benchmark': 'one_hot', 'size': 100, 'length': 50, 'items_per_s': 1000.0, 'peak_traced_mb': 10.0},
+            {'benchmark': 'outliers', 'size': 100, 'length': None, 'items_per_s': 500.0, 'peak_traced_mb': 2.0}
+        ]
+
+    def test_peak_memory_sees_allocations(self):
+        with PeakMemory() as memory:
+            block = np.ones(4 * 2**20, dtype=np.uint8)
+            del block
+        self.assertGreaterEqual(memory.peak_traced_mb, 4)
+        self.assertGreater(memory.peak_rss_mb, 0)
+
+    def test_run_case(self):
+        calls = []
+        result = run_case('noop', lambda: calls.append(1), n_items=10, size=10, length=5, repeats=2, n_residues=50)
+        self.assertEqual(len(calls), 3)
+        self.assertAlmostEqual(result['residues_per_s'] / result['items_per_s'], 5)
+        self.assertEqual((result['benchmark'], result['size'], result['length']), ('noop', 10, 5))
+
+    def test_regressions_are_flagged(self):
+        current = [dict(case) for case in self.baseline]
+        current[0]['items_per_s'] = 600.0
+        current[1]['peak_traced_mb'] = 2.5
+        current.append({'benchmark': 'esm1v', 'size': 16, 'length': 50, 'items_per_s': 1.0, 'peak_traced_mb': 1.0})
+        regressions = compare_with_baseline(current, self.baseline, tolerance=0.3)
+        self.assertEqual([(r['benchmark'], r['metric']) for r in regressions], [('one_hot', 'items_per_s')])
+        self.assertAlmostEqual(regressions[0]['change'], -0.4)
+        current[1]['peak_traced_mb'] = 5.0
+        self.assertEqual(len(compare_with_baseline(current, self.baseline, tolerance=0.3)), 2)
+        self.assertEqual(compare_with_baseline(self.baseline, self.baseline), [])
+
+    def test_suite_runs_offline_and_round_trips(self):
+        sequences = random_sequences(3, 7, seed=1)
+        self.assertEqual([len(sequence) for sequence in sequences], [7, 7, 7])
+        results = run_benchmarks(BENCHMARKS, sizes=[200], sequence_sizes=[20], encoder_sizes=[4], lengths=[30],
+                                 repeats=1, verbose=False)
+        self.assertEqual([result['benchmark'] for result in results], list(BENCHMARKS))
+        self.assertTrue(all(result['items_per_s'] > 0 for result in results))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            save_results(path, results)
+            self.assertEqual(load_results(path), results)
+
+if __name__ == '__main__':
+    unittest.main()
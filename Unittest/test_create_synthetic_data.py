@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+from src.create_synthetic_data import ProteinVariantGenerator
+
+class TestProteinVariantGenerator(unittest.TestCase):
+    """
+    This class contains unit tests for the ProteinVariantGenerator class.
+    """
+
+    def setUp(self):
+        """
+        Set up the generator instance.
+        """
+        self.generator = ProteinVariantGenerator(seed=7)
+
+    def test_per_row_data_frame(self):
+        data = self.generator.generate_data_frame(200)
+        self.assertEqual(list(data.columns), ['ID', 'Position', 'Distance_AS', 'Secondary_structure', 'Log_fitness'])
+        self.assertTrue((data['Log_fitness'] > 0).any())
+
+    def test_batched_columns_match_schema(self):
+        per_row = self.generator.generate_data_frame(50)
+        batched = self.generator.generate_data_frame(5000, batched=True)
+        self.assertEqual(list(batched.columns), list(per_row.columns))
+        self.assertEqual(len(batched), 5000)
+
+        wt = batched['ID'].str[0]
+        mut = batched['ID'].str[-1]
+        position = batched['ID'].str[1:-1].astype(int)
+        self.assertTrue((wt != mut).all())
+        self.assertTrue((position == batched['Position']).all())
+        self.assertTrue(batched['Position'].between(*self.generator.position_range).all())
+        self.assertTrue(batched['Distance_AS'].between(*self.generator.distance_range).all())
+        self.assertTrue(batched['Secondary_structure'].isin(self.generator.secondary_structures).all())
+        self.assertTrue(batched['Log_fitness'].between(-7, 3).all())
+        np.testing.assert_allclose(batched['Log_fitness'], batched['Log_fitness'].round(3))
+
+    def test_batched_is_reproducible(self):
+        first = ProteinVariantGenerator(seed=3).generate_data_frame(1000, batched=True)
+        second = ProteinVariantGenerator(seed=3).generate_data_frame(1000, batched=True)
+        self.assertTrue(first.equals(second))
+
+    def test_batched_matches_per_row_distributions(self):
+        n = 20000
+        per_row = ProteinVariantGenerator(seed=11).generate_data_frame(n)
+        batched = ProteinVariantGenerator(seed=11).generate_data_frame(n, batched=True)
+
+        for column in ['Position', 'Distance_AS']:
+            self.assertAlmostEqual(per_row[column].mean(), batched[column].mean(),
+                                   delta=0.05 * per_row[column].mean())
+        self.assertAlmostEqual((per_row['Log_fitness'] > 0).mean(), (batched['Log_fitness'] > 0).mean(), delta=0.02)
+        self.assertAlmostEqual(per_row['Log_fitness'].mean(), batched['Log_fitness'].mean(), delta=0.1)
+        self.assertAlmostEqual(per_row['Log_fitness'].std(), batched['Log_fitness'].std(), delta=0.1)
+
+if __name__ == '__main__':
+    unittest.main()
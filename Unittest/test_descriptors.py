@@ -0,0 +1,77 @@
+import unittest
+import numpy as np
+from src.numerical_representation import AMINO_ACIDS, DESCRIPTORS, DescriptorEncoding, get_encoder
+
+class TestDescriptorEncoding(unittest.TestCase):
+    """
+    This class contains unit tests for the native descriptor engine.
+    """
+
+    def setUp(self):
+        """
+        Set up the encoder and random sequences of different lengths.
+        """
+        rng = np.random.default_rng(0)
+        self.sequences = [''.join(rng.choice(list(AMINO_ACIDS), size=length)) for length in [31, 40, 57, 80, 33]]
+        self.encoder = DescriptorEncoding()
+
+    def _ifeatpro(self, name, sequences):
+        from ifeatpro import features
+
+        fastas = [[f'seq{i}', seq] for i, seq in enumerate(sequences)]
+        rows = getattr(features, name)(fastas, order=AMINO_ACIDS)
+        return np.array([row[1:] for row in rows], dtype=np.float64)
+
+    def test_matches_ifeatpro(self):
+        try:
+            import ifeatpro
+        except ImportError:
+            self.skipTest('ifeatpro is not installed')
+        encoded = self.encoder.encode_descriptors(self.sequences)
+        for name in DESCRIPTORS:
+            np.testing.assert_allclose(encoded[name], self._ifeatpro(name, self.sequences), rtol=1e-10, atol=1e-12,
+                                       err_msg=name)
+
+    def test_gaps_match_ifeatpro(self):
+        try:
+            import ifeatpro
+        except ImportError:
+            self.skipTest('ifeatpro is not installed')
+        sequences = [seq[:10] + 'X' + seq[10:20].lower() + 'B' + seq[20:] for seq in self.sequences]
+        # iFeatPro's FASTA reader upper-cases the sequences and turns non-standard residues into gaps.
+        reference = [seq.upper().replace('X', '-').replace('B', '-') for seq in sequences]
+        encoder = DescriptorEncoding(unknown='ignore')
+        encoded = encoder.encode_descriptors(sequences)
+        for name in DESCRIPTORS:
+            np.testing.assert_allclose(encoded[name], self._ifeatpro(name, reference), rtol=1e-10, atol=1e-12,
+                                       err_msg=name)
+        with self.assertRaisesRegex(ValueError, 'Non-standard residues'):
+            self.encoder.encode(sequences)
+
+    def test_selection_and_feature_matrix(self):
+        encoder = get_encoder('descriptors', descriptors=('ctdc', 'aac', 'moran'), nlag=5, props=['CIDH920105'],
+                              batch_size=2)
+        features = encoder.encode(self.sequences)
+        names = encoder.feature_names()
+        self.assertEqual(features.shape, (5, 39 + 20 + 5))
+        self.assertEqual(len(names), features.shape[1])
+        self.assertEqual(names[39], 'aac_A')
+        self.assertEqual(names[-1], 'moran_CIDH920105.lag5')
+        np.testing.assert_allclose(features[:, 39:59].sum(axis=1), 1.0)
+        unbatched = DescriptorEncoding(('ctdc', 'aac', 'moran'), nlag=5, props=['CIDH920105']).encode(self.sequences)
+        np.testing.assert_allclose(features, unbatched, rtol=1e-12, atol=1e-15)
+        frame = encoder.encode_frame(self.sequences, index=['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(list(frame.columns), names)
+        self.assertEqual(encoder.encode([]).shape, (0, 64))
+
+    def test_short_sequences_and_invalid_arguments(self):
+        features = DescriptorEncoding(('aac', 'geary'), nlag=30).encode_descriptors(['MKTAY', self.sequences[0]])
+        self.assertTrue(np.isnan(features['geary'][0]).all())
+        self.assertFalse(np.isnan(features['geary'][1]).any())
+        with self.assertRaisesRegex(ValueError, 'Unknown descriptors'):
+            DescriptorEncoding(('aac', 'paac'))
+        with self.assertRaisesRegex(ValueError, 'AAindex properties not found'):
+            DescriptorEncoding(props=['NOTAPROP'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import multiprocessing
+import tempfile
+import time
+import numpy as np
+from src.embedding_cache import EmbeddingCache
+from src.numerical_representation import Esm1v_Encoding
+from tiny_models import tiny_esm1v
+
+
+def _write_entries(cache_dir, worker):
+    cache = EmbeddingCache(cache_dir)
+    for i in range(20):
+        cache.put('model', 1, 'mean', f'SEQ{worker}_{i}', np.full(8, worker, dtype=np.float32))
+
+class TestEmbeddingCache(unittest.TestCase):
+    """
+    This class contains unit tests for the on-disk embedding cache.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary cache directory.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip_and_stats(self):
+        cache = EmbeddingCache(self.cache_dir)
+        embeddings = np.random.default_rng(0).normal(size=(2, 16)).astype(np.float32)
+        cache.put_many('esm1v', 33, 'mean', ['MKV', 'ACD'], embeddings)
+
+        found = cache.get_many('esm1v', 33, 'mean', ['ACD', 'WWW', 'MKV'])
+        np.testing.assert_array_equal(found[0], embeddings[1])
+        self.assertIsNone(found[1])
+        np.testing.assert_array_equal(found[2], embeddings[0])
+        self.assertIsNone(cache.get('esm1v', 12, 'mean', 'MKV'))
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 2, 2))
+        self.assertEqual(stats['bytes'], embeddings.nbytes)
+
+    def test_lru_eviction(self):
+        cache = EmbeddingCache(self.cache_dir, max_entries=2)
+        cache.put('m', 1, 'mean', 'A', np.zeros(4))
+        time.sleep(0.01)
+        cache.put('m', 1, 'mean', 'C', np.zeros(4))
+        time.sleep(0.01)
+        cache.get('m', 1, 'mean', 'A')
+        time.sleep(0.01)
+        cache.put('m', 1, 'mean', 'D', np.zeros(4))
+        self.assertIsNone(cache.get('m', 1, 'mean', 'C'))
+        self.assertIsNotNone(cache.get('m', 1, 'mean', 'A'))
+
+        cache = EmbeddingCache(self.cache_dir, max_bytes=40)
+        cache.put('m', 1, 'mean', 'E', np.zeros(4))
+        self.assertEqual(cache.stats()['entries'], 1)
+
+    def test_running_totals(self):
+        cache = EmbeddingCache(self.cache_dir)
+        cache.put_many('m', 1, 'mean', ['A', 'C'], [np.zeros(4, dtype=np.float32), np.zeros(8, dtype=np.float32)])
+        cache.put('m', 1, 'mean', 'A', np.zeros(2, dtype=np.float32))
+        self.assertEqual((cache.stats()['entries'], cache.stats()['bytes']), (2, 40))
+
+        # A cache written before the totals table existed gets its totals from the stored rows.
+        with cache._connect() as connection:
+            for statement in ['DROP TRIGGER embeddings_insert', 'DROP TRIGGER embeddings_delete', 'DROP TABLE totals']:
+                connection.execute(statement)
+        cache = EmbeddingCache(self.cache_dir)
+        self.assertEqual(cache.stats()['bytes'], 40)
+        cache.clear()
+        self.assertEqual((cache.stats()['entries'], cache.stats()['bytes']), (0, 0))
+
+    def test_concurrent_writers(self):
+        EmbeddingCache(self.cache_dir)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_write_entries, args=(self.cache_dir, worker)) for worker in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(EmbeddingCache(self.cache_dir).stats()['entries'], 60)
+
+    def test_encoder_rerun_skips_model(self):
+        model, alphabet = tiny_esm1v()
+        calls = []
+        forward = model.forward
+
+        def counting_forward(tokens, *args, **kwargs):
+            calls.append(tokens.shape[0])
+            return forward(tokens, *args, **kwargs)
+        model.forward = counting_forward
+
+        sequences = ['MKTAYIAKQR', 'MKV', 'MKTAYIAKQR', 'ACDEFGHIK']
+        encoder = Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet, cache=EmbeddingCache(self.cache_dir),
+                                 model_id='tiny-esm1v')
+        first = encoder.calculate_esm1v_embeddings(sequences)
+        self.assertEqual(sum(calls), 3)
+
+        calls.clear()
+        rerun = Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet, cache=EmbeddingCache(self.cache_dir),
+                               model_id='tiny-esm1v')
+        second = rerun.calculate_esm1v_embeddings(sequences)
+        self.assertEqual(calls, [])
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(rerun.cache.stats()['hit_rate'], 1.0)
+        # A custom model must not be cached under the pretrained checkpoint's ID.
+        with self.assertRaisesRegex(ValueError, 'model_id'):
+            Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet, cache=EmbeddingCache(self.cache_dir))
+
+if __name__ == '__main__':
+    unittest.main()
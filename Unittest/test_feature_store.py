@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import h5py
+from src.feature_store import FeatureStore
+
+class TestFeatureStore(unittest.TestCase):
+    """
+    This class contains unit tests for the memory-mapped feature store.
+    """
+
+    def setUp(self):
+        """
+        Set up a store directory and two representations of the same variants.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'store')
+        rng = np.random.default_rng(0)
+        self.ids = [f'A{i}G' for i in range(1, 501)]
+        self.embeddings = rng.normal(size=(500, 16)).astype(np.float32)
+        self.one_hot = rng.integers(0, 2, size=(500, 5, 20), dtype=np.uint8)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_append_lookup_and_reopen(self):
+        store = FeatureStore(self.path)
+        store.append(self.ids[:300], {'esm1v': self.embeddings[:300], 'one_hot': self.one_hot[:300]})
+        store.append(self.ids[300:], {'esm1v': self.embeddings[300:], 'one_hot': self.one_hot[300:]})
+
+        reader = FeatureStore(self.path, mode='r')
+        self.assertEqual(len(reader), 500)
+        self.assertIsInstance(reader['esm1v'], np.memmap)
+        np.testing.assert_array_equal(reader['esm1v'][100:400], self.embeddings[100:400])
+        np.testing.assert_array_equal(reader.rows(['A7G', 'A450G', 'A1G']), [6, 449, 0])
+        self.assertEqual(reader.ids([0, 499]), ['A1G', 'A500G'])
+        np.testing.assert_array_equal(reader.gather('one_hot', ids=['A450G', 'A7G']), self.one_hot[[449, 6]])
+        with self.assertRaises(KeyError):
+            reader.rows(['A7G', 'missing'])
+        with self.assertRaisesRegex(ValueError, 'read-only'):
+            reader.append(['new'], {'esm1v': self.embeddings[:1], 'one_hot': self.one_hot[:1]})
+
+    def test_validation_and_interrupted_append(self):
+        store = FeatureStore(self.path)
+        store.append(self.ids[:10], {'esm1v': self.embeddings[:10]})
+        with self.assertRaisesRegex(ValueError, 'Duplicate IDs'):
+            store.append(['A11G', 'A3G'], {'esm1v': self.embeddings[10:12]})
+        with self.assertRaisesRegex(ValueError, 'every representation'):
+            store.append(['A11G'], {'one_hot': self.one_hot[:1]})
+        with self.assertRaisesRegex(ValueError, 'shape'):
+            store.append(['A11G'], {'esm1v': self.embeddings[:1, :8]})
+
+        # Rows written after the last commit are dropped when the store is reopened.
+        with open(os.path.join(self.path, 'esm1v.bin'), 'ab') as f:
+            f.write(self.embeddings[10:12].tobytes())
+        store = FeatureStore(self.path)
+        store.append(['A11G'], {'esm1v': self.embeddings[10:11]})
+        np.testing.assert_array_equal(FeatureStore(self.path, mode='r')['esm1v'], self.embeddings[:11])
+
+    def test_crash_before_commit(self):
+        store = FeatureStore(self.path)
+        store.append(self.ids[:2], {'esm1v': self.embeddings[:2]})
+        # The index and the rows are written, but meta.json is never committed.
+        with mock.patch.object(FeatureStore, '_save_meta', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                store.append(self.ids[2:4], {'esm1v': self.embeddings[2:4]})
+
+        reader = FeatureStore(self.path, mode='r')
+        self.assertEqual(len(reader), 2)
+        np.testing.assert_array_equal(reader.rows(self.ids[1::-1]), [1, 0])
+        with self.assertRaises(KeyError):
+            reader.rows(self.ids[2:3])
+
+        store = FeatureStore(self.path)
+        store.append(self.ids[2:5], {'esm1v': self.embeddings[2:5]})
+        reader = FeatureStore(self.path, mode='r')
+        np.testing.assert_array_equal(reader.rows(self.ids[4::-1]), [4, 3, 2, 1, 0])
+        np.testing.assert_array_equal(reader['esm1v'], self.embeddings[:5])
+
+    def test_write_from_h5_and_minibatches(self):
+        h5_file = os.path.join(self.tmp_dir.name, 'esm1v.h5')
+        with h5py.File(h5_file, 'w') as f:
+            f['esm1v'] = self.embeddings
+        store = FeatureStore(self.path)
+        store.append(self.ids, {})
+        with h5py.File(h5_file, 'r') as f:
+            store.write('esm1v', f['esm1v'], block_rows=64)
+        store.write('one_hot', self.one_hot)
+        with self.assertRaisesRegex(ValueError, 'rows'):
+            store.write('aac', np.zeros((3, 20)))
+
+        seen = []
+        for rows, batch in FeatureStore(self.path, mode='r').minibatches(['esm1v', 'one_hot'], batch_size=64, seed=1):
+            np.testing.assert_array_equal(batch['esm1v'], self.embeddings[rows])
+            np.testing.assert_array_equal(batch['one_hot'], self.one_hot[rows])
+            seen.extend(rows)
+        self.assertEqual(sorted(seen), list(range(500)))
+
+if __name__ == '__main__':
+    unittest.main()
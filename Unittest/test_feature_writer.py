@@ -0,0 +1,107 @@
+import os
+import sys
+import unittest
+import tempfile
+import numpy as np
+from src.feature_writer import StreamingFeatureWriter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Tutorials'))
+from sequence_representation import stream_embeddings
+
+class TestStreamingFeatureWriter(unittest.TestCase):
+    """
+    This class contains unit tests for the streaming, resumable HDF5 feature writer.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary output file and fake embeddings.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'features.h5')
+        self.sequences = [f'SEQ{i}' for i in range(10)]
+        self.ids = [f'variant_{i}' for i in range(10)]
+        self.features = np.arange(40, dtype=np.float32).reshape(10, 4)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _embed(self, block):
+        return self.features[[self.sequences.index(seq) for seq in block]]
+
+    def test_append_and_reopen(self):
+        with StreamingFeatureWriter(self.path, chunk_rows=4, compression='gzip') as writer:
+            writer.append(self.ids[:4], {'esm1v': self.features[:4]})
+            writer.append(self.ids[4:], {'esm1v': self.features[4:]})
+
+        with StreamingFeatureWriter(self.path) as writer:
+            self.assertEqual(writer.rows_done, 10)
+            self.assertEqual(writer.completed_ids(), self.ids)
+            np.testing.assert_array_equal(writer.file['esm1v'][:], self.features)
+            self.assertEqual(writer.file['esm1v'].chunks, (4, 4))
+
+        with self.assertRaises(ValueError):
+            with StreamingFeatureWriter(self.path, resume=False) as writer:
+                writer.append(self.ids[:2], {'esm1v': self.features[:3]})
+
+    def test_interrupted_job_resumes(self):
+        calls = []
+
+        def crashing_embed(block):
+            calls.append(block)
+            if len(calls) == 3:
+                raise RuntimeError('killed')
+            return self._embed(block)
+
+        with self.assertRaises(RuntimeError):
+            stream_embeddings(self.path, 'esm1v', self.ids, self.sequences, crashing_embed, block_size=3)
+
+        resumed = []
+
+        def embed(block):
+            resumed.append(block)
+            return self._embed(block)
+
+        stream_embeddings(self.path, 'esm1v', self.ids, self.sequences, embed, block_size=3)
+        self.assertEqual(resumed[0], self.sequences[6:9])
+
+        with StreamingFeatureWriter(self.path) as writer:
+            np.testing.assert_array_equal(writer.file['esm1v'][:], self.features)
+            self.assertEqual(writer.completed_ids(), self.ids)
+
+    def test_resume_with_different_ids(self):
+        stream_embeddings(self.path, 'esm1v', self.ids[:3], self.sequences[:3], self._embed)
+        with self.assertRaises(ValueError):
+            stream_embeddings(self.path, 'esm1v', self.ids[::-1], self.sequences, self._embed)
+
+    def test_resume_with_different_attrs(self):
+        attrs = {'encoder': 'esm1v', 'model_id': 'esm1v_t33_650M_UR90S', 'precision': 'fp32'}
+        stream_embeddings(self.path, 'esm1v', self.ids[:3], self.sequences[:3], self._embed, attrs=attrs)
+        with self.assertRaisesRegex(ValueError, "precision='fp32'"):
+            stream_embeddings(self.path, 'esm1v', self.ids, self.sequences, self._embed, attrs={**attrs, 'precision': 'bf16'})
+
+        stream_embeddings(self.path, 'esm1v', self.ids, self.sequences, self._embed, attrs=attrs)
+        with StreamingFeatureWriter(self.path) as writer:
+            self.assertEqual(dict(writer.file.attrs), {**attrs, 'rows_done': 10})
+            np.testing.assert_array_equal(writer.file['esm1v'][:], self.features)
+
+    def test_resume_with_different_datasets(self):
+        stream_embeddings(self.path, 'esm1v', self.ids[:3], self.sequences[:3], self._embed)
+        with self.assertRaisesRegex(ValueError, 'remove it to start over'):
+            stream_embeddings(self.path, 'esm1v', self.ids, self.sequences,
+                              lambda block: {'layer-1_mean': self._embed(block)}, block_size=3)
+        with StreamingFeatureWriter(self.path) as writer:
+            with self.assertRaisesRegex(ValueError, 'remove it to start over'):
+                writer.append(self.ids[3:6], {'esm1v': self.features[3:6], 'prott5': self.features[3:6]})
+            writer.append(self.ids[3:6], {'esm1v': self.features[3:6]})
+            self.assertEqual(writer.feature_names, ['esm1v'])
+            self.assertEqual(writer.rows_done, 6)
+
+        with StreamingFeatureWriter(self.path, resume=False) as writer:
+            writer.append(self.ids[:3], {'esm1v': self.features[:3], 'prott5': self.features[:3]})
+            with self.assertRaisesRegex(ValueError, 'remove it to start over'):
+                writer.append(self.ids[3:6], {'esm1v': self.features[3:6]})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from src.numerical_representation import AMINO_ACIDS, IfeatproEncoding
+
+try:
+    from ifeatpro.features import FEAT_TYPES
+except ImportError:
+    FEAT_TYPES = None
+
+@unittest.skipIf(FEAT_TYPES is None, 'ifeatpro is not installed')
+class TestShardedIfeatpro(unittest.TestCase):
+    """
+    This class contains unit tests for the sharded, incremental iFeatPro execution.
+    """
+
+    def setUp(self):
+        """
+        Set up random sequences long enough for every iFeatPro descriptor.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.sequences = [''.join(rng.choice(list(AMINO_ACIDS), size=rng.integers(35, 45))) for _ in range(13)]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _directory(self, name):
+        path = os.path.join(self.tmp_dir.name, name)
+        os.makedirs(path)
+        return path
+
+    def _read(self, directory, feature_type):
+        with open(os.path.join(directory, f'{feature_type}.csv')) as f:
+            return f.read()
+
+    def test_matches_single_run_and_skips_unchanged_shards(self):
+        reference_dir, sharded_dir = self._directory('reference'), self._directory('sharded')
+        reference = IfeatproEncoding(reference_dir)
+        reference.get_fasta_file(self.sequences)
+        reference.get_ifeatpro_features()
+
+        encoder = IfeatproEncoding(sharded_dir)
+        counts = encoder.get_ifeatpro_features_sharded(self.sequences[:10], shard_size=4, n_workers=2,
+                                                       mp_context='fork')
+        self.assertEqual(counts, {'computed': 3, 'skipped': 0})
+
+        counts = encoder.get_ifeatpro_features_sharded(self.sequences, shard_size=4, n_workers=2, mp_context='fork')
+        self.assertEqual(counts, {'computed': 2, 'skipped': 2})
+        self.assertEqual(len(os.listdir(os.path.join(sharded_dir, 'ifeatpro_shards'))), 4)
+        for feature_type in FEAT_TYPES:
+            self.assertEqual(self._read(sharded_dir, feature_type), self._read(reference_dir, feature_type),
+                             feature_type)
+
+        counts = encoder.get_ifeatpro_features_sharded(self.sequences, shard_size=4, n_workers=1)
+        self.assertEqual(counts, {'computed': 0, 'skipped': 4})
+
+if __name__ == '__main__':
+    unittest.main()
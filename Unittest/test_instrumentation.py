@@ -0,0 +1,184 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+import h5py
+import numpy as np
+import pandas as pd
+from src.instrumentation import Metrics, resident_memory_mb
+from src.numerical_representation import Esm1v_Encoding, length_batches
+from tiny_models import tiny_esm1v, tiny_prott5
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Tutorials'))
+import numerical_representation
+from sequence_representation import get_representations
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    This class contains unit tests for the metrics and profiling instrumentation.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary directory and sequences of varied lengths.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.sequences = [''.join(rng.choice(list('ACDEFGHIKLMNPQRSTVWY'), length))
+                          for length in rng.integers(5, 60, size=17)]
+
+    def tearDown(self):
+        numerical_representation._PRETRAINED_MODELS.clear()
+        self.tmp_dir.cleanup()
+
+    def read_events(self, path):
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_stage_summary(self):
+        path = os.path.join(self.tmp_dir.name, 'metrics.jsonl')
+        metrics = Metrics(path)
+        cache = SimpleNamespace(hits=5, misses=5)
+        with metrics.stage('encode', ['AAAA', 'CC'], cache=cache) as stage:
+            with metrics.batch('esm1v', [6, 4]) as record:
+                record.tokenized()
+            with metrics.batch('esm1v', [3]):
+                pass
+            metrics.add(write_s=0.5)
+            cache.hits, cache.misses = 8, 6
+            stage['note'] = 'extra'
+        metrics.finish()
+
+        stage, run = self.read_events(path)
+        self.assertEqual((stage['event'], stage['stage'], run['event']), ('stage', 'encode', 'run'))
+        self.assertEqual((stage['sequences'], stage['residues'], stage['batches']), (2, 6, 2))
+        self.assertEqual((stage['tokens'], stage['padded_tokens']), (13, 15))
+        self.assertAlmostEqual(stage['padding_efficiency'], 13 / 15)
+        self.assertEqual((stage['cache_hits'], stage['cache_misses']), (3, 1))
+        self.assertAlmostEqual(stage['cache_hit_rate'], 0.75)
+        self.assertEqual((stage['write_s'], stage['note']), (0.5, 'extra'))
+        self.assertGreater(stage['peak_rss_mb'], 0)
+        self.assertAlmostEqual(resident_memory_mb(), stage['rss_mb'], delta=64)
+        self.assertEqual(stage['run_id'], run['run_id'])
+        with self.assertRaises(ValueError):
+            Metrics(profile='perf')
+
+    def test_encoder_batches_and_sampled_profiles(self):
+        model, alphabet = tiny_esm1v()
+        metrics = Metrics(profile='cprofile', profile_dir=self.tmp_dir.name, profile_every=2, profile_batches=2)
+        encoder = Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet, metrics=metrics)
+        with metrics.stage('esm1v', self.sequences):
+            embeddings = encoder.calculate_esm1v_embeddings(self.sequences, max_tokens=200)
+        np.testing.assert_allclose(embeddings, Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet)
+                                   .calculate_esm1v_embeddings(self.sequences, max_tokens=200), atol=1e-6)
+
+        stage = [event for event in metrics.events if event['event'] == 'stage'][0]
+        lengths = [len(seq) + 2 for seq in self.sequences]
+        batches = length_batches(lengths, 200)
+        self.assertEqual(stage['batches'], len(batches))
+        self.assertEqual(stage['tokens'], sum(lengths))
+        self.assertEqual(stage['padded_tokens'], sum(len(batch) * lengths[batch[0]] for batch in batches))
+        self.assertIn('model_load_s', stage)
+        profiles = [event for event in metrics.events if event['event'] == 'profile']
+        self.assertEqual([event['batch'] for event in profiles], [0, 2])
+        self.assertTrue(all(os.path.exists(event['path']) for event in profiles))
+
+    def test_representation_cli_metrics(self):
+        data_file = os.path.join(self.tmp_dir.name, 'data.csv')
+        pd.DataFrame({'sequence': self.sequences}).to_csv(data_file, index=False)
+        device = str(numerical_representation.resolve_device('cuda'))
+        # The pretrained path reads the last layer of the real checkpoints.
+        model, alphabet = tiny_esm1v(layers=numerical_representation.Esm1v_Encoding.PRETRAINED_LAYERS)
+        numerical_representation._PRETRAINED_MODELS[('esm1v', device, 'fp32')] = (model.eval(), alphabet)
+        model, tokenizer = tiny_prott5(layers=numerical_representation.Prott5Encoding.PRETRAINED_LAYERS)
+        numerical_representation._PRETRAINED_MODELS[('prott5', device, 'fp32')] = (model.eval(), tokenizer)
+
+        path = os.path.join(self.tmp_dir.name, 'metrics.jsonl')
+        get_representations(data_file, 'sequence', ['one_hot', 'esm1v', 'prott5'], self.tmp_dir.name, max_tokens=300,
+                            cache_dir=os.path.join(self.tmp_dir.name, 'cache'), block_size=8, metrics_file=path,
+                            profile='cprofile', profile_every=1, profile_batches=1)
+        events = self.read_events(path)
+        stages = {event['stage']: event for event in events if event['event'] == 'stage'}
+        self.assertEqual(list(stages), ['load', 'one_hot', 'esm1v', 'prott5'])
+        for name in ['esm1v', 'prott5']:
+            self.assertEqual(stages[name]['sequences'], len(self.sequences))
+            self.assertEqual(stages[name]['blocks'], 3)
+            self.assertGreater(stages[name]['tokens_per_s'], 0)
+            self.assertLessEqual(stages[name]['padding_efficiency'], 1)
+            self.assertEqual(stages[name]['cache_misses'], len(self.sequences))
+            self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, 'profile', f'{name}_batch0.prof')))
+        self.assertEqual(len([event for event in events if event['event'] == 'block']), 6)
+        self.assertEqual(events[-1]['event'], 'run')
+
+    def test_reports_are_separate_stages(self):
+        data_file = os.path.join(self.tmp_dir.name, 'data.csv')
+        pd.DataFrame({'sequence': self.sequences}).to_csv(data_file, index=False)
+        device = str(numerical_representation.resolve_device('cuda'))
+        model, alphabet = tiny_esm1v(layers=numerical_representation.Esm1v_Encoding.PRETRAINED_LAYERS)
+        numerical_representation._PRETRAINED_MODELS[('esm1v', device, 'fp32')] = (model.eval(), alphabet)
+
+        path = os.path.join(self.tmp_dir.name, 'metrics.jsonl')
+        get_representations(data_file, 'sequence', ['esm1v'], self.tmp_dir.name, precision_report=3, window=30,
+                            window_report=2, metrics_file=path)
+        stages = [event for event in self.read_events(path) if event['event'] == 'stage']
+        self.assertEqual([stage['stage'] for stage in stages],
+                         ['load', 'esm1v_window_report', 'esm1v_precision_report', 'esm1v'])
+        self.assertEqual(stages[2]['sequences'], 3)
+        self.assertEqual(stages[3]['sequences'], len(self.sequences))
+        self.assertEqual(list(numerical_representation._PRETRAINED_MODELS), [('esm1v', device, 'fp32')])
+
+        with self.assertRaisesRegex(ValueError, 'num_workers'):
+            get_representations(data_file, 'sequence', ['esm1v'], self.tmp_dir.name, num_workers=2, profile='cprofile')
+
+    def test_extraction_rejects_windows(self):
+        data_file = os.path.join(self.tmp_dir.name, 'data.csv')
+        pd.DataFrame({'sequence': ['MKV', 'A' * (numerical_representation.Esm1v_Encoding.PRETRAINED_CONTEXT + 1)]}).to_csv(data_file, index=False)
+        with self.assertRaisesRegex(ValueError, 'window cannot be combined'):
+            get_representations(data_file, 'sequence', ['esm1v'], self.tmp_dir.name, window=30, layers=[-1])
+        with self.assertRaisesRegex(ValueError, r'Rows \[1\] are longer'):
+            get_representations(data_file, 'sequence', ['esm1v'], self.tmp_dir.name, poolings=['max'])
+        with self.assertRaisesRegex(ValueError, 'no BOS token'):
+            get_representations(data_file, 'sequence', ['all'], self.tmp_dir.name, poolings=['mean', 'bos'])
+        with self.assertRaisesRegex(ValueError, 'id_column'):
+            get_representations(data_file, 'sequence', ['prott5'], self.tmp_dir.name, poolings=['mutated'])
+        self.assertEqual(numerical_representation._PRETRAINED_MODELS, {})
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['data.csv'])
+
+    def test_resume_checks_the_outputs(self):
+        data_file = os.path.join(self.tmp_dir.name, 'data.csv')
+        pd.DataFrame({'sequence': self.sequences}).to_csv(data_file, index=False)
+        device = str(numerical_representation.resolve_device('cuda'))
+        model, alphabet = tiny_esm1v(layers=numerical_representation.Esm1v_Encoding.PRETRAINED_LAYERS)
+        numerical_representation._PRETRAINED_MODELS[('esm1v', device, 'fp32')] = (model.eval(), alphabet)
+
+        get_representations(data_file, 'sequence', ['esm1v'], self.tmp_dir.name, block_size=5)
+        with self.assertRaisesRegex(ValueError, "outputs='mean'"):
+            get_representations(data_file, 'sequence', ['esm1v'], self.tmp_dir.name, block_size=5, layers=[20, -1])
+        with h5py.File(os.path.join(self.tmp_dir.name, 'esm1v.h5'), 'r') as f:
+            self.assertEqual(sorted(f), ['esm1v', 'ids'])
+            self.assertEqual(f.attrs['outputs'], 'mean')
+
+    def test_resume_checks_the_window(self):
+        data_file = os.path.join(self.tmp_dir.name, 'data.csv')
+        pd.DataFrame({'sequence': self.sequences}).to_csv(data_file, index=False)
+        device = str(numerical_representation.resolve_device('cuda'))
+        model, alphabet = tiny_esm1v(layers=numerical_representation.Esm1v_Encoding.PRETRAINED_LAYERS)
+        numerical_representation._PRETRAINED_MODELS[('esm1v', device, 'fp32')] = (model.eval(), alphabet)
+        model, tokenizer = tiny_prott5(layers=numerical_representation.Prott5Encoding.PRETRAINED_LAYERS)
+        numerical_representation._PRETRAINED_MODELS[('prott5', device, 'fp32')] = (model.eval(), tokenizer)
+
+        get_representations(data_file, 'sequence', ['esm1v', 'prott5'], self.tmp_dir.name)
+        # An esm1v window at or beyond the context is the default geometry.
+        get_representations(data_file, 'sequence', ['esm1v'], self.tmp_dir.name, window=5000)
+        with self.assertRaisesRegex(ValueError, 'window=1022'):
+            get_representations(data_file, 'sequence', ['esm1v'], self.tmp_dir.name, window=30)
+        with self.assertRaisesRegex(ValueError, 'window=0'):
+            get_representations(data_file, 'sequence', ['prott5'], self.tmp_dir.name, window=30)
+        with h5py.File(os.path.join(self.tmp_dir.name, 'esm1v.h5'), 'r') as f:
+            self.assertEqual((f.attrs['window'], f.attrs['stride']), (1022, 511))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from src.embedding_cache import EmbeddingCache
+import src.numerical_representation as numerical_representation
+from src.numerical_representation import Esm1v_Encoding, OneHotEncoding, get_encoder
+from tiny_models import tiny_esm1v
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+class TestLazyLoading(unittest.TestCase):
+    """
+    This class contains unit tests for the lazy imports, lazy model loading and encoder registry.
+    """
+
+    def tearDown(self):
+        numerical_representation._PRETRAINED_MODELS.clear()
+
+    def test_one_hot_path_skips_heavy_imports(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_file = os.path.join(tmp_dir, 'data.csv')
+            with open(data_file, 'w') as f:
+                f.write('sequence\nMKTAYIAKQR\nMKV\n')
+            script = ('import sys\n'
+                      f'sys.path[:0] = [{os.path.join(ROOT, "src")!r}, {os.path.join(ROOT, "Tutorials")!r}]\n'
+                      'from sequence_representation import get_representations\n'
+                      f'get_representations({data_file!r}, "sequence", ["one_hot"], {tmp_dir!r})\n'
+                      'print(sorted(m for m in ("torch", "esm", "transformers", "ifeatpro") if m in sys.modules))\n')
+            output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+            self.assertIn('[]', output)
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir, 'one_hot.csv')))
+
+    def test_registry(self):
+        self.assertIsInstance(get_encoder('one_hot'), OneHotEncoding)
+        with self.assertRaises(ValueError):
+            get_encoder('esm2')
+
+    def test_weights_load_on_first_use_and_are_shared(self):
+        with mock.patch('esm.pretrained.esm1v_t33_650M_UR90S', side_effect=lambda: tiny_esm1v(layers=Esm1v_Encoding.PRETRAINED_LAYERS)) as loader:
+            first = get_encoder('esm1v', device='cpu')
+            second = Esm1v_Encoding(device='cpu')
+            self.assertEqual(loader.call_count, 0)
+
+            first.calculate_esm1v_embeddings(['MKV'])
+            second.calculate_esm1v_embeddings(['MKTAY'])
+            self.assertEqual(loader.call_count, 1)
+            self.assertIs(first.esm_model, second.esm_model)
+
+    def test_fully_cached_run_skips_loading(self):
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch('esm.pretrained.esm1v_t33_650M_UR90S',
+                           side_effect=lambda: tiny_esm1v(layers=Esm1v_Encoding.PRETRAINED_LAYERS)) as loader:
+            sequences = ['MKV', 'MKTAYIAKQR']
+            embeddings = Esm1v_Encoding(device='cpu', cache=EmbeddingCache(cache_dir)).calculate_esm1v_embeddings(sequences)
+            numerical_representation._PRETRAINED_MODELS.clear()
+
+            cached = Esm1v_Encoding(device='cpu', cache=EmbeddingCache(cache_dir)).calculate_esm1v_embeddings(sequences)
+            self.assertEqual(loader.call_count, 1)
+            np.testing.assert_array_equal(cached, embeddings)
+
+if __name__ == '__main__':
+    unittest.main()
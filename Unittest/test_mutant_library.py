@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from src.mutant_library import MutantLibrary
+from src.numerical_representation import OneHotEncoding, Esm1v_Encoding, Prott5Encoding
+from tiny_models import tiny_esm1v, tiny_prott5
+
+class TestMutantLibrary(unittest.TestCase):
+    """
+    This class contains unit tests for the compact combinatorial mutant library.
+    """
+
+    def setUp(self):
+        """
+        Set up a library over a short wildtype.
+        """
+        self.wildtype = 'MKTAYIAKQRQISFVKSHFS'
+        self.library = MutantLibrary(self.wildtype)
+
+    def test_enumeration_is_complete_and_deduplicated(self):
+        self.assertEqual(self.library.count(2), 190 * 19 ** 2)
+        self.assertEqual(self.library.add_all((1,), batch_size=50), 380)
+        self.assertEqual(self.library.add_all((1, 2)), self.library.count(2))
+        self.assertEqual(len(self.library), 380 + 190 * 19 ** 2)
+        self.assertEqual(self.library.positions.dtype, np.int16)
+        self.assertEqual(self.library.residues.dtype, np.int8)
+        keys = self.library.positions.astype(int) * 20 + self.library.residues
+        self.assertEqual(len(np.unique(keys, axis=0)), len(self.library))
+        self.assertEqual(self.library.add([[4, 2]], [[0, 3]]), 0)
+
+    def test_restricted_positions(self):
+        library = MutantLibrary(self.wildtype, positions=[3, 5, 7])
+        self.assertEqual(library.add_all((1, 2, 3)), 3 * 19 + 3 * 19 ** 2 + 19 ** 3)
+        self.assertEqual(set(library.positions[library.positions >= 0].tolist()), {2, 4, 6})
+
+    def test_sampling_is_distinct_and_stratified(self):
+        self.assertEqual(self.library.sample(500, order=3, seed=1), 500)
+        self.assertEqual(self.library.sample(500, order=3, seed=1), 500)
+        self.assertEqual(len(self.library), 1000)
+        self.assertTrue((self.library.orders == 3).all())
+
+        added = self.library.sample_stratified(4, orders=(1, 2), by='position', seed=2)
+        self.assertEqual(set(added.values()), {4})
+        for position in range(len(self.wildtype)):
+            singles = (self.library.orders == 1) & (self.library.positions[:, 0] == position)
+            self.assertEqual(singles.sum(), 4)
+        self.assertEqual(self.library.sample_stratified(10, orders=(1,), seed=3), {1: 10})
+        with self.assertRaises(ValueError):
+            self.library.sample(self.library.count(1), order=1)
+
+    def test_materialization_and_variant_ids(self):
+        self.library.add([[0, 11], [19, -1]], [[2, 12], [0, -1]])
+        self.assertEqual(self.library.variant_ids(), ['M1D:I12P', 'S20A'])
+        sequences = self.library.sequences()
+        self.assertEqual(sequences[0], 'DKTAYIAKQRQPSFVKSHFS')
+        self.assertEqual(sequences[1], 'MKTAYIAKQRQISFVKSHFA')
+        self.assertEqual([batch for rows, batch in self.library.iter_sequences(batch_size=1)], [[seq] for seq in sequences])
+
+        parsed = MutantLibrary(self.wildtype)
+        self.assertEqual(parsed.add_variant_ids(['I12P:M1D', 'S20A', 'S20A']), 2)
+        np.testing.assert_array_equal(parsed.positions, self.library.positions)
+        with self.assertRaises(ValueError):
+            parsed.add_variant_ids(['A1G'])
+
+    def test_encoders_consume_the_integer_form(self):
+        self.library.sample(60, order=2, seed=4)
+        sequences = self.library.sequences()
+        encoder = OneHotEncoding()
+        np.testing.assert_array_equal(encoder.encode_library(self.library), encoder.encode_batch(sequences))
+
+        model, alphabet = tiny_esm1v()
+        esm1v_encoder = Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet)
+        np.testing.assert_allclose(esm1v_encoder.calculate_esm1v_library_embeddings(self.library, max_tokens=200),
+                                   esm1v_encoder.calculate_esm1v_embeddings(sequences), atol=1e-5)
+        model, tokenizer = tiny_prott5()
+        prott5_encoder = Prott5Encoding(device='cpu', model=model, tokenizer=tokenizer)
+        rows = [5, 1, 30]
+        np.testing.assert_allclose(prott5_encoder.calculate_prott5_library_embeddings(self.library, rows),
+                                   prott5_encoder.calculate_prott5_embeddings([sequences[row] for row in rows]),
+                                   atol=1e-5)
+
+    def test_save_and_load(self):
+        library = MutantLibrary(self.wildtype, positions=range(5, 15), offset=1)
+        library.sample(100, order=2, seed=5)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'library.npz')
+            library.save(path)
+            loaded = MutantLibrary.load(path)
+        self.assertEqual(loaded.variant_ids(), library.variant_ids())
+        np.testing.assert_array_equal(loaded.mutable_positions, library.mutable_positions)
+        self.assertEqual(loaded.add(library.positions[:10], library.residues[:10]), 0)
+
+if __name__ == '__main__':
+    unittest.main()
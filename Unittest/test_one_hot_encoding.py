@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+from src.numerical_representation import OneHotEncoding, AMINO_ACIDS, PAD_INDEX, UNKNOWN_INDEX
+
+class TestOneHotEncoding(unittest.TestCase):
+    """
+    This class contains unit tests for the batch one-hot encoder.
+    """
+
+    def setUp(self):
+        """
+        Set up the encoder and a batch of sequences of different lengths.
+        """
+        self.encoder = OneHotEncoding()
+        self.sequences = ['ACDEFGHIKLMNPQRSTVWY', 'MKT', 'WWYA']
+
+    def test_encode_batch_matches_reference(self):
+        one_hot = self.encoder.encode_batch(self.sequences)
+        self.assertEqual(one_hot.shape, (3, 20, 20))
+        self.assertEqual(one_hot.dtype, np.uint8)
+        for i, seq in enumerate(self.sequences):
+            expected = np.zeros((20, 20), dtype=np.uint8)
+            for pos, aa in enumerate(seq):
+                expected[pos, AMINO_ACIDS.index(aa)] = 1
+            np.testing.assert_array_equal(one_hot[i], expected)
+
+    def test_single_sequence_encode(self):
+        encoded = self.encoder.encode('MKT')
+        self.assertEqual(encoded.shape, (60,))
+        self.assertEqual(encoded.sum(), 3)
+        self.assertEqual(encoded[AMINO_ACIDS.index('M')], 1)
+
+    def test_padding_and_mask(self):
+        one_hot, mask = self.encoder.encode_batch(self.sequences, max_length=25, return_mask=True)
+        self.assertEqual(one_hot.shape, (3, 25, 20))
+        np.testing.assert_array_equal(mask.sum(axis=1), [20, 3, 4])
+        self.assertEqual(one_hot[1, 3:].sum(), 0)
+        with self.assertRaises(ValueError):
+            self.encoder.encode_batch(self.sequences, max_length=10)
+
+    def test_indices_and_sparse(self):
+        indices = self.encoder.encode_indices(self.sequences)
+        self.assertEqual(indices.dtype, np.int8)
+        self.assertEqual(indices[1, 3], PAD_INDEX)
+        sparse = self.encoder.encode_sparse(self.sequences)
+        dense = self.encoder.encode_batch(self.sequences).reshape(3, -1)
+        np.testing.assert_array_equal(sparse.toarray(), dense)
+
+    def test_packed(self):
+        packed = self.encoder.encode_batch(self.sequences, packed=True)
+        self.assertEqual(packed.shape, (3, 50))
+        unpacked = np.unpackbits(packed, axis=1, count=400).reshape(3, 20, 20)
+        np.testing.assert_array_equal(unpacked, self.encoder.encode_batch(self.sequences))
+
+    def test_non_standard_residues_are_flagged(self):
+        sequences = ['ACX', 'MU-K']
+        self.assertEqual(self.encoder.find_non_standard(sequences), [(0, 2, 'X'), (1, 1, 'U'), (1, 2, '-')])
+        with self.assertRaisesRegex(ValueError, 'Non-standard residues found'):
+            self.encoder.encode_batch(sequences)
+        indices = self.encoder.encode_indices(sequences, unknown='ignore')
+        self.assertEqual(indices[0, 2], UNKNOWN_INDEX)
+        one_hot = self.encoder.encode_batch(sequences, unknown='ignore')
+        self.assertEqual(one_hot[1].sum(), 2)
+
+if __name__ == '__main__':
+    unittest.main()
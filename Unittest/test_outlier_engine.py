@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from scipy.stats import zscore
+from src.data_processing import DataOutliers, OutlierEngine, plot_outliers
+
+class TestOutlierEngine(unittest.TestCase):
+    """
+    This class contains unit tests for the vectorized multi-column outlier engine.
+    """
+
+    def setUp(self):
+        """
+        Set up data with a few planted outliers and missing values.
+        """
+        rng = np.random.default_rng(0)
+        self.data = pd.DataFrame({
+            'ID': [f'Variant_{i}' for i in range(200)],
+            'A': rng.normal(10, 1, 200),
+            'B': rng.normal(0, 5, 200)
+        })
+        self.data.loc[[3, 50], 'A'] = [40.0, -25.0]
+        self.data.loc[7, 'B'] = 90.0
+        self.data.loc[[10, 11], 'B'] = np.nan
+
+    def test_matches_reference_rules(self):
+        result = OutlierEngine().score(self.data, ['A', 'B'])
+        for column in ['A', 'B']:
+            values = self.data[column].dropna()
+            z_outliers = values.index[np.abs(zscore(values)) > 3]
+            self.assertEqual(list(result.outlier_index('zscore', column)), list(z_outliers))
+
+            q1, q3 = self.data[column].quantile(0.25), self.data[column].quantile(0.75)
+            iqr = q3 - q1
+            expected = (self.data[column] < q1 - 1.5 * iqr) | (self.data[column] > q3 + 1.5 * iqr)
+            pd.testing.assert_series_equal(result.mask('iqr', column), expected, check_names=False)
+            self.assertAlmostEqual(result.bounds.loc[('iqr', 'lower'), column], q1 - 1.5 * iqr)
+
+        self.assertIn(3, result.outlier_index('mad', 'A'))
+        self.assertFalse(result.masks['mad'][[10, 11], 1].any())
+        self.assertEqual(result.summary().shape, (3, 2))
+        self.assertEqual(result.to_frame().columns[0], 'A_zscore_outlier')
+
+    def test_unknown_method_and_column(self):
+        with self.assertRaises(ValueError):
+            OutlierEngine(methods=('zscore', 'grubbs'))
+        with self.assertRaises(ValueError):
+            OutlierEngine().score(self.data, ['C'])
+
+    def test_report_and_headless_mode(self):
+        outliers = DataOutliers(self.data)
+        result = outliers.detect_outliers_and_report('A', 'ID', report_file=None, show_plot=False)
+        self.assertEqual(list(result.masks), ['zscore', 'iqr'])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report_file = os.path.join(tmp_dir, 'outlier_report.txt')
+            outliers.detect_outliers_and_report('A', 'ID', report_file=report_file, show_plot=False)
+            with open(report_file) as f:
+                lines = f.read().split('\n')
+        self.assertEqual(lines[0], '=== Z-Score Method ===')
+        self.assertEqual(lines[1], 'Outliers are defined as values with a Z-score > 3 or < -3.')
+        self.assertEqual(lines[2], 'Total Outliers: 2')
+        self.assertEqual(lines[3], 'Variant_3: 40.0')
+        self.assertIn('=== IQR Method ===', lines)
+
+    def test_plot_downsamples_inliers(self):
+        result = DataOutliers(self.data).detect_outliers(['A'], methods=('zscore', 'iqr'))
+        fig = plot_outliers(result, self.data, 'A', 'ID', max_points=20, show=False)
+        self.assertEqual(len(fig.data), 2)
+        self.assertEqual(len(fig.data[0].x), 20 + result.masks['zscore'].sum())
+        self.assertIn('Variant_3', list(fig.data[0].text))
+
+if __name__ == '__main__':
+    unittest.main()
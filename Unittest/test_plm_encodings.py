@@ -0,0 +1,335 @@
+import unittest
+from types import SimpleNamespace
+import numpy as np
+import torch
+from src.numerical_representation import (Esm1v_Encoding, Prott5Encoding, AMINO_ACIDS, compare_precisions, length_batches,
+                                          parse_variant_id, compare_window_embeddings, sliding_windows, window_weights,
+                                          ExtractionSpec, POOLINGS)
+import src.numerical_representation as numerical_representation
+from tiny_models import tiny_esm1v, tiny_prott5
+
+class TestLengthBatches(unittest.TestCase):
+    """
+    This class contains unit tests for the length-bucketed batching helper.
+    """
+
+    def test_batches_fit_token_budget(self):
+        lengths = np.array([5, 50, 12, 7, 49, 300, 3])
+        batches = length_batches(lengths, max_tokens=100)
+        self.assertEqual(sorted(np.concatenate(batches)), list(range(len(lengths))))
+        for batch in batches:
+            self.assertTrue(len(batch) == 1 or len(batch) * lengths[batch].max() <= 100)
+
+    def test_max_batch_size(self):
+        batches = length_batches([10] * 7, max_tokens=1000, max_batch_size=3)
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 1])
+
+class TestBatchedEmbeddings(unittest.TestCase):
+    """
+    This class contains unit tests for the batched ESM-1v and ProtT5 embeddings.
+    """
+
+    def setUp(self):
+        """
+        Set up tiny randomly initialised encoders and sequences of different lengths.
+        """
+        model, alphabet = tiny_esm1v()
+        self.esm1v_encoder = Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet)
+        model, tokenizer = tiny_prott5()
+        self.prott5_encoder = Prott5Encoding(device='cpu', model=model, tokenizer=tokenizer)
+        self.sequences = ['MKTAYIAKQR', 'ACDEFGHIKLMNPQRSTVWY', 'MKV', 'GGSGGSGGSGGSGGSGGSGGSGGS', 'MUTX']
+
+    def test_esm1v_batched_matches_per_sequence(self):
+        batched = self.esm1v_encoder.calculate_esm1v_embeddings(self.sequences, max_tokens=40)
+        self.assertEqual(batched.shape, (5, 32))
+        for i, seq in enumerate(self.sequences):
+            single = self.esm1v_encoder.generate_esm1v_embedding(seq)
+            self.assertEqual(single.shape, (1, 32))
+            np.testing.assert_allclose(batched[i], single[0], atol=1e-5)
+
+    def test_esm1v_pooling_skips_special_tokens(self):
+        encoder = self.esm1v_encoder
+        batch_labels, batch_strs, tokens = encoder.batch_converter([('seq', 'MKV')])
+        results = encoder.esm_model(tokens, repr_layers=[encoder.repr_layer])
+        expected = results['representations'][encoder.repr_layer][0, 1:-1].mean(0).detach().numpy()
+        np.testing.assert_allclose(encoder.calculate_esm1v_embedding('MKV')[0], expected, atol=1e-5)
+
+    def test_prott5_batched_matches_per_sequence(self):
+        batched = self.prott5_encoder.calculate_prott5_embeddings(self.sequences, max_tokens=40)
+        self.assertEqual(batched.shape, (5, 32))
+        for i, seq in enumerate(self.sequences):
+            single = self.prott5_encoder.generate_prott5_embedding(seq)
+            np.testing.assert_allclose(batched[i], single[0], atol=1e-5)
+
+    def test_prott5_sequence_preparation(self):
+        self.assertEqual(Prott5Encoding.prepare_sequence('MUZK'), 'M X X K')
+
+class TestVariantScoring(unittest.TestCase):
+    """
+    This class contains unit tests for wildtype-marginal variant scoring with ESM-1v.
+    """
+
+    def setUp(self):
+        """
+        Set up a tiny encoder that counts the sequences it runs through the model.
+        """
+        model, alphabet = tiny_esm1v()
+        self.encoder = Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet)
+        self.wildtype = 'MKTAYIAKQRQISFVKSHFS'
+        self.forward_rows = []
+        forward = model.forward
+
+        def counting_forward(tokens, *args, **kwargs):
+            self.forward_rows.append(tokens.shape[0])
+            return forward(tokens, *args, **kwargs)
+        model.forward = counting_forward
+
+        self.library = [f'{wt}{pos + 1}{mut}' for pos, wt in enumerate(self.wildtype) for mut in AMINO_ACIDS if mut != wt]
+
+    def _reference_log_probs(self, tokens, token_position):
+        with torch.no_grad():
+            logits = self.encoder.esm_model(tokens)['logits']
+        return torch.log_softmax(logits[0, token_position], dim=-1)
+
+    def test_parse_variant_id(self):
+        self.assertEqual(parse_variant_id('A12G:L57P'), [('A', 12, 'G'), ('L', 57, 'P')])
+        with self.assertRaises(ValueError):
+            parse_variant_id('A12')
+
+    def test_wt_marginal_single_forward_pass(self):
+        scores = self.encoder.score_variants(self.wildtype, self.library)
+        self.assertEqual(len(scores), 19 * len(self.wildtype))
+        self.assertEqual(self.forward_rows, [1])
+
+        batch_labels, batch_strs, tokens = self.encoder.batch_converter([('wt', self.wildtype)])
+        log_probs = self._reference_log_probs(tokens, 3)
+        alphabet = self.encoder.esm_alphabet
+        expected = (log_probs[alphabet.get_idx('W')] - log_probs[alphabet.get_idx('T')]).item()
+        n_calls = len(self.forward_rows)
+        self.assertAlmostEqual(self.encoder.score_variants(self.wildtype, ['T3W'])[0], expected, places=5)
+        self.assertEqual(len(self.forward_rows), n_calls)
+
+    def test_masked_marginal_at_most_one_row_per_position(self):
+        scores = self.encoder.score_variants(self.wildtype, self.library, strategy='masked-marginal', max_tokens=100)
+        self.assertEqual(sum(self.forward_rows), len(self.wildtype))
+        self.assertLess(len(self.forward_rows), len(self.wildtype))
+
+        batch_labels, batch_strs, tokens = self.encoder.batch_converter([('wt', self.wildtype)])
+        tokens[0, 5] = self.encoder.esm_alphabet.mask_idx
+        log_probs = self._reference_log_probs(tokens, 5)
+        alphabet = self.encoder.esm_alphabet
+        expected = (log_probs[alphabet.get_idx('P')] - log_probs[alphabet.get_idx('Y')]).item()
+        self.assertAlmostEqual(scores[self.library.index('Y5P')], expected, places=5)
+
+    def test_multi_mutant_is_sum_of_singles(self):
+        singles = self.encoder.score_variants(self.wildtype, ['M1A', 'K2L'], strategy='masked-marginal')
+        double = self.encoder.score_variants(self.wildtype, ['M1A:K2L'], strategy='masked-marginal')
+        self.assertEqual(sum(self.forward_rows), 2)
+        self.assertAlmostEqual(double[0], singles.sum(), places=5)
+
+    def test_mismatched_wildtype_residue(self):
+        with self.assertRaisesRegex(ValueError, 'does not match'):
+            self.encoder.score_variants(self.wildtype, ['A1G'])
+
+class TestPrecisionModes(unittest.TestCase):
+    """
+    This class contains unit tests for the reduced-precision and quantized inference modes.
+    """
+
+    def setUp(self):
+        """
+        Set up reference sequences.
+        """
+        self.sequences = ['MKTAYIAKQRQISFVKSHFS', 'ACDEFGHIKLMNPQRSTVWY', 'MKV', 'GGSGGSGGSGGS']
+
+    def _esm1v_encoder(self, precision):
+        model, alphabet = tiny_esm1v()
+        return Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet, precision=precision)
+
+    def _prott5_encoder(self, precision):
+        model, tokenizer = tiny_prott5()
+        return Prott5Encoding(device='cpu', model=model, tokenizer=tokenizer, precision=precision)
+
+    def test_int8_quantizes_a_copy(self):
+        model, alphabet = tiny_esm1v()
+        encoder = Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet, precision='int8', model_id='tiny-esm1v')
+        self.assertIn('DynamicQuantizedLinear', str(encoder.esm_model))
+        self.assertNotIn('DynamicQuantizedLinear', str(model))
+        self.assertEqual(encoder.cache_model_id, 'tiny-esm1v-int8')
+        self.assertEqual(Esm1v_Encoding(device='cpu', precision='int8').cache_model_id, 'esm1v_t33_650M_UR90S-int8')
+        with self.assertRaises(ValueError):
+            Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet, precision='fp16')
+
+    def test_compare_precisions(self):
+        for factory, method in [(self._esm1v_encoder, 'calculate_esm1v_embeddings'),
+                                (self._prott5_encoder, 'calculate_prott5_embeddings')]:
+            report = compare_precisions(factory, method, self.sequences)
+            self.assertEqual(list(report), ['fp32', 'bf16', 'int8'])
+            self.assertEqual(report['fp32']['max_abs_error'], 0.0)
+            for precision in ['bf16', 'int8']:
+                self.assertGreater(report[precision]['min_cosine_similarity'], 0.95)
+                self.assertGreater(report[precision]['max_abs_error'], 0.0)
+                self.assertGreater(report[precision]['sequences_per_s'], 0)
+            self.assertLess(report['int8']['model_mb'], report['fp32']['model_mb'])
+            self.assertIn('rss_delta_mb', report['fp32'])
+
+    def test_compare_precisions_skips_int8_off_cpu_and_releases_models(self):
+        model, alphabet = tiny_esm1v(layers=Esm1v_Encoding.PRETRAINED_LAYERS)
+        numerical_representation._PRETRAINED_MODELS[('esm1v', 'cpu', 'fp32')] = (model, alphabet)
+        try:
+            report = compare_precisions(lambda precision: Esm1v_Encoding(device='cpu', precision=precision),
+                                        'calculate_esm1v_embeddings', self.sequences)
+            self.assertEqual(list(report), ['fp32', 'bf16', 'int8'])
+            # The int8 copy made for the report is released, the preloaded fp32 weights are kept.
+            self.assertEqual(list(numerical_representation._PRETRAINED_MODELS), [('esm1v', 'cpu', 'fp32')])
+        finally:
+            numerical_representation._PRETRAINED_MODELS.clear()
+
+        def gpu_encoder(precision):
+            if precision == 'int8':
+                raise AssertionError('int8 must not be built off CPU')
+            # Stands in for an encoder on a GPU; the embeddings themselves are irrelevant here.
+            return SimpleNamespace(device=torch.device('cuda'), model=torch.nn.Linear(4, 4),
+                                   embed=lambda sequences: np.ones((len(sequences), 4), dtype=np.float32))
+        report = compare_precisions(gpu_encoder, 'embed', self.sequences)
+        self.assertEqual(list(report), ['fp32', 'bf16', 'int8'])
+        self.assertIn('CPU', report['int8']['skipped'])
+
+    def test_bf16_variant_scores(self):
+        wildtype = 'MKTAYIAKQR'
+        fp32 = self._esm1v_encoder('fp32').score_variants(wildtype, ['M1A', 'K2L:T3W'])
+        bf16 = self._esm1v_encoder('bf16').score_variants(wildtype, ['M1A', 'K2L:T3W'])
+        np.testing.assert_allclose(bf16, fp32, rtol=0.05)
+
+class TestWindowedEmbeddings(unittest.TestCase):
+    """
+    This class contains unit tests for the sliding-window embeddings of long sequences.
+    """
+
+    def setUp(self):
+        """
+        Set up tiny encoders, a forward hook recording the input lengths, and random sequences.
+        """
+        model, alphabet = tiny_esm1v()
+        self.esm1v_encoder = Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet)
+        model, tokenizer = tiny_prott5()
+        self.prott5_encoder = Prott5Encoding(device='cpu', model=model, tokenizer=tokenizer)
+        self.token_lengths = []
+        for model in [self.esm1v_encoder.esm_model, self.prott5_encoder.t5_model]:
+            model.register_forward_pre_hook(lambda module, args, kwargs: self.token_lengths.append(
+                (args[0] if args else kwargs['input_ids']).shape[1]), with_kwargs=True)
+        rng = np.random.default_rng(0)
+        self.sequences = [''.join(rng.choice(list(AMINO_ACIDS), size=length)) for length in [150, 260, 60]]
+
+    def test_windows_cover_and_weights_sum_to_one(self):
+        windows = sliding_windows(260, 100, 40)
+        self.assertEqual(windows, [(0, 100), (40, 140), (80, 180), (120, 220), (160, 260)])
+        self.assertEqual(sliding_windows(60, 100, 40), [(0, 60)])
+        total = np.zeros(260)
+        for (start, stop), weight in zip(windows, window_weights(260, windows)):
+            total[start:stop] += weight
+        np.testing.assert_allclose(total, 1.0)
+        with self.assertRaises(ValueError):
+            sliding_windows(260, 100, 0)
+
+    def test_windows_bound_the_model_input(self):
+        for embed, special_tokens in [(self.esm1v_encoder.calculate_esm1v_embeddings, 2),
+                                      (self.prott5_encoder.calculate_prott5_embeddings, 1)]:
+            full = embed(self.sequences, window=None)
+            self.token_lengths.clear()
+            windowed = embed(self.sequences, window=100, stride=50, max_tokens=300)
+            self.assertEqual(windowed.shape, full.shape)
+            self.assertLessEqual(max(self.token_lengths), 100 + special_tokens)
+            np.testing.assert_allclose(windowed[2], full[2], atol=1e-5)
+            np.testing.assert_allclose(embed(self.sequences, window=300), full, atol=1e-5)
+
+    def test_esm1v_splits_sequences_longer_than_the_context(self):
+        self.token_lengths.clear()
+        embedding = self.esm1v_encoder.calculate_esm1v_embeddings(['MKTAYIAKQR' * 150])
+        self.assertEqual(embedding.shape, (1, 32))
+        self.assertTrue(np.isfinite(embedding).all())
+        self.assertLessEqual(max(self.token_lengths), 1024)
+
+    def test_residue_embeddings_are_stitched(self):
+        full = self.esm1v_encoder.calculate_esm1v_residue_embeddings(self.sequences[1], window=None)
+        windowed = self.esm1v_encoder.calculate_esm1v_residue_embeddings(self.sequences[1], window=120, stride=60)
+        self.assertEqual(windowed.shape, (260, 32))
+        np.testing.assert_allclose(full.mean(axis=0),
+                                   self.esm1v_encoder.calculate_esm1v_embeddings(self.sequences[1:2], window=None)[0],
+                                   atol=1e-5)
+        pooled = self.esm1v_encoder.calculate_esm1v_embeddings(self.sequences[1:2], window=120, stride=60)[0]
+        np.testing.assert_allclose(windowed.mean(axis=0), pooled, atol=1e-5)
+
+    def test_window_report(self):
+        report = compare_window_embeddings(self.prott5_encoder.calculate_prott5_embeddings, self.sequences, 100)
+        self.assertEqual((report['n_sequences'], report['window'], report['stride']), (2, 100, 50))
+        self.assertGreater(report['cosine_min'], 0.9)
+        self.assertGreater(report['max_abs_error'], 0.0)
+
+class TestFeatureExtraction(unittest.TestCase):
+    """
+    This class contains unit tests for the multi-layer, multi-pooling extraction.
+    """
+
+    def setUp(self):
+        """
+        Set up tiny encoders with a forward hook counting the batches, and mutant sequences with their IDs.
+        """
+        model, alphabet = tiny_esm1v(layers=3)
+        self.esm1v_encoder = Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet)
+        model, tokenizer = tiny_prott5(layers=3)
+        self.prott5_encoder = Prott5Encoding(device='cpu', model=model, tokenizer=tokenizer)
+        self.forward_calls = []
+        for model in [self.esm1v_encoder.esm_model, self.prott5_encoder.t5_model]:
+            model.register_forward_pre_hook(lambda module, args: self.forward_calls.append(module))
+        self.sequences = ['MKAAYIAKQR', 'ACDEFHHIKMMNPQRSTVWY', 'KKV']
+        self.variant_ids = ['T3A', 'G6H:L10M', 'M1K']
+
+    def test_layers_are_resolved(self):
+        spec = ExtractionSpec(layers=[-1, 0, 3, -1])
+        self.assertEqual(spec.resolve_layers(3), [3, 0])
+        with self.assertRaises(ValueError):
+            spec.resolve_layers(2)
+        with self.assertRaises(ValueError):
+            ExtractionSpec(poolings=['median'])
+
+    def test_esm1v_single_pass_matches_separate_outputs(self):
+        spec = ExtractionSpec(layers=[1, -1], poolings=POOLINGS)
+        features = self.esm1v_encoder.extract_esm1v_features(self.sequences, spec, self.variant_ids, max_tokens=1000)
+        self.assertEqual(len(self.forward_calls), 1)
+        self.assertEqual(sorted(features), sorted(f'layer{layer}_{pooling}' for layer in [1, 3] for pooling in POOLINGS))
+
+        np.testing.assert_allclose(features['layer3_mean'],
+                                   self.esm1v_encoder.calculate_esm1v_embeddings(self.sequences), atol=1e-5)
+        encoder = self.esm1v_encoder
+        for i, seq in enumerate(self.sequences):
+            batch_labels, batch_strs, tokens = encoder.batch_converter([('seq', seq)])
+            representations = encoder.esm_model(tokens, repr_layers=[1])['representations'][1][0].detach().numpy()
+            residues = representations[1:-1]
+            positions = [position - 1 for wt, position, mut in parse_variant_id(self.variant_ids[i])]
+            np.testing.assert_allclose(features['layer1_max'][i], residues.max(0), atol=1e-5)
+            np.testing.assert_allclose(features['layer1_bos'][i], representations[0], atol=1e-5)
+            np.testing.assert_allclose(features['layer1_mutated'][i], residues[positions].mean(0), atol=1e-5)
+
+    def test_prott5_single_pass_matches_separate_outputs(self):
+        spec = ExtractionSpec(layers=[-1], poolings=['mean', 'max', 'mutated'])
+        variant_ids = dict(zip(self.sequences, self.variant_ids))
+        features = self.prott5_encoder.extract_prott5_features(self.sequences, spec, variant_ids, max_tokens=1000)
+        self.assertEqual(len(self.forward_calls), 1)
+        np.testing.assert_allclose(features['layer3_mean'],
+                                   self.prott5_encoder.calculate_prott5_embeddings(self.sequences), atol=1e-5)
+        residues = self.prott5_encoder.calculate_prott5_residue_embeddings(self.sequences[1])
+        np.testing.assert_allclose(features['layer3_max'][1], residues.max(0), atol=1e-5)
+        np.testing.assert_allclose(features['layer3_mutated'][1], residues[[5, 9]].mean(0), atol=1e-5)
+        with self.assertRaises(ValueError):
+            self.prott5_encoder.extract_prott5_features(self.sequences, ExtractionSpec(poolings=['bos']))
+
+    def test_mutated_pooling_checks_the_variant_ids(self):
+        spec = ExtractionSpec(poolings=['mutated'])
+        with self.assertRaises(ValueError):
+            self.esm1v_encoder.extract_esm1v_features(self.sequences, spec)
+        with self.assertRaisesRegex(ValueError, 'does not match'):
+            self.esm1v_encoder.extract_esm1v_features(self.sequences, spec, ['T3A', 'G6H:L10M', 'M1A'])
+
+if __name__ == '__main__':
+    unittest.main()
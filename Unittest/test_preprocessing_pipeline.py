@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from src.data_processing import (DataOutliers, LogarithmicTransform, MeanAndStd, PreprocessingPipeline,
+                                 QuantileSketch, read_table_chunks)
+
+class TestPreprocessingPipeline(unittest.TestCase):
+    """
+    This class contains unit tests for the fused replicate, log and outlier pipeline.
+    """
+
+    def setUp(self):
+        """
+        Set up a replicate table with a few extreme variants and missing replicates.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.replicates = ['rep1', 'rep2', 'rep3']
+        self.data = pd.DataFrame(rng.lognormal(0, 0.3, size=(5000, 3)) * 50, columns=self.replicates)
+        self.data.loc[:9, self.replicates] *= 40
+        self.data.loc[rng.choice(len(self.data), 200, replace=False), 'rep3'] = np.nan
+        self.data.insert(0, 'ID', [f'Variant_{i}' for i in range(len(self.data))])
+        self.wild_type = 50.0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_matches_chained_stages(self):
+        pipeline = PreprocessingPipeline(self.replicates, self.wild_type, keep_columns=['ID'], methods=('zscore', 'iqr', 'mad'))
+        processed, result = pipeline.run(self.data)
+
+        mean, std = MeanAndStd(self.data).get_mean_and_std(self.replicates)
+        chained = pd.DataFrame({'ID': self.data['ID'], 'mean': mean, 'std': std})
+        chained['log_fitness'] = LogarithmicTransform(chained).transform_to_logarithmic('mean', self.wild_type)
+        expected = DataOutliers(chained).detect_outliers(['log_fitness'], methods=('zscore', 'iqr', 'mad'))
+
+        np.testing.assert_allclose(processed['mean'], mean, rtol=1e-12)
+        np.testing.assert_allclose(processed['std'], std, rtol=1e-12)
+        np.testing.assert_allclose(processed['log_fitness'], chained['log_fitness'], rtol=1e-12)
+        pd.testing.assert_frame_equal(result.to_frame(), expected.to_frame())
+        self.assertTrue(processed['log_fitness_zscore_outlier'].iloc[:10].all())
+        self.assertEqual(set(pipeline.timings), {'replicates', 'log', 'outliers'})
+
+    def test_validation(self):
+        with self.assertRaisesRegex(ValueError, 'rep4'):
+            PreprocessingPipeline(self.replicates + ['rep4'], self.wild_type).run(self.data)
+        with self.assertRaisesRegex(ValueError, 'positive'):
+            PreprocessingPipeline(self.replicates, 0.0)
+
+        data = self.data.copy()
+        data.loc[3, self.replicates] = [-1.0, 0.0, 0.5]
+        with self.assertRaisesRegex(ValueError, 'Variant_3'):
+            PreprocessingPipeline(self.replicates, self.wild_type, id_column='ID').run(data)
+
+        input_file, output_file = [os.path.join(self.tmp_dir.name, name) for name in ['in.csv', 'out.csv']]
+        data.to_csv(input_file, index=False)
+        with self.assertRaisesRegex(ValueError, 'Variant_3'):
+            PreprocessingPipeline(self.replicates, self.wild_type, id_column='ID').run_file(input_file, output_file,
+                                                                                            chunksize=1000)
+        self.assertFalse(os.path.exists(output_file))
+
+        processed, result = PreprocessingPipeline(self.replicates, self.wild_type, non_positive='nan').run(data)
+        self.assertTrue(np.isnan(processed.loc[3, 'log_fitness']))
+        self.assertFalse(result.to_frame().loc[3].any())
+
+    def test_streaming_matches_in_memory(self):
+        input_file, output_file = [os.path.join(self.tmp_dir.name, name) for name in ['in.parquet', 'out.parquet']]
+        self.data.to_parquet(input_file, index=False)
+        methods = ('zscore', 'iqr', 'mad')
+        in_memory, result = PreprocessingPipeline(self.replicates, self.wild_type, keep_columns=['ID'],
+                                                  methods=methods).run(self.data)
+
+        pipeline = PreprocessingPipeline(self.replicates, self.wild_type, keep_columns=['ID'], methods=methods)
+        counts = pipeline.run_file(input_file, output_file, chunksize=700)
+        streamed = pd.concat(read_table_chunks(output_file), ignore_index=True)
+
+        self.assertEqual(list(streamed.columns), list(in_memory.columns))
+        np.testing.assert_allclose(streamed['log_fitness'], in_memory['log_fitness'], rtol=1e-12)
+        np.testing.assert_allclose(pipeline.bounds.loc[('zscore', 'upper')], result.bounds.loc[('zscore', 'upper')],
+                                   rtol=1e-9)
+        np.testing.assert_allclose(pipeline.bounds, result.bounds, atol=0.02)
+        for method in methods:
+            flags = f'log_fitness_{method}_outlier'
+            self.assertEqual(counts.loc[method, 'log_fitness'], streamed[flags].sum())
+            self.assertLessEqual((streamed[flags] != in_memory[flags]).sum(), 5)
+        self.assertTrue(set(pipeline.timings) <= set(PreprocessingPipeline.STAGES))
+
+    def test_quantile_sketch(self):
+        values = np.random.default_rng(1).normal(size=200000)
+        sketch, other = QuantileSketch(k=512), QuantileSketch(k=512, seed=1)
+        for chunk in np.array_split(values[:150000], 13):
+            sketch.update(chunk)
+        other.update(values[150000:])
+        sketch.merge(other)
+
+        self.assertEqual(sketch.weighted_items()[1].sum(), len(values))
+        for q, estimate in zip([0.05, 0.25, 0.5, 0.75, 0.95], sketch.quantile([0.05, 0.25, 0.5, 0.75, 0.95])):
+            self.assertAlmostEqual((values < estimate).mean(), q, delta=0.01)
+        np.testing.assert_allclose(QuantileSketch().quantile([0.1, 0.5]), [np.nan, np.nan])
+
+        small = QuantileSketch()
+        small.update([4.0, np.nan, 1.0, 2.0])
+        np.testing.assert_allclose(small.quantile([0, 0.5, 0.8]), np.quantile([4.0, 1.0, 2.0], [0, 0.5, 0.8]))
+
+if __name__ == '__main__':
+    unittest.main()
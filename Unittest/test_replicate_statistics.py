@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from src.data_processing import MeanAndStd, RunningStats, read_table_chunks
+
+class TestStreamingMeanAndStd(unittest.TestCase):
+    """
+    This class contains unit tests for the out-of-core replicate statistics.
+    """
+
+    def setUp(self):
+        """
+        Set up a replicate table with missing replicates and write it to disk.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.replicates = ['rep1', 'rep2', 'rep3']
+        self.data = pd.DataFrame(rng.lognormal(1, 0.5, size=(1003, 3)) * 1e3, columns=self.replicates)
+        self.data.insert(0, 'ID', [f'Variant_{i}' for i in range(len(self.data))])
+        self.data.loc[rng.choice(len(self.data), 100, replace=False), 'rep2'] = np.nan
+        self.data.loc[[5, 6], self.replicates] = np.nan
+        self.data.loc[7, ['rep1', 'rep3']] = np.nan
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def test_matches_in_memory_path(self):
+        for extension in ['csv', 'parquet']:
+            input_file, output_file = self._path(f'data.{extension}'), self._path(f'out.{extension}')
+            if extension == 'csv':
+                self.data.to_csv(input_file, index=False)
+                in_memory = pd.read_csv(input_file)
+            else:
+                self.data.to_parquet(input_file, index=False)
+                in_memory = pd.read_parquet(input_file)
+            mean, std = MeanAndStd(in_memory).get_mean_and_std(self.replicates)
+
+            stats = MeanAndStd.stream_mean_and_std(input_file, self.replicates, output_file, keep_columns=['ID'],
+                                                   chunksize=100)
+            # The round-trip parser reads back exactly the floats that were written.
+            streamed = pd.concat(read_table_chunks(output_file, float_precision='round_trip'), ignore_index=True)
+
+            self.assertEqual(list(streamed.columns), ['ID', 'mean', 'std', 'n_replicates'])
+            self.assertEqual(streamed['ID'].tolist(), self.data['ID'].tolist())
+            np.testing.assert_array_equal(streamed['mean'], mean)
+            np.testing.assert_array_equal(streamed['std'], std)
+            self.assertEqual(streamed['n_replicates'].tolist()[5:8], [0, 0, 1])
+
+            expected = in_memory[self.replicates].assign(mean=mean)
+            summary = stats.to_frame()
+            np.testing.assert_allclose(summary['mean'], expected.mean(), rtol=1e-12)
+            np.testing.assert_allclose(summary['std'], expected.std(), rtol=1e-10)
+            np.testing.assert_array_equal(summary['count'], expected.notna().sum())
+
+    def test_running_stats_merge(self):
+        rng = np.random.default_rng(1)
+        values = rng.normal(1e6, 1.0, size=(5000, 2))
+        values[::7, 1] = np.nan
+        first, second = RunningStats(['a', 'b']), RunningStats(['a', 'b'])
+        for chunk in np.array_split(values[:3000], 7):
+            first.update(chunk)
+        second.update(values[3000:])
+        first.merge(second)
+
+        np.testing.assert_allclose(first.mean, np.nanmean(values, axis=0), rtol=1e-14)
+        np.testing.assert_allclose(first.variance(), np.nanvar(values, axis=0, ddof=1), rtol=1e-9)
+        np.testing.assert_array_equal(first.max, np.nanmax(values, axis=0))
+
+        empty = RunningStats(['c'])
+        empty.update(np.full((3, 1), np.nan))
+        self.assertTrue(empty.to_frame().loc['c', ['mean', 'std', 'min']].isna().all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import functools
+import os
+import sys
+import unittest
+import tempfile
+import h5py
+import numpy as np
+from src.embedding_cache import EmbeddingCache
+from src.sharded_execution import ShardedEmbedder, length_balanced_shards
+from tiny_models import tiny_esm1v_encoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Tutorials'))
+from sequence_representation import stream_embeddings
+
+class TestShardedExecution(unittest.TestCase):
+    """
+    This class contains unit tests for the multi-process sharded embedding mode.
+    """
+
+    def setUp(self):
+        """
+        Set up sequences of varied lengths.
+        """
+        rng = np.random.default_rng(0)
+        self.sequences = [''.join(rng.choice(list('ACDEFGHIKLMNPQRSTVWY'), length))
+                          for length in rng.integers(5, 60, size=23)]
+        self.ids = [f'variant_{i}' for i in range(len(self.sequences))]
+
+    def test_length_balanced_shards(self):
+        lengths = [100] * 10 + [10] * 100
+        shards = length_balanced_shards(lengths, rows_per_shard=22)
+        self.assertEqual(shards[0][0], 0)
+        self.assertEqual(shards[-1][1], len(lengths))
+        for (start, stop), (next_start, _) in zip(shards, shards[1:]):
+            self.assertEqual(stop, next_start)
+        residues = [sum(lengths[start:stop]) for start, stop in shards]
+        self.assertLess(max(residues) - min(residues), 2 * 100)
+        self.assertLess(shards[0][1] - shards[0][0], shards[-1][1] - shards[-1][0])
+        self.assertEqual(length_balanced_shards([]), [])
+
+    def test_sharded_matches_serial(self):
+        serial = tiny_esm1v_encoder().calculate_esm1v_embeddings(self.sequences)
+        embedder = ShardedEmbedder(tiny_esm1v_encoder, 'calculate_esm1v_embeddings', n_workers=2,
+                                   threads_per_worker=1, method_kwargs={'max_tokens': 200})
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'esm1v.h5')
+            stream_embeddings(path, 'esm1v', self.ids, self.sequences, None, block_size=5, embedder=embedder)
+            with h5py.File(path, 'r') as f:
+                np.testing.assert_allclose(f['esm1v'][:], serial, atol=1e-5)
+                self.assertEqual([seq_id.decode() for seq_id in f['ids'][:]], self.ids)
+
+        stats = embedder.worker_stats()
+        self.assertEqual(sum(worker['sequences'] for worker in stats.values()), len(self.sequences))
+        for worker in stats.values():
+            self.assertGreater(worker['sequences_per_s'], 0)
+
+    def test_worker_cache_stats(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = EmbeddingCache(tmp_dir)
+            tiny_esm1v_encoder(cache).calculate_esm1v_embeddings(self.sequences[:10])
+            embedder = ShardedEmbedder(functools.partial(tiny_esm1v_encoder, cache=cache), 'calculate_esm1v_embeddings',
+                                       n_workers=2, threads_per_worker=1)
+            list(embedder.imap([self.sequences[:12], self.sequences[12:]]))
+            self.assertEqual((cache.hits, cache.misses), (0, 10))
+
+        self.assertEqual(embedder.cache_stats(), {'cache_hits': 10, 'cache_misses': 13, 'cache_hit_rate': 10 / 23})
+        self.assertEqual(sum(worker['cache_hits'] for worker in embedder.worker_stats().values()), 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import h5py
+from src.similarity_index import SimilarityIndex
+
+class TestSimilarityIndex(unittest.TestCase):
+    """
+    This class contains unit tests for the blockwise nearest-neighbour and diversity-selection index.
+    """
+
+    def setUp(self):
+        """
+        Set up clustered embeddings and a few queries near them.
+        """
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(20, 16)).astype(np.float32)
+        self.features = (centers[rng.integers(0, 20, size=2000)] + 0.3 * rng.normal(size=(2000, 16))).astype(np.float32)
+        self.queries = self.features[rng.choice(2000, size=25, replace=False)] + 0.05 * rng.normal(size=(25, 16))
+
+    def brute_force(self, metric, k):
+        if metric == 'cosine':
+            unit = lambda x: x / np.linalg.norm(x, axis=1, keepdims=True)
+            scores = unit(self.queries) @ unit(self.features).T
+            rows = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+        else:
+            scores = np.linalg.norm(self.queries[:, None, :] - self.features[None, :, :], axis=2)
+            rows = np.argsort(scores, axis=1, kind='stable')[:, :k]
+        return rows, np.take_along_axis(scores, rows, axis=1)
+
+    def test_blockwise_search_matches_brute_force(self):
+        for metric in ['cosine', 'l2']:
+            index = SimilarityIndex(self.features, metric=metric, block_rows=300)
+            rows, scores = index.search(self.queries, k=7)
+            expected_rows, expected_scores = self.brute_force(metric, 7)
+            np.testing.assert_array_equal(rows, expected_rows)
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-4, atol=1e-4)
+        rows, scores = SimilarityIndex(self.features[:3], block_rows=2).search(self.queries[0], k=5)
+        self.assertEqual(rows[0, 3:].tolist(), [-1, -1])
+        with self.assertRaises(ValueError):
+            SimilarityIndex(self.features, metric='dot')
+
+    def test_reads_h5_datasets_in_blocks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'esm1v.h5')
+            with h5py.File(path, 'w') as handle:
+                handle.create_dataset('esm1v', data=self.features)
+            with h5py.File(path, 'r') as handle:
+                index = SimilarityIndex(handle['esm1v'], metric='l2', block_rows=256)
+                rows, _ = index.search(self.queries, k=5)
+                index.build_ivf(n_lists=10, seed=1)
+                approximate, _ = index.search(self.queries, k=5, n_probe=10)
+                selected, _ = index.farthest_point_selection(5, seed_rows=[3, 1])
+        np.testing.assert_array_equal(rows, self.brute_force('l2', 5)[0])
+        np.testing.assert_array_equal(approximate, rows)
+        self.assertEqual(len(selected), 5)
+
+    def test_approximate_search_recall(self):
+        index = SimilarityIndex(self.features, block_rows=500)
+        sizes = index.build_ivf(n_lists=20, n_iter=10, seed=0)
+        self.assertEqual(sizes.sum(), len(self.features))
+        report = index.compare_to_exact(self.queries, k=5, n_probe=3)
+        self.assertGreaterEqual(report['recall'], 0.9)
+        self.assertEqual(index.compare_to_exact(self.queries, k=5, n_probe=20)['recall'], 1.0)
+        with self.assertRaises(ValueError):
+            SimilarityIndex(self.features).search(self.queries, k=5, n_probe=2)
+
+    def test_farthest_point_selection(self):
+        index = SimilarityIndex(self.features, metric='l2', block_rows=333)
+        selected, radii = index.farthest_point_selection(10, seed_rows=[0, 5])
+        self.assertEqual(len(set(selected.tolist())), 10)
+        self.assertFalse({0, 5} & set(selected.tolist()))
+        self.assertTrue((np.diff(radii) <= 1e-6).all())
+
+        # Each pick is the row farthest from the seeds and the previous picks.
+        chosen = [0, 5]
+        for row, radius in zip(selected, radii):
+            distances = np.linalg.norm(self.features[:, None, :] - self.features[chosen][None, :, :], axis=2).min(axis=1)
+            self.assertEqual(row, np.argmax(distances))
+            self.assertAlmostEqual(radius, distances[row], places=4)
+            chosen.append(row)
+
+        outside, _ = index.farthest_point_selection(3, seed_vectors=self.features[[0, 5]])
+        self.assertEqual(outside[0], selected[0])
+        first, _ = SimilarityIndex(self.features).farthest_point_selection(3, start=42)
+        self.assertEqual(first[0], 42)
+
+if __name__ == '__main__':
+    unittest.main()
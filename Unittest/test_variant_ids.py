@@ -0,0 +1,109 @@
+import unittest
+import numpy as np
+import pandas as pd
+import src.mutant_library as mutant_library
+import src.numerical_representation as numerical_representation
+from src.variant_ids import parse_variant_ids, PAD_RESIDUE, AMINO_ACIDS
+from src.data_processing import OutlierEngine, MeanAndStd, DataOutliers
+from src.create_synthetic_data import ProteinVariantGenerator
+
+class TestVariantIds(unittest.TestCase):
+    """
+    This class contains unit tests for the vectorized variant-ID parser and the positional index.
+    """
+
+    def setUp(self):
+        """
+        Set up a synthetic fitness table with a few multi-mutants and two replicate columns.
+        """
+        data = ProteinVariantGenerator(seed=5, position_range=(1, 40)).generate_data_frame(3000, batched=True)
+        ids = data['ID'].astype(str).tolist()
+        doubles = [f'{first}:{second}' for first, second in zip(ids[1000:1100], ids[2000:2100])
+                   if first[1:-1] != second[1:-1]]
+        ids[:30] = doubles[:30]
+        data['ID'] = ids
+        rng = np.random.default_rng(0)
+        data['rep_1'] = data['Log_fitness'] + rng.normal(scale=0.5, size=len(data))
+        data['rep_2'] = data['Log_fitness'] + rng.normal(scale=0.5, size=len(data))
+        data.loc[7, 'rep_1'] = np.nan
+        self.data = data
+        self.variants = parse_variant_ids(data['ID'])
+        self.index = self.variants.index()
+
+    def reference_mutations(self, variant_id):
+        return [(mutation[0], int(mutation[1:-1]), mutation[-1]) for mutation in variant_id.split(':')]
+
+    def test_parse_matches_the_ids(self):
+        self.assertEqual(self.variants.position.dtype, np.int16)
+        self.assertEqual(self.variants.mutant.dtype, np.uint8)
+        for i, variant_id in enumerate(self.data['ID']):
+            parsed = [(AMINO_ACIDS[self.variants.wildtype[i, j]], int(self.variants.position[i, j]),
+                       AMINO_ACIDS[self.variants.mutant[i, j]]) for j in range(self.variants.order[i])]
+            self.assertEqual(parsed, self.reference_mutations(variant_id))
+        single = np.flatnonzero(self.variants.order == 1)
+        self.assertTrue((self.variants.position[single, 1] == -1).all())
+        self.assertTrue((self.variants.mutant[single, 1] == PAD_RESIDUE).all())
+        categorical = parse_variant_ids(pd.Categorical(self.data['ID']))
+        np.testing.assert_array_equal(categorical.position, self.variants.position)
+
+    def test_invalid_ids_and_wildtype_validation(self):
+        for variant_ids in [['A1'], ['A12G:'], ['1AG'], ['a1G'], ['A1G::L2P'], ['A1G', None]]:
+            with self.assertRaises(ValueError):
+                parse_variant_ids(variant_ids)
+        parsed = parse_variant_ids(['M1A', 'K2A:T3P'], wildtype='MKT')
+        np.testing.assert_array_equal(parsed.order, [1, 2])
+        with self.assertRaisesRegex(ValueError, 'K4A'):
+            parse_variant_ids(['M1A', 'K4A'], wildtype='MKT')
+
+    def test_single_id_parser_and_library_share_the_format(self):
+        self.assertIs(numerical_representation.AMINO_ACIDS, AMINO_ACIDS)
+        self.assertIs(mutant_library.AMINO_ACIDS, AMINO_ACIDS)
+        self.assertEqual(numerical_representation.parse_variant_id('A12G:L57P'), [('A', 12, 'G'), ('L', 57, 'P')])
+        for variant_id in ['A1', 'A12G:', '1AG', 'a1G', 'A1G::L2P']:
+            with self.assertRaises(ValueError):
+                numerical_representation.parse_variant_id(variant_id)
+            with self.assertRaises(ValueError):
+                mutant_library.MutantLibrary('ALGK').add_variant_ids([variant_id])
+
+    def test_index_lookups_match_table_scans(self):
+        mutations = [self.reference_mutations(variant_id) for variant_id in self.data['ID']]
+        expected = [i for i, row in enumerate(mutations) if any(position == 17 for _, position, _ in row)]
+        self.assertEqual(self.index.at_position(17).tolist(), expected)
+        expected = [i for i, row in enumerate(mutations) if any(mut == 'P' for _, _, mut in row)]
+        self.assertEqual(self.index.to_residue('P').tolist(), expected)
+        expected = [i for i, row in enumerate(mutations) if any(wt == 'W' for wt, _, _ in row)]
+        self.assertEqual(self.index.from_residue('W').tolist(), expected)
+        expected = [i for i, row in enumerate(mutations) if any(m[1:] == (17, 'P') for m in row)]
+        self.assertEqual(self.index.with_mutation(17, 'P').tolist(), expected)
+        self.assertEqual(len(self.index.rows('order', 2)), 30)
+        self.assertEqual(len(self.index.at_position(500)), 0)
+
+    def test_group_outliers_match_per_group_scoring(self):
+        labels, offsets, rows = self.index.groups('position')
+        self.assertEqual(list(labels), list(range(1, 41)))
+        result = OutlierEngine().score_groups(self.data, ['rep_1', 'rep_2'], (labels, offsets, rows))
+        for g in [0, 16, 39]:
+            group = self.data.iloc[rows[offsets[g]:offsets[g + 1]]]
+            expected = OutlierEngine().score(group, ['rep_1', 'rep_2'])
+            for method in ['zscore', 'iqr', 'mad']:
+                np.testing.assert_array_equal(result.masks[method][offsets[g]:offsets[g + 1]], expected.masks[method])
+                np.testing.assert_allclose(result.bounds.xs((method, 'upper', labels[g])).to_numpy(),
+                                           expected.bounds.loc[(method, 'upper')].to_numpy(), rtol=1e-12)
+        self.assertEqual(result.to_frame().index.names, ['group', None])
+        detected = DataOutliers(self.data).detect_group_outliers(['rep_1'], self.index.groups('mutant'), methods=['mad'])
+        self.assertEqual(len(detected.index), len(self.index.groups('mutant')[2]))
+
+    def test_group_mean_and_std(self):
+        groups = self.index.groups('position')
+        summary = MeanAndStd(self.data).group_mean_and_std(['rep_1', 'rep_2'], groups)
+        means, _ = MeanAndStd(self.data).get_mean_and_std(['rep_1', 'rep_2'])
+        for label in [1, 17, 40]:
+            rows = self.index.at_position(label)
+            self.assertEqual(summary.loc[label, 'n'], len(rows))
+            self.assertAlmostEqual(summary.loc[label, 'mean'], means.iloc[rows].mean())
+            self.assertAlmostEqual(summary.loc[label, 'std'], means.iloc[rows].std())
+        with self.assertRaises(ValueError):
+            MeanAndStd(self.data).group_mean_and_std(['rep_1'], (groups[0], groups[1][:-1], groups[2]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Small randomly initialised protein language models for running the encoder tests offline on CPU.
+"""
+from argparse import Namespace
+import esm
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers, processors
+from transformers import PreTrainedTokenizerFast, T5Config, T5EncoderModel
+
+
+def tiny_esm1v(seed=0, layers=2, embed_dim=32):
+    """
+    Builds an ESM-1v architecture (roberta_large) with a couple of small layers.
+    """
+    torch.manual_seed(seed)
+    alphabet = esm.Alphabet.from_architecture('roberta_large')
+    args = Namespace(arch='roberta_large', layers=layers, embed_dim=embed_dim, ffn_embed_dim=2 * embed_dim,
+                     attention_heads=4, max_positions=1024, emb_layer_norm_before=False, token_dropout=True,
+                     logit_bias=True)
+    model = esm.ProteinBertModel(args, alphabet)
+    return model.eval(), alphabet
+
+
+def tiny_prott5(seed=0, layers=2, d_model=32):
+    """
+    Builds a small T5 encoder and a tokenizer laid out like the ProtT5 SentencePiece vocabulary,
+    whose residue tokens carry the word-start marker ('▁A', '▁L', ...).
+    """
+    torch.manual_seed(seed)
+    vocab = {'<pad>': 0, '</s>': 1, '<unk>': 2}
+    for aa in 'ALGVSREDTIPKFQNYMHWCXBOUZ':
+        vocab['\u2581' + aa] = len(vocab)
+
+    backend = Tokenizer(models.WordLevel(vocab=vocab, unk_token='<unk>'))
+    backend.pre_tokenizer = pre_tokenizers.Metaspace(replacement='\u2581', prepend_scheme='always')
+    backend.post_processor = processors.TemplateProcessing(single='$A </s>', special_tokens=[('</s>', 1)])
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, pad_token='<pad>', eos_token='</s>',
+                                        unk_token='<unk>')
+
+    config = T5Config(vocab_size=len(vocab), d_model=d_model, d_kv=8, d_ff=2 * d_model, num_layers=layers,
+                      num_heads=4, dropout_rate=0.0)
+    model = T5EncoderModel(config)
+    return model.eval(), tokenizer
+
+
+def tiny_esm1v_encoder(cache=None):
+    """
+    Builds an Esm1v_Encoding around `tiny_esm1v`, picklable as a worker-process factory.
+    """
+    from src.numerical_representation import Esm1v_Encoding
+
+    model, alphabet = tiny_esm1v()
+    return Esm1v_Encoding(device='cpu', model=model, alphabet=alphabet, model_id='tiny-esm1v', cache=cache)
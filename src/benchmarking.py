@@ -0,0 +1,212 @@
+import json
+import os
+import platform
+import threading
+import time
+import tracemalloc
+import numpy as np
+
+try:
+    from .instrumentation import peak_resident_memory_mb, resident_memory_mb
+except ImportError:
+    from instrumentation import peak_resident_memory_mb, resident_memory_mb
+
+# Metrics compared with the baseline, and whether a higher value is better.
+TRACKED_METRICS = {'items_per_s': True, 'peak_traced_mb': False}
+
+
+class PeakMemory:
+    '''
+    Context manager measuring the peak memory of the code it wraps.
+
+    Two measurements are taken. The traced peak comes from `tracemalloc` and covers every Python and
+    NumPy/pandas allocation; it is deterministic, so it is the one compared with a baseline, but it
+    misses buffers allocated by native libraries such as torch tensors. The resident peak is sampled
+    from the process RSS in a background thread and also covers those, at the cost of some noise.
+
+    Parameters:
+        interval (float): Seconds between two RSS samples.
+        trace (bool): Whether to run `tracemalloc`, which slows allocation-heavy code down.
+
+    Attributes:
+        peak_traced_mb (float or None): Peak traced allocations above the start, in MiB.
+        peak_rss_mb (float): Peak resident memory of the process, in MiB.
+        rss_delta_mb (float): Peak resident memory above the resident memory at the start, in MiB.
+    '''
+
+    def __init__(self, interval=0.005, trace=True):
+        self.interval = interval
+        self.trace = trace
+        self.peak_traced_mb = None
+        self.peak_rss_mb = 0.0
+        self.rss_delta_mb = 0.0
+
+    @staticmethod
+    def _rss():
+        # Without a readable current RSS, the process peak is the closest upper bound.
+        rss = resident_memory_mb()
+        return rss if rss is not None else peak_resident_memory_mb()
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self.peak_rss_mb = max(self.peak_rss_mb, self._rss())
+
+    def __enter__(self):
+        self._start_rss = self.peak_rss_mb = self._rss()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        if self.trace:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.trace:
+            self.peak_traced_mb = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        self._done.set()
+        self._thread.join()
+        self.peak_rss_mb = max(self.peak_rss_mb, self._rss())
+        self.rss_delta_mb = self.peak_rss_mb - self._start_rss
+
+
+def run_case(benchmark, func, n_items, size=None, length=None, repeats=3, n_residues=None):
+    '''
+    Times a benchmark case and measures its peak memory.
+
+    The case is run `repeats` times and the fastest run gives the throughput, which filters out
+    warm-up and scheduler noise. Memory is measured in one more run under `tracemalloc`, so tracing
+    never slows the timed runs down.
+
+    Args:
+        benchmark (str): Name of the benchmark.
+        func (callable): Runs the case once, without arguments.
+        n_items (int): Number of rows or sequences processed by one run.
+        size (int, optional): Dataset size of the case, recorded as a parameter.
+        length (int, optional): Sequence length of the case, recorded as a parameter.
+        repeats (int): Number of timed runs.
+        n_residues (int, optional): Number of residues processed by one run, to report residues per second.
+
+    Returns:
+        dict: The case parameters, seconds (fastest run), items_per_s, residues_per_s, peak_traced_mb,
+            peak_rss_mb and rss_delta_mb.
+    '''
+    times = []
+    with PeakMemory(trace=False) as untraced:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    with PeakMemory() as traced:
+        func()
+
+    seconds = min(times)
+    return {
+        'benchmark': benchmark,
+        'size': size,
+        'length': length,
+        'repeats': repeats,
+        'seconds': seconds,
+        'items_per_s': n_items / seconds,
+        'residues_per_s': n_residues / seconds if n_residues else None,
+        'peak_traced_mb': traced.peak_traced_mb,
+        'peak_rss_mb': max(untraced.peak_rss_mb, traced.peak_rss_mb),
+        'rss_delta_mb': max(untraced.rss_delta_mb, traced.rss_delta_mb)
+    }
+
+
+def environment():
+    '''
+    Describes the machine and library versions, since throughput is only comparable on the same setup.
+
+    Returns:
+        dict: Platform, processor, CPU count, Python and NumPy versions, and torch if it is loaded.
+    '''
+    import sys
+
+    info = {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    for module in ('pandas', 'torch'):
+        if module in sys.modules:
+            info[module] = sys.modules[module].__version__
+            if module == 'torch':
+                info['torch_threads'] = sys.modules[module].get_num_threads()
+    return info
+
+
+def _case_key(result):
+    return result['benchmark'], result['size'], result['length']
+
+
+def compare_with_baseline(results, baseline, tolerance=0.3, memory_slack_mb=1.0):
+    '''
+    Flags the cases that got slower or use more memory than in a baseline run.
+
+    Args:
+        results (list of dict): Cases returned by `run_case`.
+        baseline (list of dict): Cases of the baseline run, matched by (benchmark, size, length).
+        tolerance (float): Relative change of a tracked metric allowed before it counts as a regression.
+        memory_slack_mb (float): Absolute memory growth always allowed, so tiny cases do not flag
+            allocator noise.
+
+    Returns:
+        list of dict: One entry per regressed metric with benchmark, size, length, metric, baseline,
+            current and relative change. Cases missing from the baseline are never flagged.
+    '''
+    reference = {_case_key(case): case for case in baseline}
+    regressions = []
+    for case in results:
+        previous = reference.get(_case_key(case))
+        if previous is None:
+            continue
+        for metric, higher_is_better in TRACKED_METRICS.items():
+            old, new = previous.get(metric), case.get(metric)
+            if old is None or new is None or old == 0:
+                continue
+            if higher_is_better:
+                regressed = new < old * (1 - tolerance)
+            else:
+                regressed = new > old * (1 + tolerance) + memory_slack_mb
+            if regressed:
+                regressions.append({'benchmark': case['benchmark'], 'size': case['size'], 'length': case['length'],
+                                    'metric': metric, 'baseline': old, 'current': new, 'change': new / old - 1})
+    return regressions
+
+
+def save_results(path, results, regressions=None, baseline_file=None):
+    '''
+    Writes a benchmark run to a JSON file, with the environment it ran in.
+
+    Args:
+        path (str): Output JSON file.
+        results (list of dict): Cases returned by `run_case`.
+        regressions (list of dict, optional): Output of `compare_with_baseline`.
+        baseline_file (str, optional): Baseline the run was compared with.
+    '''
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'baseline': baseline_file, 'results': results,
+                   'regressions': regressions or []}, f, indent=2)
+
+
+def load_results(path):
+    '''
+    Reads the cases of a benchmark run written by `save_results`.
+
+    Args:
+        path (str): JSON file of the run.
+
+    Returns:
+        list of dict: The cases of the run.
+    '''
+    with open(path) as f:
+        return json.load(f)['results']
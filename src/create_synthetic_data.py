@@ -64,8 +64,13 @@ class ProteinVariantGenerator:
     generate_single_variant() -> Dict
         Generates a dictionary representing a single protein variant with all associated attributes.
     
-    generate_data_frame(n_samples: Optional[int] = None) -> pd.DataFrame
-        Generates a DataFrame containing synthetic data for multiple variants.
+    generate_data_frame(n_samples: Optional[int] = None, batched: bool = False) -> pd.DataFrame
+        Generates a DataFrame containing synthetic data for multiple variants. With `batched=True`
+        every column is drawn at once from a seeded `numpy.random.Generator`, and the `ID` and
+        `Secondary_structure` columns are returned as categoricals.
+
+    generate_columns(n_samples: int) -> Dict[str, Union[np.ndarray, pd.Categorical]]
+        Draws all the variant attributes as column arrays in a single vectorized pass.
     
     set_parameters(...)
         Updates internal parameters such as number of samples, amino acid list, structural features,
@@ -101,6 +106,7 @@ class ProteinVariantGenerator:
 
         np.random.seed(self.seed)
         random.seed(self.seed)
+        self.rng = np.random.default_rng(self.seed)
     
     def generate_variant_id(self, position: int) -> str:
 
@@ -138,7 +144,7 @@ class ProteinVariantGenerator:
                 scale=self.negative_fitness_params['scale']
             ))
             val = max(val, self.negative_fitness_params['min'])
-            log_fitness = round(val, 3)
+        log_fitness = round(val, 3)
         return log_fitness
     
     def generate_single_variant(self) -> Dict:
@@ -153,9 +159,66 @@ class ProteinVariantGenerator:
         }
         return single_variant
     
-    def generate_data_frame(self, n_samples: Optional[int] = None) -> pd.DataFrame:
+    def _build_variant_ids(self, positions: np.ndarray, orig_idx: np.ndarray, shift: np.ndarray) -> pd.Categorical:
+
+        # A variant ID only depends on (position, wt, mut), so the strings are built once per
+        # distinct triple and referenced by code, instead of being formatted once per row.
+        amino_acids = np.asarray(self.amino_acids)
+        n_aa = len(amino_acids)
+        n_pairs = n_aa * (n_aa - 1)
+        first_position = self.position_range[0]
+        codes = (positions - first_position) * n_pairs + orig_idx * (n_aa - 1) + (shift - 1)
+
+        unique_codes, inverse = np.unique(codes, return_inverse=True)
+
+        unique_positions = unique_codes // n_pairs + first_position
+        unique_orig = (unique_codes % n_pairs) // (n_aa - 1)
+        unique_mut = (unique_orig + unique_codes % (n_aa - 1) + 1) % n_aa
+        names = np.char.add(np.char.add(amino_acids[unique_orig], unique_positions.astype(str)),
+                            amino_acids[unique_mut])
+        return pd.Categorical.from_codes(inverse, categories=names)
+
+    def generate_columns(self, n_samples: int) -> Dict[str, Union[np.ndarray, pd.Categorical]]:
+
+        if len(self.amino_acids) < 2:
+            raise ValueError('At least two amino acids are needed to generate distinct wt/mut pairs.')
+
+        rng = self.rng
+        n_aa = len(self.amino_acids)
+
+        positions = rng.integers(self.position_range[0], self.position_range[1] + 1, size=n_samples)
+        orig_idx = rng.integers(0, n_aa, size=n_samples)
+        # Shifting by 1..n_aa-1 picks the mutant uniformly among the residues different from the wildtype.
+        shift = rng.integers(1, n_aa, size=n_samples)
+
+        distances = np.round(rng.uniform(*self.distance_range, size=n_samples), 2)
+        structure_idx = rng.integers(0, len(self.secondary_structures), size=n_samples)
+
+        is_positive = rng.random(n_samples) < self.positive_fitness_prob
+        positive = np.minimum(np.abs(rng.normal(self.positive_fitness_params['loc'],
+                                                self.positive_fitness_params['scale'],
+                                                size=n_samples)),
+                              self.positive_fitness_params['max'])
+        negative = np.maximum(-np.abs(rng.normal(self.negative_fitness_params['loc'],
+                                                 self.negative_fitness_params['scale'],
+                                                 size=n_samples)),
+                              self.negative_fitness_params['min'])
+        log_fitness = np.round(np.where(is_positive, positive, negative), 3)
+
+        columns = {
+            'ID': self._build_variant_ids(positions, orig_idx, shift),
+            'Position': positions,
+            'Distance_AS': distances,
+            'Secondary_structure': pd.Categorical.from_codes(structure_idx, categories=self.secondary_structures),
+            'Log_fitness': log_fitness
+        }
+        return columns
+
+    def generate_data_frame(self, n_samples: Optional[int] = None, batched: bool = False) -> pd.DataFrame:
   
         n = n_samples if n_samples is not None else self.n_samples
+        if batched:
+            return pd.DataFrame(self.generate_columns(n))
         data = [self.generate_single_variant() for _ in range(n)]
         df_data = pd.DataFrame(data)
         return df_data
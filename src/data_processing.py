@@ -1,8 +1,281 @@
+import os
+import time
 import pandas as pd
 import numpy as np
-from scipy.stats import zscore
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import warnings
+
+
+def _is_parquet(path):
+    return os.path.splitext(str(path))[1].lower() in ('.parquet', '.pq')
+
+
+def read_table_chunks(path, columns=None, chunksize=100_000, **csv_kwargs):
+    '''
+    Reads a CSV or Parquet file in chunks of rows.
+
+    Args:
+        path (str): Path of a .csv or .parquet file.
+        columns (list of str, optional): Columns to read. Defaults to all columns.
+        chunksize (int): Number of rows per chunk.
+        **csv_kwargs: Passed to `pd.read_csv` for CSV files.
+
+    Yields:
+        pd.DataFrame: Consecutive chunks of the table.
+    '''
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize, **csv_kwargs)
+
+
+class TableChunkWriter:
+    '''
+    Writes DataFrame chunks one after the other into a CSV or Parquet file.
+
+    Parameters:
+        path (str): Path of a .csv or .parquet file, overwritten on the first write.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._parquet_writer = None
+
+    def write(self, chunk):
+        if _is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            chunk.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        self.rows += len(chunk)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RunningStats:
+    '''
+    Numerically stable, mergeable column statistics accumulated chunk by chunk.
+
+    Each chunk is reduced to (count, mean, M2) per column and merged with Chan et al.'s parallel
+    form of Welford's update, so memory does not grow with the number of rows. NaN values are skipped.
+
+    Attributes:
+        columns (list of str): Tracked columns.
+        count (np.ndarray): Number of non-missing values per column.
+        mean (np.ndarray): Running mean per column.
+        m2 (np.ndarray): Running sum of squared deviations per column.
+        min (np.ndarray): Running minimum per column.
+        max (np.ndarray): Running maximum per column.
+
+    Methods:
+        update(values): Adds an (n, C) chunk of values.
+        merge(other): Adds the statistics of another RunningStats over the same columns.
+        variance(ddof=1), std(ddof=1): Column variance and standard deviation.
+        to_frame(): Statistics as a DataFrame with one row per column.
+    '''
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        n_columns = len(self.columns)
+        self.count = np.zeros(n_columns, dtype=np.int64)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+
+    def _merge(self, count, mean, m2, minimum, maximum):
+        total = self.count + count
+        delta = mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(total > 0, count / total, 0.0)
+            self.mean = np.where(count > 0, self.mean + delta * weight, self.mean)
+            self.m2 = np.where(count > 0, self.m2 + m2 + delta ** 2 * self.count * weight, self.m2)
+        self.count = total
+        self.min = np.fmin(self.min, minimum)
+        self.max = np.fmax(self.max, maximum)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.columns))
+        observed = ~np.isnan(values)
+        count = observed.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(observed, values, 0.0).sum(axis=0) / np.maximum(count, 1)
+            m2 = np.where(observed, (values - mean) ** 2, 0.0).sum(axis=0)
+        minimum = np.where(observed, values, np.inf).min(axis=0, initial=np.inf)
+        maximum = np.where(observed, values, -np.inf).max(axis=0, initial=-np.inf)
+        self._merge(count, mean, m2, minimum, maximum)
+
+    def merge(self, other):
+        self._merge(other.count, other.mean, other.m2, other.min, other.max)
+
+    def variance(self, ddof=1):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+    def to_frame(self):
+        empty = self.count == 0
+        return pd.DataFrame({
+            'count': self.count,
+            'mean': np.where(empty, np.nan, self.mean),
+            'std': self.std(),
+            'min': np.where(empty, np.nan, self.min),
+            'max': np.where(empty, np.nan, self.max)
+        }, index=self.columns)
+
+
+class QuantileSketch:
+    '''
+    Mergeable approximate quantile sketch of one numerical column, in the style of KLL.
+
+    Values are kept in a hierarchy of compactors. A value at level h stands for 2**h input values;
+    when a level exceeds its capacity it is sorted and every other item (from a random offset) is
+    promoted to the next level. Lower levels get geometrically smaller capacities, so memory stays
+    O(k) while the rank error is O(1/k) with high probability. NaN values are skipped.
+
+    Parameters:
+        k (int): Capacity of the top level; larger values are more accurate.
+        seed (int): Seed of the compaction offsets.
+
+    Methods:
+        update(values): Adds an array of values.
+        merge(other): Adds the items of another sketch.
+        quantile(q): Approximate quantile(s), linearly interpolated like `np.quantile`.
+        weighted_items(): Sorted retained items and their weights.
+    '''
+
+    def __init__(self, k=2048, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(8, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item stays behind so that the total weight is preserved exactly.
+                kept, items = items[len(items) - len(items) % 2:], items[:len(items) - len(items) % 2]
+                promoted = items[self.rng.integers(2)::2]
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+
+    def weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2.0 ** level) for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def quantile(self, q):
+        '''
+        Estimates quantiles of the values seen so far.
+
+        Args:
+            q (float or array-like): Quantile(s) in [0, 1].
+
+        Returns:
+            float or np.ndarray: Estimated quantile(s), NaN when the sketch is empty.
+        '''
+        return _weighted_quantile(*self.weighted_items(), q)
+
+
+def _weighted_quantile(items, weights, q):
+    q = np.asarray(q, dtype=np.float64)
+    if len(items) == 0:
+        return np.full(q.shape, np.nan) if q.ndim else np.nan
+    # Each item covers `weight` consecutive ranks; the rank of its centre is mapped onto [0, n - 1]
+    # so that unit weights reproduce np.quantile's linear interpolation.
+    positions = np.cumsum(weights) - (weights + 1) / 2
+    return np.interp(q * (weights.sum() - 1), positions, items)
+
+
+def _check_groups(groups, n_rows):
+    labels, offsets, rows = groups
+    offsets = np.asarray(offsets, dtype=np.int64)
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(offsets) != len(labels) + 1 or offsets[0] != 0 or offsets[-1] != len(rows) or (np.diff(offsets) <= 0).any():
+        raise ValueError('groups must be (labels, offsets, rows) with one non-empty row range per label.')
+    if len(rows) and (rows.min() < 0 or rows.max() >= n_rows):
+        raise ValueError('Group rows are out of the range of the data.')
+    return labels, offsets, rows
+
+
+def _segment_nanmean(values, offsets):
+    # Sums and non-NaN counts of consecutive row segments, which must all be non-empty.
+    counts = np.add.reduceat(~np.isnan(values), offsets[:-1], axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.add.reduceat(np.nan_to_num(values), offsets[:-1], axis=0) / counts, counts
+
+
+def _segment_quantiles(values, offsets, qs):
+    '''
+    NaN-skipping, linearly interpolated quantiles of consecutive row segments, like `np.nanquantile`
+    applied to every segment.
+
+    Args:
+        values (np.ndarray): (M, C) values, the rows of segment g being offsets[g]:offsets[g + 1].
+        offsets (np.ndarray): (G + 1,) segment boundaries.
+        qs (list of float): Quantiles in [0, 1].
+
+    Returns:
+        np.ndarray: (len(qs), G, C) quantiles, NaN for a segment without values.
+    '''
+    segments = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    starts = offsets[:-1]
+    result = np.full((len(qs), len(starts), values.shape[1]), np.nan)
+    for column in range(values.shape[1]):
+        # Sorting by (segment, value) keeps the segments in place and puts their NaNs last.
+        ordered = values[np.lexsort((values[:, column], segments)), column]
+        valid = np.add.reduceat(~np.isnan(ordered), starts)
+        for i, q in enumerate(qs):
+            rank = q * np.maximum(valid - 1, 0)
+            lower = np.floor(rank).astype(np.int64)
+            upper = np.minimum(lower + 1, np.maximum(valid - 1, 0))
+            low, high = ordered[starts + lower], ordered[starts + upper]
+            result[i, :, column] = np.where(valid > 0, low + (rank - lower) * (high - low), np.nan)
+    return result
 
 
 class MeanAndStd:
@@ -15,6 +288,10 @@ class MeanAndStd:
     Methods:
         get_mean_and_std(columns_replicates):
             Computes the mean and standard deviation across specified replicate columns for each row.
+        stream_mean_and_std(input_file, columns_replicates, output_file, ...):
+            Computes the same statistics chunk by chunk over a CSV/Parquet file that does not fit in memory.
+        group_mean_and_std(columns_replicates, groups):
+            Summarizes the replicate means of groups of rows, e.g. every variant at one position.
     '''
 
     def __init__(self, data):
@@ -37,6 +314,375 @@ class MeanAndStd:
 
         return mean, std
 
+    def group_mean_and_std(self, columns_replicates, groups):
+        '''
+        Summarizes the row-wise replicate means within groups of rows given as index arrays.
+
+        The groups come precomputed, e.g. from `VariantIndex.groups('position')`, so every group is a
+        slice of one gathered array and the table is not scanned again for each group. A row may
+        belong to several groups, as a multi-mutant does for each of its positions.
+
+        Args:
+            columns_replicates (list of str): List of column names representing replicate measurements.
+            groups (tuple): (labels, offsets, rows) arrays; the rows (positional) of group g are
+                rows[offsets[g]:offsets[g + 1]].
+
+        Returns:
+            pd.DataFrame: 'n' (rows with a mean), 'mean' and 'std' (ddof=1) of the row means, indexed by label.
+        '''
+        labels, offsets, rows = _check_groups(groups, len(self.data))
+        row_means = self.data[columns_replicates].mean(axis=1).to_numpy(dtype=np.float64, na_value=np.nan)[rows, None]
+        mean, counts = _segment_nanmean(row_means, offsets)
+        squares = np.nan_to_num((row_means - np.repeat(mean, np.diff(offsets), axis=0)) ** 2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(np.add.reduceat(squares, offsets[:-1], axis=0) / (counts - 1))
+        std[counts < 2] = np.nan
+        return pd.DataFrame({'n': counts[:, 0], 'mean': mean[:, 0], 'std': std[:, 0]}, index=pd.Index(labels, name='group'))
+
+    @staticmethod
+    def stream_mean_and_std(input_file, columns_replicates, output_file, keep_columns=None, chunksize=100_000):
+        '''
+        Calculates the row-wise mean, standard deviation and replicate count in one pass over a large file.
+
+        The file is read and written in chunks, so memory stays constant with the file size. Each
+        row is reduced exactly like `get_mean_and_std` (missing replicates are skipped), and the global
+        statistics of the replicate columns and of the row means are accumulated with `RunningStats`.
+
+        Args:
+            input_file (str): .csv or .parquet file with the replicate measurements.
+            columns_replicates (list of str): List of column names representing replicate measurements.
+            output_file (str): .csv or .parquet file receiving `keep_columns` plus the 'mean', 'std'
+                and 'n_replicates' columns.
+            keep_columns (list of str, optional): Input columns copied to the output, e.g. the variant IDs.
+            chunksize (int): Number of rows per chunk.
+
+        Returns:
+            RunningStats: Global statistics of the replicate columns and of the 'mean' column.
+        '''
+        keep_columns = list(keep_columns or [])
+        columns_replicates = list(columns_replicates)
+        stats = RunningStats(columns_replicates + ['mean'])
+
+        with TableChunkWriter(output_file) as writer:
+            for chunk in read_table_chunks(input_file, keep_columns + columns_replicates, chunksize):
+                replicates = chunk[columns_replicates]
+                result = chunk[keep_columns].copy()
+                result['mean'] = replicates.mean(axis=1)
+                result['std'] = replicates.std(axis=1)
+                result['n_replicates'] = replicates.notna().sum(axis=1)
+                stats.update(np.column_stack([replicates.to_numpy(dtype=np.float64, na_value=np.nan),
+                                              result['mean'].to_numpy(dtype=np.float64, na_value=np.nan)]))
+                writer.write(result)
+
+        return stats
+
+OUTLIER_METHODS = ('zscore', 'iqr', 'mad')
+
+
+class OutlierResult:
+    '''
+    Compact result of a multi-column outlier detection.
+
+    Attributes:
+        index (pd.Index): Row index of the scored data.
+        columns (list of str): Scored columns.
+        masks (dict): Maps each method to an (N, C) boolean array, True for outliers.
+        bounds (pd.DataFrame): Lower and upper bound of each method (rows) for each column (columns),
+            indexed by (method, 'lower' / 'upper').
+        thresholds (dict): Maps each method to its threshold (Z-score, IQR factor or modified Z-score).
+
+    Methods:
+        mask(method, column): Boolean Series of the outliers of one column.
+        outlier_index(method, column): Index of the outlier rows of one column.
+        summary(): Number of outliers per method and column.
+        to_frame(): Boolean DataFrame with one `<column>_<method>_outlier` flag per column and method.
+    '''
+
+    def __init__(self, index, columns, masks, bounds, thresholds):
+        self.index = index
+        self.columns = list(columns)
+        self.masks = masks
+        self.bounds = bounds
+        self.thresholds = thresholds
+
+    def mask(self, method, column):
+        return pd.Series(self.masks[method][:, self.columns.index(column)], index=self.index, name=column)
+
+    def outlier_index(self, method, column):
+        return self.index[self.masks[method][:, self.columns.index(column)]]
+
+    def summary(self):
+        return pd.DataFrame({method: mask.sum(axis=0) for method, mask in self.masks.items()}, index=self.columns).T
+
+    def to_frame(self):
+        return pd.DataFrame({f'{column}_{method}_outlier': mask[:, i] for method, mask in self.masks.items()
+                             for i, column in enumerate(self.columns)}, index=self.index)
+
+
+class OutlierEngine:
+    '''
+    Vectorized outlier detection over many numerical columns at once.
+
+    Every method works on the (N, C) value matrix with NaN-aware reductions; NaN values are never
+    flagged.
+
+    - 'zscore': |x - mean| / std > z_threshold, with the population standard deviation.
+    - 'iqr': x outside [Q1 - iqr_factor * IQR, Q3 + iqr_factor * IQR], with linearly interpolated quantiles.
+    - 'mad': modified Z-score 0.6745 * |x - median| / MAD > mad_threshold (Iglewicz and Hoaglin).
+
+    Parameters:
+        methods (tuple of str): Methods to apply, from OUTLIER_METHODS.
+        z_threshold (float): Z-score threshold.
+        iqr_factor (float): IQR multiplier.
+        mad_threshold (float): Modified Z-score threshold.
+
+    Methods:
+        score(data, columns): Returns an OutlierResult for the given columns.
+        score_values(values, index, columns): Same, from an (N, C) array.
+        score_groups(data, columns, groups): Flags the outliers of every group of rows against its own statistics.
+    '''
+
+    def __init__(self, methods=OUTLIER_METHODS, z_threshold=3, iqr_factor=1.5, mad_threshold=3.5):
+        unknown = set(methods) - set(OUTLIER_METHODS)
+        if unknown:
+            raise ValueError(f'Unknown outlier methods {sorted(unknown)}. Choose from {", ".join(OUTLIER_METHODS)}.')
+        self.methods = tuple(methods)
+        self.z_threshold = z_threshold
+        self.iqr_factor = iqr_factor
+        self.mad_threshold = mad_threshold
+        self.thresholds = {'zscore': z_threshold, 'iqr': iqr_factor, 'mad': mad_threshold}
+
+    def bounds_from_statistics(self, method, center, spread):
+        '''
+        Converts the statistics of a method into its (lower, upper) bounds.
+
+        Args:
+            method (str): 'zscore' (mean, std), 'iqr' (Q1, Q3) or 'mad' (median, MAD).
+            center (np.ndarray): Mean, Q1 or median of each column.
+            spread (np.ndarray): Standard deviation, Q3 or MAD of each column.
+
+        Returns:
+            tuple of np.ndarray: Lower and upper bounds.
+        '''
+        if method == 'zscore':
+            return center - self.z_threshold * spread, center + self.z_threshold * spread
+        if method == 'iqr':
+            iqr = spread - center
+            return center - self.iqr_factor * iqr, spread + self.iqr_factor * iqr
+        half_width = self.mad_threshold * spread / 0.6745
+        return center - half_width, center + half_width
+
+    def score_values(self, values, index, columns):
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, None]
+        masks = {}
+        bounds = {}
+
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            for method in self.methods:
+                if method == 'zscore':
+                    mean = np.nanmean(values, axis=0)
+                    std = np.nanstd(values, axis=0)
+                    masks[method] = np.abs((values - mean) / std) > self.z_threshold
+                    lower, upper = self.bounds_from_statistics(method, mean, std)
+                elif method == 'iqr':
+                    q1, q3 = np.nanquantile(values, [0.25, 0.75], axis=0)
+                    lower, upper = self.bounds_from_statistics(method, q1, q3)
+                    masks[method] = (values < lower) | (values > upper)
+                else:
+                    median = np.nanmedian(values, axis=0)
+                    mad = np.nanmedian(np.abs(values - median), axis=0)
+                    masks[method] = 0.6745 * np.abs(values - median) / mad > self.mad_threshold
+                    lower, upper = self.bounds_from_statistics(method, median, mad)
+                bounds[(method, 'lower')] = lower
+                bounds[(method, 'upper')] = upper
+
+        bounds = pd.DataFrame(np.array(list(bounds.values())).reshape(len(bounds), -1), columns=list(columns),
+                              index=pd.MultiIndex.from_tuples(list(bounds), names=['method', 'bound']))
+        return OutlierResult(index, columns, masks, bounds, {method: self.thresholds[method] for method in self.methods})
+
+    def score(self, data, columns):
+        '''
+        Flags the outliers of several columns at once.
+
+        Args:
+            data (pd.DataFrame): Input data.
+            columns (list of str): Numerical columns to score.
+
+        Returns:
+            OutlierResult: Boolean masks and bounds for each method and column.
+
+        Raises:
+            ValueError: If a column is not in `data`.
+        '''
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        missing = [column for column in columns if column not in data.columns]
+        if missing:
+            raise ValueError(f'Columns not found in the DataFrame: {missing}')
+        return self.score_values(data[columns].to_numpy(dtype=np.float64, na_value=np.nan), data.index, columns)
+
+    def score_groups(self, data, columns, groups):
+        '''
+        Flags outliers within groups of rows, each group against its own statistics.
+
+        The groups come precomputed as index arrays, e.g. from `VariantIndex.groups('position')`, so the
+        values are gathered once and every statistic is a segmented reduction; no group re-scans the
+        table. A row belongs to the result once per group it is in.
+
+        Args:
+            data (pd.DataFrame): Input data.
+            columns (list of str): Numerical columns to score.
+            groups (tuple): (labels, offsets, rows) arrays; the rows (positional) of group g are
+                rows[offsets[g]:offsets[g + 1]].
+
+        Returns:
+            OutlierResult: Masks indexed by (group, row index), and bounds indexed by (method, bound, group).
+
+        Raises:
+            ValueError: If a column is not in `data` or the groups are malformed.
+        '''
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        missing = [column for column in columns if column not in data.columns]
+        if missing:
+            raise ValueError(f'Columns not found in the DataFrame: {missing}')
+        labels, offsets, rows = _check_groups(groups, len(data))
+        values = data[columns].to_numpy(dtype=np.float64, na_value=np.nan)[rows]
+        sizes = np.diff(offsets)
+        masks = {}
+        bounds = {}
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for method in self.methods:
+                if method == 'zscore':
+                    mean, counts = _segment_nanmean(values, offsets)
+                    deviations = values - np.repeat(mean, sizes, axis=0)
+                    std = np.sqrt(np.add.reduceat(np.nan_to_num(deviations ** 2), offsets[:-1], axis=0) / counts)
+                    masks[method] = np.abs(deviations / np.repeat(std, sizes, axis=0)) > self.z_threshold
+                    lower, upper = self.bounds_from_statistics(method, mean, std)
+                elif method == 'iqr':
+                    q1, q3 = _segment_quantiles(values, offsets, [0.25, 0.75])
+                    lower, upper = self.bounds_from_statistics(method, q1, q3)
+                    masks[method] = (values < np.repeat(lower, sizes, axis=0)) | (values > np.repeat(upper, sizes, axis=0))
+                else:
+                    median = _segment_quantiles(values, offsets, [0.5])[0]
+                    deviations = np.abs(values - np.repeat(median, sizes, axis=0))
+                    mad = _segment_quantiles(deviations, offsets, [0.5])[0]
+                    masks[method] = 0.6745 * deviations / np.repeat(mad, sizes, axis=0) > self.mad_threshold
+                    lower, upper = self.bounds_from_statistics(method, median, mad)
+                bounds[(method, 'lower')] = lower
+                bounds[(method, 'upper')] = upper
+
+        keys = [(method, bound, label) for method, bound in bounds for label in labels]
+        bounds = pd.DataFrame(np.concatenate(list(bounds.values())), columns=columns,
+                              index=pd.MultiIndex.from_tuples(keys, names=['method', 'bound', 'group']))
+        index = pd.MultiIndex.from_arrays([np.repeat(np.asarray(labels), sizes), data.index[rows]],
+                                          names=['group', data.index.name])
+        return OutlierResult(index, columns, masks, bounds, {method: self.thresholds[method] for method in self.methods})
+
+
+def write_outlier_report(result, data, column, id_column, output_file):
+    '''
+    Writes the text outlier report of one column, with an explanation of each method and the outlier listings.
+
+    Args:
+        result (OutlierResult): Result of `OutlierEngine.score`.
+        data (pd.DataFrame): The scored data.
+        column (str): Column to report.
+        id_column (str): Identifier column used to list the outliers.
+        output_file (str): Path of the report.
+    '''
+    report_lines = []
+    for method, threshold in result.thresholds.items():
+        outliers = data.loc[result.outlier_index(method, column), [id_column, column]]
+        lower = result.bounds.loc[(method, 'lower'), column]
+        upper = result.bounds.loc[(method, 'upper'), column]
+
+        if method == 'zscore':
+            report_lines.append('=== Z-Score Method ===')
+            report_lines.append(f"Outliers are defined as values with a Z-score > {threshold} or < -{threshold}.")
+        elif method == 'iqr':
+            Q1 = data[column].quantile(0.25)
+            Q3 = data[column].quantile(0.75)
+            report_lines.append("=== IQR Method ===")
+            report_lines.append(f"Outliers are defined as values outside {threshold} * IQR from Q1 and Q3.")
+            report_lines.append(f"Q1 = {Q1}, Q3 = {Q3}, IQR = {Q3 - Q1}")
+            report_lines.append(f"Lower Bound = {lower}, Upper Bound = {upper}")
+        else:
+            report_lines.append("=== Robust MAD Method ===")
+            report_lines.append(f"Outliers are defined as values with a modified Z-score > {threshold} or < -{threshold}.")
+            report_lines.append(f"Lower Bound = {lower}, Upper Bound = {upper}")
+        report_lines.append(f"Total Outliers: {len(outliers)}")
+        report_lines.extend((outliers[id_column].astype(str) + ': ' + outliers[column].astype(str)).tolist())
+        report_lines.append("")
+
+    with open(output_file, "w") as f:
+        f.write("\n".join(report_lines))
+
+
+def plot_outliers(result, data, column, id_column, std_dev=None, max_points=10000, seed=0, show=True):
+    '''
+    Plots the outliers of one column, one subplot per method.
+
+    Outliers are always drawn and labelled; when the data has more than `max_points` rows the
+    non-outlier points are randomly downsampled to `max_points`.
+
+    Args:
+        result (OutlierResult): Result of `OutlierEngine.score`.
+        data (pd.DataFrame): The scored data.
+        column (str): Column to plot.
+        id_column (str): Identifier column used for the x axis and the labels.
+        std_dev (pd.Series, optional): Standard deviation of each data point, used as the point labels.
+        max_points (int): Maximum number of non-outlier points drawn per subplot.
+        seed (int): Seed of the downsampling.
+        show (bool): Display the figure.
+
+    Returns:
+        plotly.graph_objects.Figure: The figure.
+    '''
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    titles = {'zscore': 'Z-Score Method', 'iqr': 'IQR Method', 'mad': 'Robust MAD Method'}
+    colors = {'zscore': 'blue', 'iqr': 'green', 'mad': 'purple'}
+    names = {'zscore': 'Z-Score', 'iqr': 'IQR', 'mad': 'MAD'}
+    methods = list(result.masks)
+    fig = make_subplots(rows=1, cols=len(methods), subplot_titles=[titles[method] for method in methods])
+    rng = np.random.default_rng(seed)
+
+    for col, method in enumerate(methods, start=1):
+        is_outlier = result.mask(method, column).to_numpy()
+        inliers = np.flatnonzero(~is_outlier)
+        if len(inliers) > max_points:
+            inliers = np.sort(rng.choice(inliers, size=max_points, replace=False))
+        rows = np.sort(np.concatenate([np.flatnonzero(is_outlier), inliers]))
+        subset = data.iloc[rows]
+        flagged = is_outlier[rows]
+
+        if std_dev is not None:
+            text = std_dev.iloc[rows].round(2).astype(str)
+            marker = dict(color=np.where(flagged, 'red', colors[method]))
+        else:
+            text = subset[id_column].where(flagged)
+            marker = None
+
+        fig.add_trace(go.Scatter(
+            x = subset[id_column],
+            y = subset[column],
+            mode = 'markers+text',
+            text = text,
+            textposition = 'top center',
+            marker = marker,
+            name = names[method]
+        ), row=1, col=col)
+
+    fig.update_layout(showlegend=False)
+    if show:
+        fig.show()
+    return fig
+
+
 class DataOutliers:
     '''
     A class for outlier detection.
@@ -45,114 +691,89 @@ class DataOutliers:
     data (pandas.DataFrame): The input data.
 
     Methods:
-    create_outlier_report(data, threshold, output_file): Creates an outlier report based on the data.
+    detect_outliers(columns, methods, ...): Scores many columns at once and returns an OutlierResult.
+    detect_group_outliers(columns, groups, methods, ...): Scores every group of rows, e.g. per position.
+    detect_outliers_and_report(column, id_column, std_dev, ...): Detects the outliers of one column,
+        with an optional text report and plot.
     '''
 
     def __init__(self, data):
         self.data = data
-    
-    def detect_outliers_and_report(self, column, id_column, std_dev=None):
+
+    def detect_outliers(self, columns, methods=OUTLIER_METHODS, z_threshold=3, iqr_factor=1.5, mad_threshold=3.5):
+        '''
+        Detects outliers in several numerical columns at once with vectorized Z-score, IQR and robust MAD rules.
+
+        Args:
+            columns (list of str): Numerical columns to analyze.
+            methods (tuple of str): Methods to apply, from 'zscore', 'iqr' and 'mad'.
+            z_threshold (float): Z-score threshold.
+            iqr_factor (float): IQR multiplier.
+            mad_threshold (float): Modified Z-score threshold of the MAD method.
+
+        Returns:
+            OutlierResult: Boolean masks and bounds for each method and column.
+        '''
+        return OutlierEngine(methods, z_threshold, iqr_factor, mad_threshold).score(self.data, columns)
+
+    def detect_group_outliers(self, columns, groups, methods=OUTLIER_METHODS, z_threshold=3, iqr_factor=1.5,
+                              mad_threshold=3.5):
+        '''
+        Detects outliers within groups of rows, such as the variants of each position from
+        `VariantIndex.groups('position')`, each group against its own statistics.
+
+        Args:
+            columns (list of str): Numerical columns to analyze.
+            groups (tuple): (labels, offsets, rows) arrays of the groups.
+            methods (tuple of str): Methods to apply, from 'zscore', 'iqr' and 'mad'.
+            z_threshold (float): Z-score threshold.
+            iqr_factor (float): IQR multiplier.
+            mad_threshold (float): Modified Z-score threshold of the MAD method.
+
+        Returns:
+            OutlierResult: Masks indexed by (group, row index) and bounds for each method, group and column.
+        '''
+        return OutlierEngine(methods, z_threshold, iqr_factor, mad_threshold).score_groups(self.data, columns, groups)
+
+    def detect_outliers_and_report(self, column, id_column, std_dev=None, report_file='../Reports/outlier_report.txt',
+                                   show_plot=True, methods=('zscore', 'iqr'), max_points=10000):
 
         '''
             Detects outliers in a specified numerical column using Z-score and IQR methods,
-            generates a textual report, and creates an interactive Plotly visualization.
+            optionally writes a textual report and creates an interactive Plotly visualization.
 
             The function performs the following:
-            - Identifies outliers using Z-score and IQR.
-            - Saves a detailed `outlier_report.txt` file with a brief explanation of each method and outlier listings.
+            - Identifies outliers using Z-score and IQR (and the robust MAD rule if requested).
+            - Saves a detailed report file with a brief explanation of each method and outlier listings.
             - Displays an interactive Plotly subplot showing outliers for each method, with labels based on an identifier column.
 
             Args:
-                df (pd.DataFrame): The input DataFrame containing the data.
                 column (str): Name of the numerical column to analyze for outliers.
                 id_column (str, optional): Name of the identifier column used for labeling data points.
                 std_dev (list): standard deviation for each data point
+                report_file (str, optional): Path of the text report, None to skip it.
+                show_plot (bool): Render and show the Plotly figure.
+                methods (tuple of str): Methods to apply, from 'zscore', 'iqr' and 'mad'.
+                max_points (int): Maximum number of non-outlier points drawn per subplot.
             Raises:
                 ValueError: If either the `column` or `id_column` is not found in the DataFrame.
 
-            Outputs:
-                - A text file named `outlier_report.txt` containing explanations and outlier listings.
-                - An interactive Plotly subplot visualization highlighting outliers for both methods.
+            Returns:
+                OutlierResult: Boolean masks and bounds for each method.
         '''
-            
-        report_lines = []
 
         if column not in self.data.columns or id_column not in self.data.columns:
             raise ValueError('Ensure both the column and id_column exist in the DataFrame.')
 
-        z_scores = zscore(self.data[column].dropna())
-        z_threshold = 3
-        z_outliers = self.data.loc[self.data[column].dropna().index[np.abs(z_scores) > z_threshold]]
-
-        report_lines.append('=== Z-Score Method ===')
-        report_lines.append(f"Outliers are defined as values with a Z-score > {z_threshold} or < -{z_threshold}.")
-        report_lines.append(f"Total Outliers: {len(z_outliers)}")
-        report_lines.extend([f"{row[id_column]}: {row[column]}" for _, row in z_outliers.iterrows()])
-        report_lines.append("")
-
-        Q1 = self.data[column].quantile(0.25)
-        Q3 = self.data[column].quantile(0.75)
-        IQR = Q3 - Q1
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
-        iqr_outliers = self.data[(self.data[column] < lower_bound) | (self.data[column] > upper_bound)]
-
-        report_lines.append("=== IQR Method ===")
-        report_lines.append("Outliers are defined as values outside 1.5 * IQR from Q1 and Q3.")
-        report_lines.append(f"Q1 = {Q1}, Q3 = {Q3}, IQR = {IQR}")
-        report_lines.append(f"Lower Bound = {lower_bound}, Upper Bound = {upper_bound}")
-        report_lines.append(f"Total Outliers: {len(iqr_outliers)}")
-        report_lines.extend([f"{row[id_column]}: {row[column]}" for _, row in iqr_outliers.iterrows()])
-        report_lines.append("")
-
-        with open("../Reports/outlier_report.txt", "w") as f:
-            f.write("\n".join(report_lines))
+        result = self.detect_outliers([column], methods=methods)
 
-        fig = make_subplots(rows=1, cols=2, subplot_titles=["Z-Score Method", "IQR Method"])
-
-        if std_dev is not None:
+        if report_file is not None:
+            write_outlier_report(result, self.data, column, id_column, report_file)
 
-            fig.add_trace(go.Scatter(
-                x = self.data[id_column],
-                y = self.data[column],
-                mode = 'markers+text',
-                text = std_dev.round(2).astype(str),
-                textposition = 'top center',
-                marker = dict(color=np.where(self.data[id_column].isin(z_outliers[id_column]), 'red', 'blue')),
-                name = 'Z-Score'
-            ), row=1, col=1)
-
-            fig.add_trace(go.Scatter(
-                x = self.data[id_column],
-                y = self.data[column],
-                mode = 'markers+text',
-                text = std_dev.round(2).astype(str),
-                textposition = 'top center',
-                marker = dict(color=np.where(self.data[id_column].isin(iqr_outliers[id_column]), 'red', 'green')),
-                name = 'IQR'
-            ), row=1, col=2)
+        if show_plot:
+            plot_outliers(result, self.data, column, id_column, std_dev=std_dev, max_points=max_points)
 
-        else:
-            fig.add_trace(go.Scatter(
-                x = self.data[id_column],
-                y = self.data[column],
-                mode = 'markers+text',
-                text = self.data[id_column].where(self.data[id_column].isin(z_outliers[id_column])),
-                textposition = 'top center',
-                name = 'Z-Score'
-            ), row=1, col=1)
-
-            fig.add_trace(go.Scatter(
-                x = self.data[id_column],
-                y = self.data[column],
-                mode = 'markers+text',
-                text = self.data[id_column].where(self.data[id_column].isin(iqr_outliers[id_column])),
-                textposition = 'top center',
-                name = 'IQR'
-            ), row=1, col=2)
-
-        fig.update_layout(showlegend=False)
-        fig.show()
+        return result
 
 
 class LogarithmicTransform:
@@ -175,3 +796,230 @@ class LogarithmicTransform:
 
         return transformed_data
     
+
+
+def _table_columns(path):
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(path).names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+class PreprocessingPipeline:
+    '''
+    Fused replicate averaging, log transform and outlier detection over a table.
+
+    The stages run together on each block of rows: the replicate columns are reduced to their
+    row-wise mean, standard deviation and count, the mean is transformed to log(mean / wild_type)
+    and the log values are scored with an `OutlierEngine`, without keeping a full-size copy of the
+    table per stage. Inputs are validated before any output is produced: missing columns, a
+    non-positive wild type, and rows whose mean is zero or negative (undefined logarithm).
+
+    `run` works in memory with exact quantiles. `run_file` streams a CSV/Parquet file in two
+    fused passes: the first validates the rows and accumulates the Z-score statistics with
+    `RunningStats` and the IQR/MAD quantiles with a `QuantileSketch`, the second writes the
+    processed rows and their outlier flags.
+
+    Parameters:
+        columns_replicates (list of str): Replicate measurement columns.
+        wild_type (float): Property of the wild type; the log stage is skipped when None and the
+            outliers are scored on the mean.
+        keep_columns (list of str, optional): Input columns copied to the output, e.g. the variant IDs.
+        id_column (str, optional): Identifier column used in the validation errors.
+        log_column (str): Name of the log-transformed column.
+        non_positive (str): 'error' raises on rows with a non-positive mean, 'nan' gives them a NaN
+            log value, which is never flagged.
+        methods (tuple of str): Outlier methods, from OUTLIER_METHODS.
+        z_threshold (float): Z-score threshold.
+        iqr_factor (float): IQR multiplier.
+        mad_threshold (float): Modified Z-score threshold.
+        sketch_size (int): Capacity of the quantile sketch used by `run_file`.
+
+    Attributes:
+        timings (dict): Seconds spent in each stage ('read', 'replicates', 'log', 'outliers', 'write')
+            by the last run.
+        bounds (pd.DataFrame): Outlier bounds of the last run, indexed by (method, 'lower' / 'upper').
+
+    Methods:
+        validate(columns): Checks the configuration against the columns of a table.
+        run(data): Processes a DataFrame and returns the processed table and an OutlierResult.
+        run_file(input_file, output_file, chunksize): Processes a file that does not fit in memory.
+    '''
+
+    STAGES = ('read', 'replicates', 'log', 'outliers', 'write')
+
+    def __init__(self, columns_replicates, wild_type=None, keep_columns=None, id_column=None, log_column='log_fitness',
+                 non_positive='error', methods=('zscore', 'iqr'), z_threshold=3, iqr_factor=1.5, mad_threshold=3.5,
+                 sketch_size=2048):
+        if non_positive not in ('error', 'nan'):
+            raise ValueError("non_positive must be 'error' or 'nan'.")
+        if wild_type is not None and not (np.isfinite(wild_type) and wild_type > 0):
+            raise ValueError(f'The wild type value must be positive and finite, got {wild_type}.')
+        self.columns_replicates = [columns_replicates] if isinstance(columns_replicates, str) else list(columns_replicates)
+        self.wild_type = wild_type
+        self.keep_columns = list(keep_columns or [])
+        self.id_column = id_column
+        self.log_column = log_column
+        self.non_positive = non_positive
+        self.engine = OutlierEngine(methods, z_threshold, iqr_factor, mad_threshold)
+        self.sketch_size = sketch_size
+        self.timings = {}
+        self.bounds = None
+
+    @property
+    def score_column(self):
+        return 'mean' if self.wild_type is None else self.log_column
+
+    @property
+    def input_columns(self):
+        extra = [self.id_column] if self.id_column is not None else []
+        return list(dict.fromkeys(self.keep_columns + extra + self.columns_replicates))
+
+    def validate(self, columns):
+        '''
+        Checks that every configured column exists.
+
+        Args:
+            columns (iterable of str): Columns of the input table.
+
+        Raises:
+            ValueError: If a column is missing.
+        '''
+        missing = [column for column in self.input_columns if column not in set(columns)]
+        if missing:
+            raise ValueError(f'Columns not found in the input: {missing}')
+
+    def _clock(self, stage, start):
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + now - start
+        return now
+
+    def _transform(self, chunk):
+        # Fused replicate and log stages on one block of rows; returns the processed columns.
+        start = time.perf_counter()
+        values = chunk[self.columns_replicates].to_numpy(dtype=np.float64, na_value=np.nan)
+        n_replicates = (~np.isnan(values)).sum(axis=1)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.nanmean(values, axis=1)
+            std = np.nanstd(values, axis=1, ddof=1)
+        processed = chunk[self.keep_columns].copy()
+        processed['mean'] = mean
+        processed['std'] = std
+        processed['n_replicates'] = n_replicates
+        start = self._clock('replicates', start)
+
+        if self.wild_type is not None:
+            non_positive = mean <= 0
+            if non_positive.any() and self.non_positive == 'error':
+                labels = chunk[self.id_column] if self.id_column is not None else chunk.index
+                examples = labels[non_positive].astype(str).tolist()[:5]
+                raise ValueError(f'{int(non_positive.sum())} rows have a zero or negative mean, whose logarithm '
+                                 f'relative to the wild type is undefined, e.g. {examples}. '
+                                 "Use non_positive='nan' to keep them with a NaN log value.")
+            with np.errstate(divide='ignore', invalid='ignore'):
+                processed[self.log_column] = np.where(non_positive, np.nan, np.log(mean / self.wild_type))
+            self._clock('log', start)
+        return processed
+
+    def _bounds_frame(self, bounds):
+        return pd.DataFrame([[value] for value in bounds.values()], columns=[self.score_column],
+                            index=pd.MultiIndex.from_tuples(list(bounds), names=['method', 'bound']))
+
+    def run(self, data):
+        '''
+        Processes an in-memory table with exact quantiles.
+
+        Args:
+            data (pd.DataFrame): Input table.
+
+        Returns:
+            tuple: The processed pd.DataFrame (`keep_columns`, 'mean', 'std', 'n_replicates', the log
+                column and one `<column>_<method>_outlier` flag per method) and the OutlierResult.
+
+        Raises:
+            ValueError: If a column is missing or, with non_positive='error', a row has a non-positive mean.
+        '''
+        self.timings = {}
+        self.validate(data.columns)
+        processed = self._transform(data)
+
+        start = time.perf_counter()
+        result = self.engine.score(processed, [self.score_column])
+        for column, flags in result.to_frame().items():
+            processed[column] = flags
+        self.bounds = result.bounds
+        self._clock('outliers', start)
+        return processed, result
+
+    def _streamed_bounds(self, stats, sketch):
+        bounds = {}
+        for method in self.engine.methods:
+            if method == 'zscore':
+                center, spread = stats.mean[0], stats.std(ddof=0)[0]
+            elif method == 'iqr':
+                center, spread = sketch.quantile([0.25, 0.75])
+            else:
+                items, weights = sketch.weighted_items()
+                center = _weighted_quantile(items, weights, 0.5)
+                deviations = np.abs(items - center)
+                order = np.argsort(deviations, kind='stable')
+                spread = _weighted_quantile(deviations[order], weights[order], 0.5)
+            lower, upper = self.engine.bounds_from_statistics(method, np.float64(center), np.float64(spread))
+            bounds[(method, 'lower')] = lower
+            bounds[(method, 'upper')] = upper
+        return bounds
+
+    def run_file(self, input_file, output_file, chunksize=100_000):
+        '''
+        Processes a CSV/Parquet file chunk by chunk, with approximate quantiles for the IQR and MAD methods.
+
+        Nothing is written until the first pass has validated every row.
+
+        Args:
+            input_file (str): .csv or .parquet input file.
+            output_file (str): .csv or .parquet file receiving the same columns as `run`.
+            chunksize (int): Number of rows per chunk.
+
+        Returns:
+            pd.DataFrame: Number of outliers per method (rows) for the scored column.
+
+        Raises:
+            ValueError: If a column is missing or, with non_positive='error', a row has a non-positive mean.
+        '''
+        self.timings = {}
+        self.validate(_table_columns(input_file))
+        column = self.score_column
+        stats = RunningStats([column])
+        sketch = QuantileSketch(self.sketch_size)
+
+        start = time.perf_counter()
+        for chunk in read_table_chunks(input_file, self.input_columns, chunksize):
+            start = self._clock('read', start)
+            scores = self._transform(chunk)[column].to_numpy()
+            start = time.perf_counter()
+            stats.update(scores)
+            sketch.update(scores)
+            start = self._clock('outliers', start)
+
+        bounds = self._streamed_bounds(stats, sketch)
+        self.bounds = self._bounds_frame(bounds)
+        counts = dict.fromkeys(self.engine.methods, 0)
+
+        start = time.perf_counter()
+        with TableChunkWriter(output_file) as writer:
+            for chunk in read_table_chunks(input_file, self.input_columns, chunksize):
+                start = self._clock('read', start)
+                processed = self._transform(chunk)
+                start = time.perf_counter()
+                scores = processed[column].to_numpy()
+                for method in self.engine.methods:
+                    flags = (scores < bounds[(method, 'lower')]) | (scores > bounds[(method, 'upper')])
+                    processed[f'{column}_{method}_outlier'] = flags
+                    counts[method] += int(flags.sum())
+                start = self._clock('outliers', start)
+                writer.write(processed)
+                start = self._clock('write', start)
+
+        return pd.DataFrame({column: counts})
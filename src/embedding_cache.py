@@ -0,0 +1,194 @@
+import hashlib
+import os
+import sqlite3
+import time
+import numpy as np
+
+
+class EmbeddingCache:
+    '''
+    A persistent, content-addressed cache for sequence embeddings.
+
+    Embeddings are stored in a SQLite database under `cache_dir`, keyed by a SHA-256 hash of
+    (model id, layer, pooling, sequence). SQLite's write-ahead log and locking make the cache
+    safe to share between several worker processes, and each process opens its own connection.
+
+    The number of entries and stored bytes are kept up to date by triggers in a one-row `totals`
+    table, so checking the size caps after a write costs a single lookup. When `max_bytes` or
+    `max_entries` is exceeded, the least recently used embeddings are evicted until the cache fits,
+    walking the last-access index only as far as needed.
+
+    Parameters:
+        cache_dir (str): Directory holding the `embeddings.sqlite` database.
+        max_bytes (int, optional): Maximum total size of the stored embeddings.
+        max_entries (int, optional): Maximum number of stored embeddings.
+        timeout (float): Seconds to wait for a lock held by another process.
+
+    Methods:
+        make_key(model_id, layer, pooling, sequence): Hashes the cache key of an embedding.
+        get_many(model_id, layer, pooling, sequences): Looks up several embeddings at once.
+        put_many(model_id, layer, pooling, sequences, embeddings): Stores several embeddings at once.
+        evict(): Applies the size caps.
+        stats(): Returns hit/miss counters and the cache size.
+        clear(): Removes every stored embedding.
+    '''
+
+    def __init__(self, cache_dir, max_bytes=None, max_entries=None, timeout=60.0):
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, 'embeddings.sqlite')
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS embeddings ('
+                               'key TEXT PRIMARY KEY, dtype TEXT, shape TEXT, data BLOB, '
+                               'nbytes INTEGER, last_access REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)')
+            connection.execute('CREATE TABLE IF NOT EXISTS totals ('
+                               'id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER, bytes INTEGER)')
+            connection.execute('CREATE TRIGGER IF NOT EXISTS embeddings_insert AFTER INSERT ON embeddings BEGIN '
+                               'UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.nbytes; END')
+            connection.execute('CREATE TRIGGER IF NOT EXISTS embeddings_delete AFTER DELETE ON embeddings BEGIN '
+                               'UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.nbytes; END')
+            # Caches created before the totals table get it filled once from their rows.
+            connection.execute('INSERT OR IGNORE INTO totals '
+                               'SELECT 0, COUNT(*), COALESCE(SUM(nbytes), 0) FROM embeddings')
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_pid'] = None
+        return state
+
+    def _connect(self):
+        # Connections must not cross a fork, so every process lazily opens its own.
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=self.timeout)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            # Rows replaced by INSERT OR REPLACE then fire the delete trigger that keeps the totals.
+            self._connection.execute('PRAGMA recursive_triggers=ON')
+            self._pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def make_key(model_id, layer, pooling, sequence):
+        return hashlib.sha256(f'{model_id}|{layer}|{pooling}|{sequence}'.encode()).hexdigest()
+
+    def get_many(self, model_id, layer, pooling, sequences):
+        '''
+        Looks up the embeddings of several sequences.
+
+        Args:
+            model_id (str): Identifier of the model checkpoint.
+            layer (int): Representation layer.
+            pooling (str): Pooling applied to the token representations.
+            sequences (list of str): Protein sequences.
+
+        Returns:
+            list: One np.ndarray per sequence, or None where the embedding is not cached.
+        '''
+        keys = [self.make_key(model_id, layer, pooling, seq) for seq in sequences]
+        found = {}
+        connection = self._connect()
+        # Stay well below SQLite's limit on the number of query parameters.
+        for start in range(0, len(keys), 500):
+            chunk = list(set(keys[start:start + 500]))
+            query = f'SELECT key, dtype, shape, data FROM embeddings WHERE key IN ({",".join("?" * len(chunk))})'
+            for key, dtype, shape, data in connection.execute(query, chunk):
+                shape = tuple(int(dim) for dim in shape.split(',') if dim)
+                found[key] = np.frombuffer(data, dtype=dtype).reshape(shape)
+
+        if found:
+            now = time.time()
+            with connection:
+                connection.executemany('UPDATE embeddings SET last_access = ? WHERE key = ?',
+                                       [(now, key) for key in found])
+
+        results = [found.get(key) for key in keys]
+        n_hits = sum(result is not None for result in results)
+        self.hits += n_hits
+        self.misses += len(results) - n_hits
+        return results
+
+    def put_many(self, model_id, layer, pooling, sequences, embeddings):
+        '''
+        Stores the embeddings of several sequences and applies the size caps.
+
+        Args:
+            model_id (str): Identifier of the model checkpoint.
+            layer (int): Representation layer.
+            pooling (str): Pooling applied to the token representations.
+            sequences (list of str): Protein sequences.
+            embeddings (sequence of np.ndarray): One embedding per sequence.
+        '''
+        now = time.time()
+        rows = []
+        for seq, embedding in zip(sequences, embeddings):
+            embedding = np.ascontiguousarray(embedding)
+            rows.append((self.make_key(model_id, layer, pooling, seq), embedding.dtype.str,
+                         ','.join(str(dim) for dim in embedding.shape), embedding.tobytes(), embedding.nbytes, now))
+        with self._connect() as connection:
+            connection.executemany('INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?)', rows)
+        self.evict()
+
+    def get(self, model_id, layer, pooling, sequence):
+        return self.get_many(model_id, layer, pooling, [sequence])[0]
+
+    def put(self, model_id, layer, pooling, sequence, embedding):
+        self.put_many(model_id, layer, pooling, [sequence], [embedding])
+
+    def evict(self):
+        '''
+        Evicts the least recently used embeddings until the cache fits `max_bytes` and `max_entries`.
+
+        Returns:
+            int: Number of evicted embeddings.
+        '''
+        if self.max_entries is None and self.max_bytes is None:
+            return 0
+        evicted = 0
+        with self._connect() as connection:
+            entries, nbytes = connection.execute('SELECT entries, bytes FROM totals').fetchone()
+            if self.max_entries is not None and entries > self.max_entries:
+                evicted += connection.execute('DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings '
+                                              'ORDER BY last_access, key LIMIT ?)',
+                                              (entries - self.max_entries,)).rowcount
+                nbytes = connection.execute('SELECT bytes FROM totals').fetchone()[0]
+            if self.max_bytes is not None and nbytes > self.max_bytes:
+                keys, freed = [], 0
+                for key, size in connection.execute('SELECT key, nbytes FROM embeddings ORDER BY last_access, key'):
+                    if freed >= nbytes - self.max_bytes:
+                        break
+                    keys.append((key,))
+                    freed += size
+                connection.executemany('DELETE FROM embeddings WHERE key = ?', keys)
+                evicted += len(keys)
+        return evicted
+
+    def stats(self):
+        '''
+        Returns the hit/miss counters of this instance and the current size of the cache.
+
+        Returns:
+            dict: hits, misses, hit_rate, entries and bytes.
+        '''
+        entries, nbytes = self._connect().execute('SELECT entries, bytes FROM totals').fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'bytes': nbytes
+        }
+
+    def clear(self):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM embeddings')
@@ -0,0 +1,339 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+
+def hash_ids(ids):
+    '''
+    Hashes IDs to the unsigned 64-bit keys of the feature store index.
+
+    Args:
+        ids (iterable of str): Variant or sequence IDs.
+
+    Returns:
+        np.ndarray: uint64 hash of each ID.
+    '''
+    return np.array([int.from_bytes(hashlib.blake2b(str(seq_id).encode(), digest_size=8).digest(), 'little')
+                     for seq_id in ids], dtype=np.uint64)
+
+
+class FeatureStore:
+    '''
+    A directory of memory-mapped feature matrices sharing one row order and one ID index.
+
+    Each representation is a raw, fixed-dtype `<name>.bin` file read through `np.memmap`, so slices
+    are zero-copy views and a gather only reads the rows it touches. Row IDs are stored as
+    concatenated UTF-8 (`ids.bin` with `id_offsets.bin`), and a sorted array of 64-bit ID hashes
+    with their rows (`id_hashes.npy`, `id_rows.npy`) maps IDs to rows by binary search on
+    memory-mapped files. Opening a store only parses the small `meta.json`.
+
+    `meta.json` is rewritten last on every change and holds the number of committed rows, so rows
+    of an interrupted append are discarded when the store is next opened for writing. An index
+    that does not match the committed rows is rebuilt from the stored IDs.
+
+    Parameters:
+        path (str): Directory of the store, created if needed.
+        mode (str): 'r' to read, 'a' to read and append.
+
+    Methods:
+        append(ids, features): Appends rows to every representation.
+        write(name, values, block_rows): Adds or replaces a representation for all the rows.
+        array(name) / store[name]: Memory-mapped (N, ...) array of a representation.
+        rows(ids): Row numbers of IDs.
+        ids(rows): IDs of rows.
+        gather(name, ids=None, rows=None): Copies the selected rows of a representation.
+        minibatches(names, batch_size, shuffle, seed): Iterates over random minibatches.
+    '''
+
+    def __init__(self, path, mode='a'):
+        if mode not in ('r', 'a'):
+            raise ValueError("mode must be 'r' or 'a'.")
+        self.path = path
+        self.mode = mode
+        self._arrays = {}
+
+        meta_file = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_file):
+            with open(meta_file) as f:
+                self.meta = json.load(f)
+        elif mode == 'r':
+            raise ValueError(f'No feature store found at {path}.')
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.meta = {'rows': 0, 'id_bytes': 0, 'representations': {}}
+            self._save_meta()
+        if mode == 'a':
+            self._truncate()
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def __getitem__(self, name):
+        return self.array(name)
+
+    @property
+    def names(self):
+        return list(self.meta['representations'])
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _save_meta(self):
+        temporary = self._file('meta.json.tmp')
+        with open(temporary, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(temporary, self._file('meta.json'))
+
+    def _row_bytes(self, name):
+        spec = self.meta['representations'][name]
+        return np.dtype(spec['dtype']).itemsize * int(np.prod(spec['shape'], dtype=np.int64))
+
+    def _truncate(self):
+        # Drop whatever an interrupted append wrote after the last committed row.
+        rows = len(self)
+        sizes = {f'{name}.bin': rows * self._row_bytes(name) for name in self.names}
+        sizes.update({'ids.bin': self.meta['id_bytes'], 'id_offsets.bin': 8 * (rows + 1) if rows else 0})
+        for file_name, size in sizes.items():
+            path = self._file(file_name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+        hashes, index_rows, rebuilt = self._load_index()
+        if rebuilt:
+            self._save_index(hashes, index_rows)
+        self._arrays = {}
+
+    def _memmap(self, file_name, dtype, shape):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._file(file_name), dtype=dtype, mode='r', shape=shape)
+
+    def array(self, name):
+        '''
+        Returns a read-only memory-mapped view of a representation.
+
+        Args:
+            name (str): Representation name.
+
+        Returns:
+            np.memmap: (N, ...) array; slicing it does not copy.
+
+        Raises:
+            KeyError: If the representation does not exist.
+        '''
+        if name not in self._arrays:
+            spec = self.meta['representations'][name]
+            self._arrays[name] = self._memmap(f'{name}.bin', spec['dtype'], (len(self),) + tuple(spec['shape']))
+        return self._arrays[name]
+
+    def _id_arrays(self):
+        if 'offsets' not in self._arrays:
+            self._arrays['offsets'] = (self._memmap('id_offsets.bin', np.int64, (len(self) + 1,)) if len(self)
+                                       else np.zeros(1, dtype=np.int64))
+            self._arrays['id_bytes'] = self._memmap('ids.bin', np.uint8, (self.meta['id_bytes'],))
+        return self._arrays['offsets'], self._arrays['id_bytes']
+
+    def _load_index(self):
+        # Returns (hashes, rows, rebuilt). The index files are replaced before meta.json is committed,
+        # so after an interrupted append they can hold rows beyond the committed ones (or only one of
+        # the two files was replaced); the index is then rebuilt from the committed IDs.
+        if not len(self):
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64), False
+        files = [self._file('id_hashes.npy'), self._file('id_rows.npy')]
+        if all(os.path.exists(file) for file in files):
+            hashes, rows = (np.load(file, mmap_mode='r') for file in files)
+            if len(hashes) == len(rows) == len(self):
+                return hashes, rows, False
+        hashes = hash_ids(self.ids())
+        rows = np.argsort(hashes, kind='stable')
+        return hashes[rows], rows.astype(np.int64), True
+
+    def _index(self):
+        if 'index' not in self._arrays:
+            self._arrays['index'] = self._load_index()[:2]
+        return self._arrays['index']
+
+    def _save_index(self, hashes, rows):
+        for file_name, values in [('id_hashes.npy', hashes), ('id_rows.npy', rows)]:
+            temporary = self._file(f'{file_name}.tmp.npy')
+            np.save(temporary, values)
+            os.replace(temporary, self._file(file_name))
+
+    def ids(self, rows=None):
+        '''
+        Returns the IDs of some rows.
+
+        Args:
+            rows (array-like of int, optional): Row numbers. Defaults to every row.
+
+        Returns:
+            list of str: The IDs.
+        '''
+        offsets, id_bytes = self._id_arrays()
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+        return [bytes(id_bytes[offsets[row]:offsets[row + 1]]).decode() for row in rows]
+
+    def rows(self, ids):
+        '''
+        Looks up the rows of IDs by binary search in the hash index.
+
+        Args:
+            ids (iterable of str): IDs to look up.
+
+        Returns:
+            np.ndarray: int64 row number of each ID.
+
+        Raises:
+            KeyError: If an ID is not in the store.
+        '''
+        ids = [str(seq_id) for seq_id in ids]
+        hashes, rows = self._index()
+        keys = hash_ids(ids)
+        positions = np.searchsorted(hashes, keys)
+        found = positions < len(hashes)
+        found[found] = hashes[positions[found]] == keys[found]
+        result = np.full(len(ids), -1, dtype=np.int64)
+        result[found] = rows[positions[found]]
+        # A matching hash is confirmed against the stored ID.
+        stored = iter(self.ids(result[found]))
+        missing = [seq_id for seq_id, row in zip(ids, result) if row < 0 or next(stored) != seq_id]
+        if missing:
+            raise KeyError(f'IDs not found in the feature store: {missing[:10]}')
+        return result
+
+    def gather(self, name, ids=None, rows=None):
+        '''
+        Copies selected rows of a representation, reading them in storage order.
+
+        Args:
+            name (str): Representation name.
+            ids (iterable of str, optional): IDs of the rows.
+            rows (array-like of int, optional): Row numbers, used when `ids` is not given.
+
+        Returns:
+            np.ndarray: (len(rows), ...) array in the requested order.
+        '''
+        rows = self.rows(ids) if ids is not None else np.asarray(rows, dtype=np.int64)
+        order = np.argsort(rows, kind='stable')
+        gathered = np.empty((len(rows),) + self.array(name).shape[1:], dtype=self.array(name).dtype)
+        gathered[order] = self.array(name)[rows[order]]
+        return gathered
+
+    def minibatches(self, names, batch_size=256, shuffle=True, seed=0):
+        '''
+        Iterates over the rows in minibatches, each gathered from the memory-mapped files.
+
+        Args:
+            names (list of str): Representations to gather.
+            batch_size (int): Number of rows per minibatch.
+            shuffle (bool): Visit the rows in a random order.
+            seed (int): Seed of the shuffling.
+
+        Yields:
+            tuple: (rows, dict mapping each name to its (batch_size, ...) array).
+        '''
+        names = [names] if isinstance(names, str) else list(names)
+        order = np.random.default_rng(seed).permutation(len(self)) if shuffle else np.arange(len(self))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            yield rows, {name: self.gather(name, rows=rows) for name in names}
+
+    def _check_writable(self):
+        if self.mode != 'a':
+            raise ValueError('The feature store was opened read-only.')
+
+    def _write_index(self, ids):
+        # Merges the sorted hashes of the new IDs into the sorted index, without re-sorting it or
+        # decoding the stored IDs.
+        stored_hashes, stored_rows = self._index()
+        hashes = hash_ids(ids)
+        order = np.argsort(hashes, kind='stable')
+        hashes, rows = hashes[order], len(self) + order.astype(np.int64)
+        positions = np.searchsorted(stored_hashes, hashes)
+        existing = positions < len(stored_hashes)
+        existing[existing] = stored_hashes[positions[existing]] == hashes[existing]
+        repeated = np.concatenate([[False], hashes[1:] == hashes[:-1]])
+        if existing.any() or repeated.any():
+            raise ValueError(f'Duplicate IDs in the feature store, e.g. row {int(rows[existing | repeated].min())} '
+                             'repeats an existing ID.')
+        self._save_index(np.insert(stored_hashes, positions, hashes), np.insert(stored_rows, positions, rows))
+
+    def append(self, ids, features):
+        '''
+        Appends rows with their IDs to every representation.
+
+        Args:
+            ids (list of str): IDs of the new rows, unique across the store.
+            features (dict): Maps every representation name to a (len(ids), ...) array. On an empty
+                store, it defines the representations; an empty dict only appends IDs.
+
+        Raises:
+            ValueError: If an ID already exists, or the representations or shapes do not match the store.
+        '''
+        self._check_writable()
+        ids = [str(seq_id) for seq_id in ids]
+        if len(self) and set(features) != set(self.names):
+            raise ValueError(f'Appends must provide every representation of the store: {self.names}')
+
+        arrays = {}
+        for name, values in features.items():
+            values = np.asarray(values)
+            if len(values) != len(ids):
+                raise ValueError(f'Representation {name!r} got {len(values)} rows for {len(ids)} IDs.')
+            spec = self.meta['representations'].get(name)
+            if spec is None:
+                spec = {'dtype': values.dtype.str, 'shape': list(values.shape[1:])}
+            elif list(values.shape[1:]) != spec['shape']:
+                raise ValueError(f'Representation {name!r} has rows of shape {spec["shape"]}, got {values.shape[1:]}.')
+            arrays[name] = (spec, np.ascontiguousarray(values, dtype=spec['dtype']))
+
+        # Validates the IDs before anything is written.
+        self._write_index(ids)
+
+        for name, (spec, values) in arrays.items():
+            with open(self._file(f'{name}.bin'), 'ab') as f:
+                f.write(values.tobytes())
+            self.meta['representations'][name] = spec
+        encoded = [seq_id.encode() for seq_id in ids]
+        offsets = self.meta['id_bytes'] + np.cumsum([0] + [len(seq_id) for seq_id in encoded], dtype=np.int64)
+        with open(self._file('ids.bin'), 'ab') as f:
+            f.write(b''.join(encoded))
+        with open(self._file('id_offsets.bin'), 'ab') as f:
+            f.write((offsets if len(self) == 0 else offsets[1:]).tobytes())
+
+        self.meta['rows'] += len(ids)
+        self.meta['id_bytes'] = int(offsets[-1])
+        self._save_meta()
+        self._arrays = {}
+
+    def write(self, name, values, block_rows=65536):
+        '''
+        Adds or replaces a representation for every row of the store.
+
+        Args:
+            name (str): Representation name.
+            values (array-like): (N, ...) array, or any object with a shape and row slicing such as an
+                h5py dataset; it is copied `block_rows` rows at a time.
+            block_rows (int): Number of rows copied at a time.
+
+        Raises:
+            ValueError: If `values` does not have one row per stored ID.
+        '''
+        self._check_writable()
+        if not hasattr(values, 'shape'):
+            values = np.asarray(values)
+        if values.shape[0] != len(self):
+            raise ValueError(f'Representation {name!r} has {values.shape[0]} rows, the store has {len(self)}.')
+
+        temporary = self._file(f'{name}.bin.tmp')
+        dtype = None
+        with open(temporary, 'wb') as f:
+            for start in range(0, len(self), block_rows):
+                block = np.ascontiguousarray(values[start:start + block_rows])
+                dtype = dtype or block.dtype.str
+                f.write(block.astype(dtype, copy=False).tobytes())
+        os.replace(temporary, self._file(f'{name}.bin'))
+        self.meta['representations'][name] = {'dtype': dtype or np.dtype(getattr(values, 'dtype', 'float32')).str,
+                                              'shape': list(values.shape[1:])}
+        self._save_meta()
+        self._arrays.pop(name, None)
@@ -0,0 +1,111 @@
+import os
+import numpy as np
+
+
+class StreamingFeatureWriter:
+    '''
+    Streams feature batches into chunked, resizable HDF5 datasets with a resumable checkpoint.
+
+    Every call to `append` grows the datasets, writes the batch next to its sequence IDs in the
+    `ids` dataset, then records the number of completed rows in the `rows_done` attribute and
+    flushes the file. Reopening an existing file resumes after the last completed row; rows
+    written after the last checkpoint (e.g. by a job killed mid-batch) are discarded.
+
+    The `attrs` describing how the rows were produced (e.g. encoder, model id and precision) are
+    stored as file attributes, and a file holding rows written with different values is not resumed.
+
+    Parameters:
+        path (str): Path of the HDF5 file.
+        chunk_rows (int): Number of rows per HDF5 chunk.
+        compression (str, optional): HDF5 compression filter, e.g. 'gzip' or 'lzf'.
+        dtype (str): Data type of the feature datasets.
+        resume (bool): If False, an existing file is overwritten instead of resumed.
+        attrs (dict, optional): File attributes that must match to resume an existing file.
+
+    Methods:
+        append(ids, features): Writes a batch of rows for one or more feature datasets.
+        completed_ids(): Returns the IDs of the rows written so far.
+        close(): Closes the file.
+    '''
+
+    def __init__(self, path, chunk_rows=1024, compression=None, dtype='float32', resume=True, attrs=None):
+        import h5py
+
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.compression = compression
+        self.dtype = dtype
+
+        mode = 'a' if resume and os.path.exists(path) else 'w'
+        self.file = h5py.File(path, mode)
+        if 'ids' not in self.file:
+            self.file.create_dataset('ids', shape=(0,), maxshape=(None,), dtype=h5py.string_dtype(),
+                                     chunks=(chunk_rows,))
+            self.file.attrs['rows_done'] = 0
+
+        self.rows_done = int(self.file.attrs['rows_done'])
+        attrs = attrs or {}
+        mismatched = {key: self.file.attrs.get(key) for key, value in attrs.items() if self.file.attrs.get(key) != value}
+        if mismatched and self.rows_done:
+            self.file.close()
+            listing = ', '.join(f'{key}={value.item() if isinstance(value, np.generic) else value!r}'
+                                for key, value in mismatched.items())
+            raise ValueError(f'{path} holds rows written with {listing}, not with {attrs}; remove it to start over.')
+        self.file.attrs.update(attrs)
+        for name in self.feature_names:
+            self.file[name].resize(self.rows_done, axis=0)
+        self.file['ids'].resize(self.rows_done, axis=0)
+
+    @property
+    def feature_names(self):
+        return [name for name in self.file if name != 'ids']
+
+    def completed_ids(self):
+        return [seq_id.decode() if isinstance(seq_id, bytes) else seq_id for seq_id in self.file['ids'][:]]
+
+    def _dataset(self, name, shape):
+        if name not in self.file:
+            self.file.create_dataset(name, shape=(self.rows_done,) + shape, maxshape=(None,) + shape,
+                                     dtype=self.dtype, chunks=(self.chunk_rows,) + shape,
+                                     compression=self.compression)
+        return self.file[name]
+
+    def append(self, ids, features):
+        '''
+        Writes a batch of rows and checkpoints it.
+
+        Args:
+            ids (list of str): Sequence IDs of the rows.
+            features (dict): Maps dataset names to (len(ids), ...) arrays.
+
+        Raises:
+            ValueError: If an array does not have one row per ID, or the dataset names differ from the ones
+                already in the file.
+        '''
+        # A dataset missing from earlier rows would be zero-filled, and one left out would stop growing.
+        if self.feature_names and set(features) != set(self.feature_names):
+            raise ValueError(f'{self.path} holds the datasets {sorted(self.feature_names)}, not {sorted(features)}; '
+                             'remove it to start over.')
+        start, stop = self.rows_done, self.rows_done + len(ids)
+        for name, values in features.items():
+            values = np.asarray(values)
+            if len(values) != len(ids):
+                raise ValueError(f'Dataset {name!r} got {len(values)} rows for {len(ids)} IDs.')
+            dataset = self._dataset(name, values.shape[1:])
+            dataset.resize(stop, axis=0)
+            dataset[start:stop] = values
+
+        self.file['ids'].resize(stop, axis=0)
+        self.file['ids'][start:stop] = [str(seq_id) for seq_id in ids]
+        self.file.attrs['rows_done'] = stop
+        self.file.flush()
+        self.rows_done = stop
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
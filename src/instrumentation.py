@@ -0,0 +1,227 @@
+import contextlib
+import json
+import os
+import sys
+import time
+
+PROFILERS = ('cprofile', 'torch')
+
+
+def resident_memory_mb():
+    '''
+    Returns the current resident memory (RSS) of the process.
+
+    Returns:
+        float or None: RSS in MiB, or None where `/proc/self/statm` cannot be read (e.g. on macOS).
+    '''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_resident_memory_mb():
+    '''
+    Returns the peak resident memory of the process since it started, in MiB.
+    '''
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+class BatchRecord:
+    '''
+    Timing of one encoder batch, created by `Metrics.batch`.
+
+    The batch starts when the record is entered and ends when it is left. Calling `tokenized()`
+    in between splits it into the tokenization and forward-pass times; without the call the whole
+    batch counts as forward pass.
+    '''
+
+    def __init__(self, metrics, name, token_lengths):
+        self.metrics = metrics
+        self.name = name
+        self.token_lengths = token_lengths
+        self._profiler = None
+
+    def __enter__(self):
+        self._profiler = self.metrics._start_profiler(self.name)
+        self.start = self.split = time.perf_counter()
+        return self
+
+    def tokenized(self):
+        self.split = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        self.metrics._stop_profiler(self.name, self._profiler)
+        if exc_type is None:
+            self.metrics.add(batches=1, sequences_batched=len(self.token_lengths), tokens=sum(self.token_lengths),
+                             padded_tokens=len(self.token_lengths) * max(self.token_lengths, default=0),
+                             tokenize_s=self.split - self.start, forward_s=end - self.split)
+
+
+class Metrics:
+    '''
+    Collects performance metrics of a representation run and emits them as JSON lines.
+
+    A run is split into stages (loading, one encoder each, ...). The encoders report each batch and
+    `stream_embeddings` each block written, and the counters are summed into the stage that is
+    running. When a stage ends, one 'stage' line is written with its wall time, throughput
+    (sequences/s and tokens/s), batch padding efficiency (real / padded tokens), time spent
+    tokenizing, in forward passes, waiting for embeddings and writing HDF5 blocks, cache hit rate
+    and resident memory.
+
+    With a profiler, a sampled subset of the encoder batches (every `profile_every`-th batch, at
+    most `profile_batches` per encoder) is profiled with cProfile (`.prof` files, readable with
+    `pstats` or snakeviz) or the torch profiler (Chrome traces, `.json`), one file per batch.
+
+    Parameters:
+        path (str, optional): JSON lines file the events are appended to. None only keeps them in `events`.
+        profile (str, optional): Profiler of the sampled batches, 'cprofile' or 'torch'.
+        profile_dir (str, optional): Directory of the profiles. Defaults to the directory of `path`.
+        profile_every (int): Distance between two profiled batches of an encoder.
+        profile_batches (int): Maximum number of profiled batches per encoder.
+
+    Methods:
+        emit(event, **fields): Writes one JSON line.
+        add(**values): Adds counters to the running stage.
+        stage(name, sequences, cache, **fields): Context manager timing a stage and emitting its summary.
+        batch(name, token_lengths): Context manager timing one encoder batch.
+        finish(**fields): Emits the summary of the whole run.
+    '''
+
+    def __init__(self, path=None, profile=None, profile_dir=None, profile_every=10, profile_batches=3):
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f'Unknown profiler {profile!r}. Choose from {", ".join(PROFILERS)}.')
+        self.path = path
+        self.profile = profile
+        self.profile_dir = profile_dir or (os.path.dirname(path) if path else '.')
+        self.profile_every = profile_every
+        self.profile_batches = profile_batches
+        self.run_id = f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}'
+        self.start = time.perf_counter()
+        self.events = []
+        self._counters = {}
+        self._batches_seen = {}
+        self._profiles_written = {}
+
+    def emit(self, event, **fields):
+        '''
+        Records one event and appends it to the JSON lines file.
+
+        Args:
+            event (str): Event type, e.g. 'stage' or 'block'.
+            **fields: JSON-serializable values of the event.
+        '''
+        record = {'run_id': self.run_id, 'time': time.time(), 'event': event, **fields}
+        self.events.append(record)
+        if self.path is not None:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+
+    def add(self, **values):
+        for key, value in values.items():
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextlib.contextmanager
+    def stage(self, name, sequences=None, cache=None, **fields):
+        '''
+        Times a stage of the run and emits its summary when it ends.
+
+        Args:
+            name (str): Stage name, e.g. 'load' or 'esm1v'.
+            sequences (list of str, optional): Sequences processed by the stage, for the throughput.
+            cache (EmbeddingCache, optional): Cache whose hits and misses during the stage are reported.
+            **fields: Extra values of the summary. The body can add more to the yielded dict.
+
+        Yields:
+            dict: Extra fields of the summary.
+        '''
+        self._counters = {}
+        hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+        start = time.perf_counter()
+        extra = dict(fields)
+        yield extra
+        seconds = time.perf_counter() - start
+
+        counters = self._counters
+        summary = {'stage': name, 'seconds': seconds}
+        if sequences is not None:
+            residues = sum(len(sequence) for sequence in sequences)
+            summary.update(sequences=len(sequences), residues=residues, sequences_per_s=len(sequences) / seconds,
+                           residues_per_s=residues / seconds)
+        if counters.get('batches'):
+            summary.update(tokens_per_s=counters['tokens'] / seconds,
+                           forward_tokens_per_s=counters['tokens'] / counters['forward_s'] if counters['forward_s'] else None,
+                           padding_efficiency=counters['tokens'] / counters['padded_tokens'])
+        summary.update(counters)
+        if cache is not None:
+            lookups = cache.hits - hits + cache.misses - misses
+            summary.update(cache_hits=cache.hits - hits, cache_misses=cache.misses - misses,
+                           cache_hit_rate=(cache.hits - hits) / lookups if lookups else None)
+        summary.update(rss_mb=resident_memory_mb(), peak_rss_mb=peak_resident_memory_mb(), **extra)
+        self._counters = {}
+        self.emit('stage', **summary)
+
+    def finish(self, **fields):
+        '''
+        Emits a 'run' line with the wall time since the collector was created and the peak resident memory.
+
+        Args:
+            **fields: Extra values of the summary.
+        '''
+        self.emit('run', seconds=time.perf_counter() - self.start, peak_rss_mb=peak_resident_memory_mb(), **fields)
+
+    def batch(self, name, token_lengths):
+        '''
+        Returns the record timing one encoder batch.
+
+        Args:
+            name (str): Encoder name, e.g. 'esm1v'.
+            token_lengths (list of int): Unpadded token length of each sequence of the batch.
+
+        Returns:
+            BatchRecord: Context manager around the batch.
+        '''
+        return BatchRecord(self, name, token_lengths)
+
+    def _start_profiler(self, name):
+        index = self._batches_seen.get(name, 0)
+        self._batches_seen[name] = index + 1
+        if (self.profile is None or index % self.profile_every
+                or self._profiles_written.get(name, 0) >= self.profile_batches):
+            return None
+        if self.profile == 'cprofile':
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            import torch
+
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            profiler = torch.profiler.profile(activities=activities, record_shapes=True)
+            profiler.__enter__()
+        return profiler, index
+
+    def _stop_profiler(self, name, started):
+        if started is None:
+            return
+        profiler, index = started
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if self.profile == 'cprofile':
+            profiler.disable()
+            path = os.path.join(self.profile_dir, f'{name}_batch{index}.prof')
+            profiler.dump_stats(path)
+        else:
+            profiler.__exit__(None, None, None)
+            path = os.path.join(self.profile_dir, f'{name}_batch{index}.json')
+            profiler.export_chrome_trace(path)
+        self._profiles_written[name] = self._profiles_written.get(name, 0) + 1
+        self.emit('profile', encoder=name, batch=index, profiler=self.profile, path=path)
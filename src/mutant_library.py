@@ -0,0 +1,406 @@
+import itertools
+import math
+import numpy as np
+
+try:
+    from .variant_ids import AMINO_ACIDS, PAD_RESIDUE, parse_variant_ids
+except ImportError:
+    from variant_ids import AMINO_ACIDS, PAD_RESIDUE, parse_variant_ids
+
+
+class MutantLibrary:
+    '''
+    A combinatorial library of substitution mutants of one wildtype, stored as integer arrays.
+
+    Each mutant is a row of `positions` (0-based, int16) and `residues` (indices into `alphabet`,
+    int8), sorted by position and padded with -1 up to the highest order in the library, so ten
+    million double mutants take 60 MB instead of ten million near-identical strings. Mutants are
+    enumerated lazily, deduplicated when added, and only turned into sequences, residue indices or
+    model tokens for the rows an encoder asks for.
+
+    Parameters:
+        wildtype (str): Wildtype protein sequence.
+        positions (iterable of int, optional): Positions that may be mutated, numbered from `offset`.
+            Defaults to every position.
+        offset (int): Position number of the first residue in positions and variant IDs.
+        alphabet (str): Residues a position can be mutated to.
+        separator (str): Separator between the single mutations of a variant ID.
+
+    Methods:
+        count(order): Number of possible mutants of an order.
+        enumerate(order, batch_size): Lazily yields every mutant of an order in blocks.
+        add(positions, residues): Adds mutants, skipping the ones already in the library.
+        add_all(orders, batch_size): Adds every mutant of some orders.
+        add_variant_ids(variant_ids): Adds mutants from IDs such as 'A12G:L57P'.
+        sample(n, order, seed): Adds mutants drawn uniformly among the ones not in the library.
+        sample_stratified(n_per_stratum, orders, by, seed): Adds the same number of mutants per order or position.
+        residue_indices(rows): (n, L) alphabet indices of mutant sequences.
+        tokens(rows, token_ids, prepend, append): (n, T) model tokens of mutant sequences.
+        sequences(rows): Mutant sequences as strings.
+        iter_sequences(batch_size): Yields the mutant sequences in batches.
+        variant_ids(rows): Variant IDs of mutants.
+        save(path) / MutantLibrary.load(path): Stores the library as a .npz file.
+    '''
+
+    def __init__(self, wildtype, positions=None, offset=1, alphabet=AMINO_ACIDS, separator=':'):
+        self.wildtype = wildtype
+        self.offset = offset
+        self.alphabet = alphabet
+        self.separator = separator
+        if len(set(alphabet)) != len(alphabet) or len(alphabet) < 2:
+            raise ValueError('The alphabet needs at least two distinct residues.')
+        unknown = sorted(set(wildtype) - set(alphabet))
+        if unknown:
+            raise ValueError(f'Wildtype residues {unknown} are not in the alphabet.')
+        if len(wildtype) >= np.iinfo(np.int16).max:
+            raise ValueError(f'Wildtypes are limited to {np.iinfo(np.int16).max - 1} residues.')
+
+        lookup = np.full(256, -1, dtype=np.int8)
+        lookup[np.frombuffer(alphabet.encode('ascii'), dtype=np.uint8)] = np.arange(len(alphabet))
+        self.wildtype_indices = lookup[np.frombuffer(wildtype.encode('ascii'), dtype=np.uint8)]
+
+        if positions is None:
+            self.mutable_positions = np.arange(len(wildtype), dtype=np.int16)
+        else:
+            mutable = np.unique(np.asarray(list(positions), dtype=np.int64) - offset)
+            if len(mutable) and (mutable[0] < 0 or mutable[-1] >= len(wildtype)):
+                raise ValueError(f'Positions must be between {offset} and {len(wildtype) + offset - 1}.')
+            self.mutable_positions = mutable.astype(np.int16)
+
+        self.positions = np.empty((0, 0), dtype=np.int16)
+        self.residues = np.empty((0, 0), dtype=np.int8)
+        self._keys = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def orders(self):
+        return (self.positions >= 0).sum(axis=1)
+
+    def count(self, order, position=None):
+        '''
+        Returns the number of possible mutants of an order, optionally only those mutating a position.
+
+        Args:
+            order (int): Number of mutations.
+            position (int, optional): 0-based position every counted mutant mutates.
+
+        Returns:
+            int: Number of mutants.
+        '''
+        n_positions = len(self.mutable_positions)
+        if position is None:
+            return math.comb(n_positions, order) * (len(self.alphabet) - 1) ** order
+        return math.comb(n_positions - 1, order - 1) * (len(self.alphabet) - 1) ** order
+
+    def _substitutions(self, order):
+        # Every combination of shifts 1..A-1 away from the wildtype residue, one row per combination.
+        shifts = np.indices((len(self.alphabet) - 1,) * order).reshape(order, -1).T + 1
+        return shifts.astype(np.int64)
+
+    def _mutate(self, positions, shifts):
+        return ((self.wildtype_indices[positions] + shifts) % len(self.alphabet)).astype(np.int8)
+
+    def enumerate(self, order, batch_size=65536):
+        '''
+        Lazily enumerates every mutant of an order, position combination by position combination.
+
+        Args:
+            order (int): Number of mutations per mutant.
+            batch_size (int): Approximate number of mutants per block.
+
+        Yields:
+            tuple: (positions, residues), (n, order) arrays of 0-based positions and alphabet indices.
+        '''
+        shifts = self._substitutions(order)
+        combinations = itertools.combinations(self.mutable_positions.tolist(), order)
+        combinations_per_block = max(1, batch_size // len(shifts))
+        while True:
+            block = np.array(list(itertools.islice(combinations, combinations_per_block)), dtype=np.int64)
+            if len(block) == 0:
+                return
+            positions = np.repeat(block, len(shifts), axis=0)
+            yield positions.astype(np.int16), self._mutate(positions, np.tile(shifts, (len(block), 1)))
+
+    def _canonical(self, positions, residues):
+        positions = np.atleast_2d(np.asarray(positions, dtype=np.int64))
+        residues = np.atleast_2d(np.asarray(residues, dtype=np.int64))
+        if positions.shape != residues.shape:
+            raise ValueError('positions and residues must have the same shape.')
+        mutated = positions >= 0
+        if (positions >= len(self.wildtype)).any() or (mutated & ((residues < 0) | (residues >= len(self.alphabet)))).any():
+            raise ValueError('Mutations must have positions within the wildtype and residues within the alphabet.')
+        if (mutated & (residues == self.wildtype_indices[np.where(mutated, positions, 0)])).any():
+            raise ValueError('Mutant residues must differ from the wildtype residue.')
+
+        # Padding is moved after the mutations, which are sorted by position.
+        order = np.argsort(np.where(mutated, positions, len(self.wildtype)), axis=1, kind='stable')
+        positions = np.take_along_axis(np.where(mutated, positions, -1), order, axis=1)
+        residues = np.take_along_axis(np.where(mutated, residues, -1), order, axis=1)
+        if ((positions[:, 1:] == positions[:, :-1]) & (positions[:, 1:] >= 0)).any():
+            raise ValueError('A mutant mutates the same position twice.')
+        return positions, residues
+
+    def _pad(self, values, width):
+        return np.pad(values, ((0, 0), (0, width - values.shape[1])), constant_values=-1)
+
+    def _row_keys(self, positions, residues, width):
+        # One fixed-size byte key per mutant: big-endian codes position * A + residue + 1, 0 for padding.
+        codes = np.where(positions >= 0, positions.astype(np.int64) * len(self.alphabet) + residues + 1, 0)
+        codes = np.pad(codes, ((0, 0), (0, width - codes.shape[1])))
+        return np.ascontiguousarray(codes.astype('>u4')).view(f'V{4 * width}').ravel()
+
+    def _sorted_keys(self, width):
+        # The sorted keys of the library are kept between adds and rebuilt when the highest order grows.
+        if self._keys is None or self._keys.dtype.itemsize != 4 * width:
+            self._keys = np.sort(self._row_keys(self.positions, self.residues, width))
+        return self._keys
+
+    def _new_rows(self, positions, residues):
+        # Rows that are neither in the library nor repeated earlier in the input.
+        width = max(1, self.positions.shape[1], positions.shape[1])
+        library_keys = self._sorted_keys(width)
+        keys = self._row_keys(positions, residues, width)
+        new = np.zeros(len(keys), dtype=bool)
+        new[np.unique(keys, return_index=True)[1]] = True
+        found = np.searchsorted(library_keys, keys)
+        in_library = found < len(library_keys)
+        in_library[in_library] = library_keys[found[in_library]] == keys[in_library]
+        return new & ~in_library
+
+    def _append(self, positions, residues):
+        width = max(self.positions.shape[1], positions.shape[1])
+        if self._keys is not None and self._keys.dtype.itemsize == 4 * max(1, width):
+            keys = np.sort(self._row_keys(positions, residues, max(1, width)))
+            self._keys = np.insert(self._keys, np.searchsorted(self._keys, keys), keys)
+        else:
+            self._keys = None
+        self.positions = np.concatenate([self._pad(self.positions, width),
+                                         self._pad(positions, width).astype(np.int16)])
+        self.residues = np.concatenate([self._pad(self.residues, width), self._pad(residues, width).astype(np.int8)])
+
+    def add(self, positions, residues):
+        '''
+        Adds mutants, skipping the ones already in the library.
+
+        Deduplication compares the new rows with the whole library, so large libraries should be
+        added in a few large blocks rather than many small ones.
+
+        Args:
+            positions (array-like of int): (n, k) 0-based mutated positions, -1 for no mutation.
+            residues (array-like of int): (n, k) alphabet indices of the mutant residues.
+
+        Returns:
+            int: Number of mutants added.
+
+        Raises:
+            ValueError: If a mutation is out of range, keeps the wildtype residue, or repeats a position.
+        '''
+        positions, residues = self._canonical(positions, residues)
+        new = self._new_rows(positions, residues)
+        self._append(positions[new], residues[new])
+        return int(new.sum())
+
+    def add_all(self, orders=(1,), batch_size=1_000_000):
+        '''
+        Adds every mutant of some orders.
+
+        Args:
+            orders (iterable of int): Numbers of mutations.
+            batch_size (int): Approximate number of mutants enumerated and deduplicated at a time.
+
+        Returns:
+            int: Number of mutants added.
+        '''
+        return sum(self.add(positions, residues) for order in orders
+                   for positions, residues in self.enumerate(order, batch_size))
+
+    def add_variant_ids(self, variant_ids):
+        '''
+        Adds mutants from variant IDs such as 'A123G' or 'A12G:L57P', parsed by `variant_ids.parse_variant_ids`.
+
+        Args:
+            variant_ids (iterable of str): Variant IDs numbered from `offset`.
+
+        Returns:
+            int: Number of mutants added.
+
+        Raises:
+            ValueError: If an ID is malformed or its wildtype residues do not match the wildtype.
+        '''
+        parsed = parse_variant_ids(list(variant_ids), self.wildtype, self.offset, self.separator, self.alphabet)
+        positions = np.where(parsed.position >= 0, parsed.position.astype(np.int64) - self.offset, -1)
+        residues = np.where(parsed.mutant != PAD_RESIDUE, parsed.mutant.astype(np.int64), -1)
+        return self.add(positions, residues)
+
+    def _draw(self, rng, n, order, position=None):
+        # Distinct positions by rejection, then a uniform substitution at each of them.
+        pool = self.mutable_positions if position is None else self.mutable_positions[self.mutable_positions != position]
+        free = order - (position is not None)
+        drawn = np.empty((0 if free else n, free), dtype=np.int64)
+        while len(drawn) < n:
+            candidates = np.sort(pool[rng.integers(0, len(pool), size=(2 * (n - len(drawn)) + 16, free))], axis=1)
+            distinct = (np.diff(candidates, axis=1) != 0).all(axis=1)
+            drawn = np.concatenate([drawn, candidates[distinct].astype(np.int64)])
+        positions = drawn[:n]
+        if position is not None:
+            positions = np.hstack([np.full((n, 1), position, dtype=np.int64), positions])
+        return positions, self._mutate(positions, rng.integers(1, len(self.alphabet), size=positions.shape))
+
+    def _sample(self, rng, n, order, position=None):
+        present = self.orders == order
+        if position is not None:
+            present &= (self.positions == position).any(axis=1)
+        available = self.count(order, position) - int(present.sum())
+        if n > available:
+            raise ValueError(f'Only {available} mutants of order {order} are left to sample, {n} were requested.')
+
+        added = 0
+        while added < n:
+            positions, residues = self._canonical(*self._draw(rng, 2 * (n - added) + 16, order, position))
+            new = np.flatnonzero(self._new_rows(positions, residues))[:n - added]
+            self._append(positions[new], residues[new])
+            added += len(new)
+        return added
+
+    def sample(self, n, order=1, seed=0):
+        '''
+        Adds mutants drawn uniformly among the mutants of an order that are not in the library yet.
+
+        Args:
+            n (int): Number of mutants to add.
+            order (int): Number of mutations per mutant.
+            seed (int or np.random.Generator): Seed or generator of the draws.
+
+        Returns:
+            int: Number of mutants added, always `n`.
+
+        Raises:
+            ValueError: If fewer than `n` mutants of this order are left.
+        '''
+        return self._sample(np.random.default_rng(seed), n, order)
+
+    def sample_stratified(self, n_per_stratum, orders=(1, 2), by='order', seed=0):
+        '''
+        Adds the same number of uniformly drawn mutants to every stratum.
+
+        With by='order' a stratum is an order. With by='position' a stratum is an (order, position)
+        pair, holding the mutants of that order which mutate that position; a stratum smaller than
+        `n_per_stratum` is added entirely.
+
+        Args:
+            n_per_stratum (int): Number of mutants added per stratum.
+            orders (iterable of int): Numbers of mutations.
+            by (str): 'order' or 'position'.
+            seed (int or np.random.Generator): Seed or generator of the draws.
+
+        Returns:
+            dict: Number of mutants added per stratum, keyed by order or (order, 0-based position).
+        '''
+        if by not in ('order', 'position'):
+            raise ValueError("by must be either 'order' or 'position'.")
+        rng = np.random.default_rng(seed)
+        if by == 'order':
+            return {order: self._sample(rng, n_per_stratum, order) for order in orders}
+
+        added = {}
+        for order in orders:
+            for position in self.mutable_positions.tolist():
+                present = ((self.orders == order) & (self.positions == position).any(axis=1)).sum()
+                n = min(n_per_stratum, self.count(order, position) - int(present))
+                added[(order, position)] = self._sample(rng, n, order, position) if n > 0 else 0
+        return added
+
+    def _rows(self, rows):
+        return np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64).reshape(-1)
+
+    def residue_indices(self, rows=None):
+        '''
+        Builds the alphabet indices of mutant sequences, without going through strings.
+
+        Args:
+            rows (array-like of int, optional): Library rows. Defaults to every row.
+
+        Returns:
+            np.ndarray: (n, L) int8 indices into `alphabet`.
+        '''
+        rows = self._rows(rows)
+        indices = np.tile(self.wildtype_indices, (len(rows), 1))
+        positions, residues = self.positions[rows], self.residues[rows]
+        mutated = positions >= 0
+        indices[np.nonzero(mutated)[0], positions[mutated]] = residues[mutated]
+        return indices
+
+    def tokens(self, rows, token_ids, prepend=(), append=()):
+        '''
+        Builds model tokens of mutant sequences straight from the integer form.
+
+        Args:
+            rows (array-like of int, optional): Library rows; None is every row.
+            token_ids (array-like of int): Token ID of each residue of `alphabet`.
+            prepend (iterable of int): Tokens placed before every sequence, e.g. BOS.
+            append (iterable of int): Tokens placed after every sequence, e.g. EOS.
+
+        Returns:
+            np.ndarray: (n, len(prepend) + L + len(append)) int64 tokens.
+        '''
+        residues = np.asarray(token_ids, dtype=np.int64)[self.residue_indices(rows)]
+        n = len(residues)
+        return np.hstack([np.tile(np.asarray(prepend, dtype=np.int64), (n, 1)), residues,
+                          np.tile(np.asarray(append, dtype=np.int64), (n, 1))])
+
+    def sequences(self, rows=None):
+        '''
+        Materializes mutant sequences as strings.
+
+        Args:
+            rows (array-like of int, optional): Library rows. Defaults to every row.
+
+        Returns:
+            list of str: The mutant sequences.
+        '''
+        letters = np.frombuffer(self.alphabet.encode('ascii'), dtype=np.uint8)[self.residue_indices(rows)]
+        return [row.decode('ascii') for row in np.ascontiguousarray(letters).view(f'S{len(self.wildtype)}').ravel()] \
+            if len(self.wildtype) else [''] * len(letters)
+
+    def iter_sequences(self, batch_size=1024):
+        '''
+        Materializes the mutant sequences batch by batch.
+
+        Args:
+            batch_size (int): Number of sequences per batch.
+
+        Yields:
+            tuple: (rows, list of str) for each batch, in library order.
+        '''
+        for start in range(0, len(self), batch_size):
+            rows = np.arange(start, min(start + batch_size, len(self)))
+            yield rows, self.sequences(rows)
+
+    def variant_ids(self, rows=None):
+        '''
+        Formats the variant IDs of mutants, e.g. 'A12G:L57P'.
+
+        Args:
+            rows (array-like of int, optional): Library rows. Defaults to every row.
+
+        Returns:
+            list of str: One ID per row, numbered from `offset`.
+        '''
+        rows = self._rows(rows)
+        return [self.separator.join(f'{self.wildtype[position]}{position + self.offset}{self.alphabet[residue]}'
+                                    for position, residue in zip(positions, residues) if position >= 0)
+                for positions, residues in zip(self.positions[rows].tolist(), self.residues[rows].tolist())]
+
+    def save(self, path):
+        np.savez(path, wildtype=self.wildtype, mutable_positions=self.mutable_positions, offset=self.offset,
+                 alphabet=self.alphabet, separator=self.separator, positions=self.positions, residues=self.residues)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            library = cls(str(data['wildtype']), data['mutable_positions'] + int(data['offset']), int(data['offset']),
+                          str(data['alphabet']), str(data['separator']))
+            library.positions, library.residues = data['positions'], data['residues']
+        return library
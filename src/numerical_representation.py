@@ -1,19 +1,418 @@
-from ifeatpro.features import get_all_features
-from transformers import T5Tokenizer, T5EncoderModel
-from sklearn.preprocessing import OneHotEncoder
-import torch
-import esm 
+import numpy as np
+import contextlib
+import copy
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import shutil
+import string
+import time
+import warnings
+
+try:
+    from .instrumentation import resident_memory_mb
+    from .variant_ids import AMINO_ACIDS, parse_variant_ids
+except ImportError:
+    from instrumentation import resident_memory_mb
+    from variant_ids import AMINO_ACIDS, parse_variant_ids
+
+# torch, esm, transformers, ifeatpro and scipy are imported where they are used, so that importing
+# this module (e.g. for one-hot encoding only) does not pay for the deep learning backends.
+
+PAD_INDEX = -1
+UNKNOWN_INDEX = -2
+PRECISIONS = ('fp32', 'bf16', 'int8')
+
+_PRETRAINED_MODELS = {}
+
+
+def resolve_device(device):
+    import torch
+
+    return torch.device(device if torch.cuda.is_available() else 'cpu')
+
+
+def apply_precision(model, precision, inplace=False):
+    '''
+    Prepares a model for an inference precision.
+
+    'fp32' and 'bf16' use the model as is ('bf16' runs it under autocast, see `precision_context`).
+    'int8' applies dynamic int8 quantization to the linear layers, which is only supported on CPU.
+
+    Args:
+        model (torch.nn.Module): Model in eval mode.
+        precision (str): One of PRECISIONS.
+        inplace (bool): Quantize `model` itself instead of a copy.
+
+    Returns:
+        torch.nn.Module: The model to run.
+    '''
+    import torch
+
+    if precision not in PRECISIONS:
+        raise ValueError(f'Unknown precision {precision!r}. Choose from {", ".join(PRECISIONS)}.')
+    if precision != 'int8':
+        return model
+    if next(model.parameters()).device.type != 'cpu':
+        raise ValueError('int8 dynamic quantization is only supported on CPU.')
+
+    model = model if inplace else copy.deepcopy(model)
+    for module in model.modules():
+        # ESM attention calls F.multi_head_attention_forward with the raw projection weights,
+        # which bypasses quantized linear layers; its module path goes through them.
+        if hasattr(module, 'enable_torch_version'):
+            module.enable_torch_version = False
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def precision_context(device, precision):
+    '''
+    Returns the context manager running a forward pass at the given precision.
+    '''
+    import torch
+
+    if precision == 'bf16':
+        return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def load_pretrained(name, device='cuda', precision='fp32'):
+    '''
+    Loads a pretrained model once per process, device and precision, and shares it between encoders.
+
+    Args:
+        name (str): 'esm1v' or 'prott5'.
+        device (str): Requested device, falls back to CPU without CUDA.
+        precision (str): One of PRECISIONS.
+
+    Returns:
+        tuple: (model, alphabet) for 'esm1v', (model, tokenizer) for 'prott5'.
+    '''
+    device = resolve_device(device)
+    # bf16 only changes how the forward pass runs, so it shares the fp32 weights.
+    key = (name, str(device), 'int8' if precision == 'int8' else 'fp32')
+    if key not in _PRETRAINED_MODELS:
+        base_key = (name, str(device), 'fp32')
+        if base_key in _PRETRAINED_MODELS:
+            model, extra = _PRETRAINED_MODELS[base_key]
+            _PRETRAINED_MODELS[key] = (apply_precision(model, precision), extra)
+        elif name == 'esm1v':
+            import esm
+
+            model, alphabet = esm.pretrained.esm1v_t33_650M_UR90S()
+            _PRETRAINED_MODELS[key] = (apply_precision(model.eval().to(device), precision, inplace=True), alphabet)
+        elif name == 'prott5':
+            from transformers import T5Tokenizer, T5EncoderModel
+
+            tokenizer = T5Tokenizer.from_pretrained('Rostlab/prot_t5_xl_uniref50', do_lower_case=False)
+            model = T5EncoderModel.from_pretrained('Rostlab/prot_t5_xl_uniref50')
+            _PRETRAINED_MODELS[key] = (apply_precision(model.eval().to(device), precision, inplace=True), tokenizer)
+        else:
+            raise ValueError(f'Unknown pretrained model {name!r}.')
+    return _PRETRAINED_MODELS[key]
+
+
+def _model_size_mb(model):
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 2**20
+
+
+class _NoMetrics:
+    '''
+    Stand-in for an `instrumentation.Metrics` collector, used when an encoder is not instrumented.
+    '''
+
+    def add(self, **values):
+        pass
+
+    def batch(self, name, token_lengths):
+        return self
+
+    def tokenized(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NO_METRICS = _NoMetrics()
+
+
+def compare_precisions(encoder_factory, method, sequences, precisions=PRECISIONS, **method_kwargs):
+    '''
+    Runs an encoder at several precisions on a reference set and compares them with fp32.
+
+    The memory of a precision is the resident memory added from before its encoder is built to after
+    its run, so weights shared with an earlier precision (bf16 reuses the fp32 ones) are not counted
+    again. int8 is skipped when the encoder does not run on CPU. Pretrained models loaded for the
+    comparison are released at the end, so the run that follows does not carry them.
+
+    Args:
+        encoder_factory (callable): Builds an encoder from a `precision` keyword argument.
+        method (str): Name of the encoder method mapping a list of sequences to an (n, D) array.
+        sequences (list of str): Reference sequences.
+        precisions (iterable of str): Precisions to compare, fp32 is always run as the reference.
+        **method_kwargs: Passed to `method`.
+
+    Returns:
+        dict: For each precision, sequences_per_s, rss_delta_mb (resident memory added by the precision),
+            model_mb (serialized weights), mean and min cosine similarity to fp32 and max_abs_error, or
+            {'skipped': reason} for a precision that cannot run on the encoder's device.
+    '''
+    import gc
+
+    sequences = list(sequences)
+    report = {}
+    reference = device = None
+    loaded = set(_PRETRAINED_MODELS)
+    try:
+        for precision in ['fp32'] + [p for p in precisions if p != 'fp32']:
+            if precision == 'int8' and device.type != 'cpu':
+                report[precision] = {'skipped': f'int8 dynamic quantization is only supported on CPU, not {device}.'}
+                continue
+            gc.collect()
+            rss = resident_memory_mb()
+            encoder = encoder_factory(precision=precision)
+            embed = getattr(encoder, method)
+            embed(sequences[:1], **method_kwargs)
+
+            start = time.perf_counter()
+            embeddings = embed(sequences, **method_kwargs)
+            elapsed = time.perf_counter() - start
+
+            if reference is None:
+                reference, device = embeddings, encoder.device
+            cosine = (embeddings * reference).sum(1) / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference, axis=1))
+            report[precision] = {
+                'sequences_per_s': len(sequences) / elapsed,
+                'rss_delta_mb': resident_memory_mb() - rss if rss is not None else None,
+                'model_mb': _model_size_mb(encoder.model),
+                'mean_cosine_similarity': float(cosine.mean()),
+                'min_cosine_similarity': float(cosine.min()),
+                'max_abs_error': float(np.abs(embeddings - reference).max())
+            }
+            del encoder, embed
+    finally:
+        for key in set(_PRETRAINED_MODELS) - loaded:
+            del _PRETRAINED_MODELS[key]
+        gc.collect()
+    return {precision: report[precision] for precision in precisions if precision in report}
 
 class OneHotEncoding:
+    '''
+    One-hot encoder for protein sequences over the 20 standard amino acids.
+
+    Sequences are mapped in bulk through a 256-entry byte -> index lookup table, so a whole
+    batch is encoded with a handful of array operations instead of one encoder call per sequence.
+
+    Index arrays use `PAD_INDEX` (-1) for padding positions and `UNKNOWN_INDEX` (-2) for
+    non-standard residues (X, U, B, Z, O, gaps, lowercase letters, ...).
+
+    Methods:
+        encode(sequence):
+            One-hot encodes a single sequence into a flat (L * 20,) vector.
+        encode_indices(sequences, max_length=None, unknown='error'):
+            Converts sequences into a padded (N, L) int8 array of residue indices.
+        encode_batch(sequences, max_length=None, unknown='error', packed=False, return_mask=False):
+            One-hot encodes sequences into a single (N, L, 20) uint8 array, optionally bit-packed.
+        encode_sparse(sequences, max_length=None, unknown='error'):
+            One-hot encodes sequences into a sparse (N, L * 20) CSR matrix.
+        encode_library(library, rows=None, packed=False):
+            One-hot encodes rows of a `MutantLibrary` from its integer form, without building strings.
+        find_non_standard(sequences):
+            Lists every non-standard residue as (sequence index, position, residue).
+    '''
 
     def __init__(self):
-        self.encoder = OneHotEncoder(sparse_output=False, categories=[list('ACDEFGHIKLMNPQRSTVWY')])
-    
+        self.alphabet = AMINO_ACIDS
+        self.lookup_table = np.full(256, UNKNOWN_INDEX, dtype=np.int8)
+        self.lookup_table[np.frombuffer(AMINO_ACIDS.encode('ascii'), dtype=np.uint8)] = np.arange(len(AMINO_ACIDS))
+
+    def _flat_indices(self, sequences):
+        sequences = list(sequences)
+        lengths = np.fromiter((len(seq) for seq in sequences), dtype=np.int64, count=len(sequences))
+        # Non-ASCII characters become '?', which keeps one byte per residue and maps to UNKNOWN_INDEX.
+        residues = np.frombuffer(''.join(sequences).encode('ascii', errors='replace'), dtype=np.uint8)
+        return self.lookup_table[residues], lengths
+
+    def find_non_standard(self, sequences):
+        '''
+        Finds the residues that are not one of the 20 standard amino acids.
+
+        Args:
+            sequences (iterable of str): Protein sequences.
+
+        Returns:
+            list of tuple: (sequence index, 0-based position, residue) for each non-standard residue.
+        '''
+        sequences = list(sequences)
+        flat, lengths = self._flat_indices(sequences)
+        unknown = np.flatnonzero(flat == UNKNOWN_INDEX)
+        starts = np.cumsum(lengths) - lengths
+        seq_idx = np.searchsorted(starts, unknown, side='right') - 1
+        positions = unknown - starts[seq_idx]
+        return [(int(i), int(pos), sequences[i][pos]) for i, pos in zip(seq_idx, positions)]
+
+    def encode_indices(self, sequences, max_length=None, unknown='error'):
+        '''
+        Converts sequences into a padded array of residue indices.
+
+        Args:
+            sequences (iterable of str): Protein sequences, possibly of different lengths.
+            max_length (int, optional): Length to pad to. Defaults to the longest sequence.
+            unknown (str): 'error' raises on non-standard residues, 'ignore' keeps them as UNKNOWN_INDEX.
+
+        Returns:
+            np.ndarray: (N, max_length) int8 array of indices into AMINO_ACIDS.
+
+        Raises:
+            ValueError: If a sequence is longer than `max_length`, or if non-standard residues
+                are found and `unknown='error'`.
+        '''
+        if unknown not in ('error', 'ignore'):
+            raise ValueError("unknown must be either 'error' or 'ignore'.")
+
+        sequences = list(sequences)
+        flat, lengths = self._flat_indices(sequences)
+
+        if unknown == 'error' and (flat == UNKNOWN_INDEX).any():
+            found = self.find_non_standard(sequences)
+            listing = ', '.join(f'seq {i} pos {pos} {residue!r}' for i, pos, residue in found[:10])
+            more = f' and {len(found) - 10} more' if len(found) > 10 else ''
+            raise ValueError(f'Non-standard residues found ({len(found)}): {listing}{more}. '
+                             "Use unknown='ignore' to encode them as all-zero positions.")
+
+        longest = int(lengths.max()) if len(lengths) else 0
+        if max_length is None:
+            max_length = longest
+        elif longest > max_length:
+            raise ValueError(f'Sequence of length {longest} is longer than max_length={max_length}.')
+
+        indices = np.full((len(sequences), max_length), PAD_INDEX, dtype=np.int8)
+        if (lengths == max_length).all():
+            indices[:] = flat.reshape(len(sequences), max_length)
+        else:
+            rows = np.repeat(np.arange(len(sequences)), lengths)
+            starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+            indices[rows, np.arange(len(flat)) - starts] = flat
+        return indices
+
+    def encode_batch(self, sequences, max_length=None, unknown='error', packed=False, return_mask=False):
+        '''
+        One-hot encodes a batch of sequences into a single uint8 tensor.
+
+        Padding and non-standard residues (with `unknown='ignore'`) are encoded as all-zero positions.
+
+        Args:
+            sequences (iterable of str): Protein sequences, possibly of different lengths.
+            max_length (int, optional): Length to pad to. Defaults to the longest sequence.
+            unknown (str): 'error' raises on non-standard residues, 'ignore' encodes them as zeros.
+            packed (bool): If True, bit-pack each flattened row with `np.packbits`, giving an
+                (N, ceil(max_length * 20 / 8)) uint8 array.
+            return_mask (bool): If True, also return the (N, max_length) boolean mask of
+                non-padding positions.
+
+        Returns:
+            np.ndarray or tuple: (N, max_length, 20) uint8 one-hot array (or its packed form),
+                and the mask if requested.
+        '''
+        indices = self.encode_indices(sequences, max_length=max_length, unknown=unknown)
+        one_hot = self._one_hot(indices, packed)
+        if return_mask:
+            return one_hot, indices != PAD_INDEX
+        return one_hot
+
+    def _one_hot(self, indices, packed=False):
+        one_hot = (indices[..., None] == np.arange(len(self.alphabet), dtype=np.int8)).view(np.uint8)
+        if packed:
+            one_hot = np.packbits(one_hot.reshape(len(indices), -1), axis=1)
+        return one_hot
+
+    def encode_library(self, library, rows=None, packed=False):
+        '''
+        One-hot encodes mutants of a `MutantLibrary` straight from their integer form.
+
+        Args:
+            library (MutantLibrary): Library of mutants of one wildtype.
+            rows (array-like of int, optional): Library rows. Defaults to every row.
+            packed (bool): If True, bit-pack each flattened row as in `encode_batch`.
+
+        Returns:
+            np.ndarray: (n, L, 20) uint8 one-hot array, or its packed form.
+        '''
+        # Library alphabet indices are remapped to AMINO_ACIDS indices through the byte lookup table.
+        remap = self.lookup_table[np.frombuffer(library.alphabet.encode('ascii'), dtype=np.uint8)]
+        return self._one_hot(remap[library.residue_indices(rows)], packed)
+
+    def encode_sparse(self, sequences, max_length=None, unknown='error'):
+        '''
+        One-hot encodes a batch of sequences into a sparse matrix.
+
+        Args:
+            sequences (iterable of str): Protein sequences, possibly of different lengths.
+            max_length (int, optional): Length to pad to. Defaults to the longest sequence.
+            unknown (str): 'error' raises on non-standard residues, 'ignore' encodes them as zeros.
+
+        Returns:
+            scipy.sparse.csr_matrix: (N, max_length * 20) uint8 matrix with one stored entry per residue.
+        '''
+        from scipy import sparse
+
+        indices = self.encode_indices(sequences, max_length=max_length, unknown=unknown)
+        n_sequences, length = indices.shape
+        rows, positions = np.nonzero(indices >= 0)
+        columns = positions * len(self.alphabet) + indices[rows, positions]
+        data = np.ones(len(rows), dtype=np.uint8)
+        return sparse.csr_matrix((data, (rows, columns)), shape=(n_sequences, length * len(self.alphabet)))
+
     def encode(self, sequence):
-        sequence = [[aa] for aa in sequence]
-        return self.encoder.fit_transform(sequence).flatten()
+        return self.encode_batch([sequence])[0].flatten().astype(np.float64)
     
+def _ifeatpro_shard(task):
+    from ifeatpro.features import get_all_features
+
+    shard_dir, sequences = task
+    # Work in a scratch directory and rename it when every descriptor is written, so that an
+    # interrupted run never leaves a shard that looks complete.
+    scratch_dir = f'{shard_dir}.tmp{os.getpid()}'
+    shutil.rmtree(scratch_dir, ignore_errors=True)
+    os.makedirs(scratch_dir)
+    with open(os.path.join(scratch_dir, 'sequences.fasta'), 'w') as f:
+        for i, seq in enumerate(sequences):
+            f.write(f'>seq{i}\n{seq}\n')
+    with contextlib.redirect_stdout(io.StringIO()):
+        get_all_features(os.path.join(scratch_dir, 'sequences.fasta'), scratch_dir)
+    try:
+        os.rename(scratch_dir, shard_dir)
+    except OSError:
+        # Another run finished the same shard first.
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    return shard_dir
+
+
 class IfeatproEncoding:
+    '''
+    Computes every iFeatPro descriptor of a set of sequences into one CSV per descriptor in `output_dir`.
+
+    `get_fasta_file` followed by `get_ifeatpro_features` runs iFeatPro once over all the sequences.
+    `get_ifeatpro_features_sharded` splits them into shards, runs iFeatPro on each shard in a pool
+    of worker processes and merges the CSVs back in sequence order. Shards are stored under
+    `output_dir/ifeatpro_shards`, named by the hash of their sequences, so unchanged shards are
+    reused by later runs.
+
+    Parameters:
+        output_dir (str): Directory receiving the descriptor CSVs.
+    '''
 
     def __init__(self, output_dir):
         self.output_dir = output_dir
@@ -24,27 +423,1097 @@ class IfeatproEncoding:
                 f.write(f'>seq{i}\n{seq}\n')
 
     def get_ifeatpro_features(self):
+        from ifeatpro.features import get_all_features
+
         get_all_features(f'{self.output_dir}/sequences.fasta', self.output_dir)
 
+    @staticmethod
+    def shard_key(sequences):
+        digest = hashlib.sha256()
+        for seq in sequences:
+            digest.update(seq.encode())
+            digest.update(b'\n')
+        return digest.hexdigest()
+
+    def get_ifeatpro_features_sharded(self, sequences, shard_size=10000, n_workers=None, mp_context='spawn',
+                                      prune=True):
+        '''
+        Computes the iFeatPro descriptors shard by shard in parallel, skipping the shards computed before.
+
+        Shards are consecutive blocks of `shard_size` sequences, so appending sequences to a dataset
+        only recomputes its last, partial shard and the new ones. The merged CSVs have the same layout
+        as `get_ifeatpro_features`, with the rows named seq0, seq1, ... in input order.
+
+        Args:
+            sequences (iterable of str): Protein sequences.
+            shard_size (int): Number of sequences per shard.
+            n_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            mp_context (str): Multiprocessing start method.
+            prune (bool): Remove the stored shards that are no longer part of the dataset.
+
+        Returns:
+            dict: Number of 'computed' and 'skipped' shards.
+        '''
+        from ifeatpro.features import FEAT_TYPES
+
+        sequences = list(sequences)
+        shards_dir = os.path.join(self.output_dir, 'ifeatpro_shards')
+        os.makedirs(shards_dir, exist_ok=True)
+        blocks = [sequences[start:start + shard_size] for start in range(0, len(sequences), shard_size)]
+        shard_dirs = [os.path.join(shards_dir, self.shard_key(block)) for block in blocks]
+        tasks = [(shard_dir, block) for shard_dir, block in zip(shard_dirs, blocks) if not os.path.isdir(shard_dir)]
+        # Identical shards (e.g. repeated blocks) are computed once.
+        tasks = list({shard_dir: (shard_dir, block) for shard_dir, block in tasks}.values())
+
+        if tasks:
+            n_workers = min(n_workers or os.cpu_count() or 1, len(tasks))
+            if n_workers > 1:
+                with multiprocessing.get_context(mp_context).Pool(n_workers) as pool:
+                    list(pool.imap_unordered(_ifeatpro_shard, tasks))
+            else:
+                for task in tasks:
+                    _ifeatpro_shard(task)
+
+        for feature_type in FEAT_TYPES:
+            with open(os.path.join(self.output_dir, f'{feature_type}.csv'), 'w') as merged:
+                row = 0
+                for shard_dir in shard_dirs:
+                    with open(os.path.join(shard_dir, f'{feature_type}.csv')) as f:
+                        for line in f:
+                            merged.write(f'seq{row}{line[line.index(","):]}')
+                            row += 1
+
+        if prune:
+            current = {os.path.basename(shard_dir) for shard_dir in shard_dirs}
+            for name in os.listdir(shards_dir):
+                if name not in current:
+                    shutil.rmtree(os.path.join(shards_dir, name), ignore_errors=True)
+
+        return {'computed': len(tasks), 'skipped': len(blocks) - len(tasks)}
+
+DESCRIPTORS = ('aac', 'dpc', 'cksaap', 'ctdc', 'ctdt', 'ctdd', 'moran', 'geary', 'nmbroto')
+
+# Residue order of the AAindex tables, as in iFeature/iFeatPro's AAidx.txt.
+AAINDEX_ORDER = 'ARNDCQEGHILKMFPSTWYV'
+
+# The eight AAindex properties used by default by iFeatPro's moran, geary and nmbroto descriptors.
+AAINDEX = {
+    'CIDH920105': [0.02, -0.42, -0.77, -1.04, 0.77, -1.1, -1.14, -0.8, 0.26, 1.81,
+                   1.14, -0.41, 1, 1.35, -0.09, -0.97, -0.77, 1.71, 1.11, 1.13],
+    'BHAR880101': [0.357, 0.529, 0.463, 0.511, 0.346, 0.493, 0.497, 0.544, 0.323, 0.462,
+                   0.365, 0.466, 0.295, 0.314, 0.509, 0.507, 0.444, 0.305, 0.42, 0.386],
+    'CHAM820101': [0.046, 0.291, 0.134, 0.105, 0.128, 0.18, 0.151, 0, 0.23, 0.186,
+                   0.186, 0.219, 0.221, 0.29, 0.131, 0.062, 0.108, 0.409, 0.298, 0.14],
+    'CHAM820102': [-0.368, -1.03, 0, 2.06, 4.53, 0.731, 1.77, -0.525, 0, 0.791,
+                   1.07, 0, 0.656, 1.06, -2.24, -0.524, 0, 1.6, 4.91, 0.401],
+    'CHOC760101': [115, 225, 160, 150, 135, 180, 190, 75, 195, 175,
+                   170, 200, 185, 210, 145, 115, 140, 255, 230, 155],
+    'BIGC670101': [52.6, 109.1, 75.7, 68.4, 68.3, 89.7, 84.7, 36.3, 91.9, 102,
+                   102, 105.1, 97.7, 113.9, 73.6, 54.9, 71.2, 135.4, 116.2, 85.1],
+    'CHAM810101': [0.52, 0.68, 0.76, 0.76, 0.62, 0.68, 0.68, 0, 0.7, 1.02,
+                   0.98, 0.68, 0.78, 0.7, 0.36, 0.53, 0.5, 0.7, 0.7, 0.76],
+    'DAYM780201': [100, 65, 134, 106, 20, 93, 102, 49, 66, 96, 40, 56, 94, 41, 56, 120, 97, 18, 41, 74]
+}
+
+# The three residue groups of each physicochemical attribute of the CTD descriptors.
+CTD_GROUPS = {
+    'hydrophobicity_PRAM900101': ('RKEDQN', 'GASTPHY', 'CLVIMFW'),
+    'hydrophobicity_ARGP820101': ('QSTNGDE', 'RAHCKMV', 'LYPFIW'),
+    'hydrophobicity_ZIMJ680101': ('QNGSWTDERA', 'HMCKV', 'LPFYI'),
+    'hydrophobicity_PONP930101': ('KPDESNQT', 'GRHA', 'YMFWLCVI'),
+    'hydrophobicity_CASG920101': ('KDEQPSRNTG', 'AHYMLV', 'FIWC'),
+    'hydrophobicity_ENGD860101': ('RDKENQHYP', 'SGTAW', 'CVLIMF'),
+    'hydrophobicity_FASG890101': ('KERSQD', 'NTPG', 'AYHWVMFLIC'),
+    'normwaalsvolume': ('GASTPDC', 'NVEQIL', 'MHKFRYW'),
+    'polarity': ('LIFWCMVY', 'PATGS', 'HQRKNED'),
+    'polarizability': ('GASDT', 'CPNVEQIL', 'KMHFRYW'),
+    'charge': ('KR', 'ANCQGHILMFPSTWYV', 'DE'),
+    'secondarystruct': ('EALMQKRH', 'VIYCWFT', 'GNPSD'),
+    'solventaccess': ('ALFCGIVW', 'RKQEND', 'MSPTHY')
+}
+
+
+def read_aaindex(path):
+    '''
+    Reads an AAindex table in iFeatPro's AAidx.txt layout (a header row of residues, then one
+    tab-separated row per property).
+
+    Args:
+        path (str): Path of the table.
+
+    Returns:
+        dict: Maps property accession numbers to their 20 values in AAINDEX_ORDER.
+    '''
+    with open(path) as f:
+        header = f.readline().rstrip().split('\t')[1:]
+        order = [header.index(aa) for aa in AAINDEX_ORDER]
+        table = {}
+        for line in f:
+            fields = line.rstrip().split('\t')
+            if len(fields) > 1:
+                table[fields[0]] = [float(fields[1:][i]) for i in order]
+    return table
+
+
+class DescriptorEncoding:
+    '''
+    In-memory physicochemical descriptors computed with NumPy from integer-encoded sequences.
+
+    A fast alternative to `IfeatproEncoding` for the most used iFeatPro descriptors, with the same
+    definitions and no FASTA/CSV round trip:
+
+    - 'aac': amino acid composition (20).
+    - 'dpc': dipeptide composition (400).
+    - 'cksaap': composition of k-spaced amino acid pairs for k = 0..gap (400 * (gap + 1)).
+    - 'ctdc', 'ctdt', 'ctdd': composition, transition and distribution of 13 grouped attributes (39, 39, 195).
+    - 'moran', 'geary', 'nmbroto': Moran, Geary and normalized Moreau-Broto autocorrelations of
+      standardized AAindex properties for lags 1..nlag (len(props) * nlag).
+
+    As in iFeatPro, sequences are upper-cased and, with `unknown='ignore'`, non-standard residues are
+    treated as gaps: they are removed before every descriptor but 'cksaap', which only skips the pairs
+    containing them. Values iFeatPro cannot compute (e.g. autocorrelations of sequences not longer
+    than `nlag`) are NaN.
+
+    Parameters:
+        descriptors (tuple of str): Descriptors to compute, from DESCRIPTORS, in output order.
+        gap (int): Largest gap of 'cksaap'.
+        nlag (int): Largest lag of the autocorrelation descriptors.
+        props (tuple of str): AAindex properties of the autocorrelation descriptors.
+        aaindex_file (str, optional): AAindex table (see `read_aaindex`) with properties beyond AAINDEX.
+        unknown (str): 'error' raises on non-standard residues, 'ignore' treats them as gaps.
+        batch_size (int): Number of sequences processed at a time, which bounds the temporary memory.
+
+    Methods:
+        feature_names(): Names of the output columns.
+        encode_descriptors(sequences): Dict of (N, F) arrays, one per descriptor.
+        encode(sequences): One (N, F) feature matrix with every selected descriptor.
+        encode_frame(sequences, index=None): The same matrix as a DataFrame with named columns.
+    '''
+
+    def __init__(self, descriptors=DESCRIPTORS, gap=5, nlag=30, props=tuple(AAINDEX), aaindex_file=None,
+                 unknown='error', batch_size=1024):
+        descriptors = (descriptors,) if isinstance(descriptors, str) else tuple(descriptors)
+        invalid = [name for name in descriptors if name not in DESCRIPTORS]
+        if invalid:
+            raise ValueError(f'Unknown descriptors {invalid}. Choose from {", ".join(DESCRIPTORS)}.')
+        if gap < 0 or nlag < 1:
+            raise ValueError('gap must be non-negative and nlag positive.')
+
+        self.descriptors = descriptors
+        self.gap = gap
+        self.nlag = nlag
+        self.props = tuple(props)
+        self.unknown = unknown
+        self.batch_size = batch_size
+        self.index_encoder = OneHotEncoding()
+
+        table = dict(AAINDEX, **(read_aaindex(aaindex_file) if aaindex_file is not None else {}))
+        missing = [prop for prop in self.props if prop not in table]
+        if missing:
+            raise ValueError(f'AAindex properties not found: {missing}. Pass an aaindex_file that defines them.')
+        order = [AAINDEX_ORDER.index(aa) for aa in AMINO_ACIDS]
+        values = np.array([table[prop] for prop in self.props], dtype=np.float64).reshape(len(self.props), 20)[:, order]
+        values = (values - values.mean(axis=1, keepdims=True)) / values.std(axis=1, keepdims=True)
+        # Column 0 is the padding value, so that `values[:, indices + 1]` maps PAD_INDEX to 0.
+        self.property_values = np.concatenate([np.zeros((len(self.props), 1)), values], axis=1)
+
+        # (attribute, group, residue) membership and the transition class of every residue pair.
+        self.ctd_members = np.array([[[aa in group for aa in AMINO_ACIDS] for group in groups]
+                                     for groups in CTD_GROUPS.values()])
+        first = self.ctd_members[:, :, :, None]
+        second = self.ctd_members[:, :, None, :]
+        transitions = []
+        for a, b in [(0, 1), (0, 2), (1, 2)]:
+            pairs = (first[:, a] & second[:, b]) | (first[:, b] & second[:, a])
+            for previous in transitions:
+                pairs = pairs & ~previous
+            transitions.append(pairs)
+        self.ctd_transitions = np.stack(transitions, axis=1).reshape(len(CTD_GROUPS), 3, 400)
+
+    def _descriptor_columns(self):
+        pairs = [aa1 + aa2 for aa1 in AMINO_ACIDS for aa2 in AMINO_ACIDS]
+        names = {
+            'aac': [f'aac_{aa}' for aa in AMINO_ACIDS],
+            'dpc': [f'dpc_{pair}' for pair in pairs],
+            'cksaap': [f'cksaap_{pair}.gap{g}' for g in range(self.gap + 1) for pair in pairs],
+            'ctdc': [f'ctdc_{attribute}.G{group}' for attribute in CTD_GROUPS for group in (1, 2, 3)],
+            'ctdt': [f'ctdt_{attribute}.Tr{pair}' for attribute in CTD_GROUPS for pair in ('1221', '1331', '2332')],
+            'ctdd': [f'ctdd_{attribute}.{group}.residue{cutoff}' for attribute in CTD_GROUPS for group in (1, 2, 3)
+                     for cutoff in (0, 25, 50, 75, 100)]
+        }
+        for name in ('moran', 'geary', 'nmbroto'):
+            names[name] = [f'{name}_{prop}.lag{lag}' for prop in self.props for lag in range(1, self.nlag + 1)]
+        return {name: names[name] for name in self.descriptors}
+
+    def feature_names(self):
+        return [column for columns in self._descriptor_columns().values() for column in columns]
+
+    def _indices(self, sequences):
+        indices = self.index_encoder.encode_indices([seq.upper() for seq in sequences], unknown=self.unknown)
+        known = indices != UNKNOWN_INDEX
+        if known.all():
+            return indices, indices
+        # Gaps are removed by shifting the known residues of each row to the left.
+        order = np.argsort(~known, axis=1, kind='stable')
+        compact = np.take_along_axis(np.where(known, indices, PAD_INDEX), order, axis=1)
+        return indices, compact
+
+    @staticmethod
+    def _pair_counts(indices, offset):
+        n_sequences = len(indices)
+        first, second = indices[:, :-offset], indices[:, offset:]
+        valid = (first >= 0) & (second >= 0)
+        rows = np.nonzero(valid)[0]
+        codes = rows * 400 + first[valid].astype(np.int64) * 20 + second[valid]
+        return np.bincount(codes, minlength=n_sequences * 400).reshape(n_sequences, 400).astype(np.float64)
+
+    def _ctdd(self, compact, lengths):
+        n_sequences, width = compact.shape
+        row_offsets = np.arange(n_sequences)[:, None] * (width + 1)
+        features = []
+        for members in self.ctd_members.reshape(-1, 20):
+            in_group = np.concatenate([[False], members])[compact + 1]
+            cumulative = np.cumsum(in_group, axis=1, dtype=np.int64)
+            number = cumulative[:, -1] if width else np.zeros(n_sequences, dtype=np.int64)
+            cutoffs = np.stack([np.ones_like(number)] + [np.floor(fraction * number).astype(np.int64)
+                                                       for fraction in (0.25, 0.5, 0.75)] + [number], axis=1)
+            cutoffs = np.maximum(cutoffs, 1)
+            # Each row's counts are non-decreasing, so shifting the rows apart lets one searchsorted
+            # find the position of the cutoff-th group residue in every row.
+            flat = np.searchsorted((cumulative + row_offsets).ravel(), (cutoffs + row_offsets).ravel())
+            positions = flat.reshape(n_sequences, 5) - np.arange(n_sequences)[:, None] * width
+            with np.errstate(divide='ignore', invalid='ignore'):
+                features.append(np.where(number[:, None] > 0, (positions + 1) / lengths[:, None] * 100, 0.0))
+        return np.concatenate(features, axis=1)
+
+    def _autocorrelations(self, compact, lengths):
+        n_sequences, width = compact.shape
+        values = self.property_values[:, compact + 1]
+        mask = compact >= 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            centered = (values - values.sum(axis=2, keepdims=True) / lengths[:, None]) * mask
+            variance = (centered ** 2).sum(axis=2)
+            results = {name: np.full((len(self.props), n_sequences, self.nlag), np.nan)
+                       for name in ('moran', 'geary', 'nmbroto')}
+            for lag in range(1, min(self.nlag, width - 1) + 1):
+                pairs = lengths - lag
+                results['nmbroto'][:, :, lag - 1] = (values[:, :, :-lag] * values[:, :, lag:]).sum(axis=2) / pairs
+                results['moran'][:, :, lag - 1] = ((centered[:, :, :-lag] * centered[:, :, lag:]).sum(axis=2) / pairs
+                                                   / (variance / lengths))
+                squares = ((values[:, :, :-lag] - values[:, :, lag:]) * mask[:, lag:]) ** 2
+                results['geary'][:, :, lag - 1] = (lengths - 1) / (2 * pairs) * squares.sum(axis=2) / variance
+        short = lengths <= self.nlag
+        return {name: np.where(short[:, None], np.nan, result.transpose(1, 0, 2).reshape(n_sequences, -1))
+                for name, result in results.items()}
+
+    def _encode_block(self, sequences):
+        indices, compact = self._indices(sequences)
+        lengths = (compact >= 0).sum(axis=1)
+        n_sequences = len(sequences)
+        selected = set(self.descriptors)
+        features = {}
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            counts = np.zeros((n_sequences, 20))
+            if selected & {'aac', 'ctdc'}:
+                rows = np.nonzero(compact >= 0)[0]
+                counts = np.bincount(rows * 20 + compact[compact >= 0], minlength=n_sequences * 20)
+                counts = counts.reshape(n_sequences, 20).astype(np.float64)
+            if 'aac' in selected:
+                features['aac'] = counts / lengths[:, None]
+            if selected & {'dpc', 'ctdt'}:
+                dipeptides = self._pair_counts(compact, 1)
+            if 'dpc' in selected:
+                totals = dipeptides.sum(axis=1, keepdims=True)
+                features['dpc'] = np.where(totals > 0, dipeptides / totals, 0.0)
+            if 'cksaap' in selected:
+                blocks = []
+                for g in range(self.gap + 1):
+                    pairs = self._pair_counts(indices, g + 1)
+                    blocks.append(pairs / pairs.sum(axis=1, keepdims=True))
+                features['cksaap'] = np.concatenate(blocks, axis=1)
+            if 'ctdc' in selected:
+                fractions = counts @ self.ctd_members[:, :2].reshape(-1, 20).T.astype(np.float64) / lengths[:, None]
+                fractions = fractions.reshape(n_sequences, len(CTD_GROUPS), 2)
+                third = 1 - fractions[:, :, 0] - fractions[:, :, 1]
+                features['ctdc'] = np.concatenate([fractions, third[:, :, None]], axis=2).reshape(n_sequences, -1)
+            if 'ctdt' in selected:
+                transitions = dipeptides @ self.ctd_transitions.reshape(-1, 400).T.astype(np.float64)
+                features['ctdt'] = transitions / (lengths[:, None] - 1)
+        if 'ctdd' in selected:
+            features['ctdd'] = self._ctdd(compact, lengths)
+        if selected & {'moran', 'geary', 'nmbroto'}:
+            features.update(self._autocorrelations(compact, lengths))
+        return {name: features[name] for name in self.descriptors}
+
+    def encode_descriptors(self, sequences):
+        '''
+        Computes every selected descriptor.
+
+        Args:
+            sequences (iterable of str): Protein sequences.
+
+        Returns:
+            dict: Maps each descriptor name to its (N, F) float64 array.
+
+        Raises:
+            ValueError: If non-standard residues are found and `unknown='error'`.
+        '''
+        sequences = list(sequences)
+        blocks = [self._encode_block(sequences[start:start + self.batch_size])
+                  for start in range(0, len(sequences), self.batch_size)]
+        if not blocks:
+            return {name: np.empty((0, len(columns))) for name, columns in self._descriptor_columns().items()}
+        return {name: np.concatenate([block[name] for block in blocks]) for name in self.descriptors}
+
+    def encode(self, sequences):
+        '''
+        Computes the selected descriptors as one feature matrix, columns ordered like `feature_names()`.
+
+        Args:
+            sequences (iterable of str): Protein sequences.
+
+        Returns:
+            np.ndarray: (N, F) float64 feature matrix.
+        '''
+        return np.concatenate(list(self.encode_descriptors(sequences).values()), axis=1)
+
+    def encode_frame(self, sequences, index=None):
+        import pandas as pd
+
+        return pd.DataFrame(self.encode(sequences), columns=self.feature_names(), index=index)
+
+def length_batches(lengths, max_tokens, max_batch_size=None):
+    '''
+    Groups sequences into length-sorted batches whose padded size fits a token budget.
+
+    Sequences are sorted by decreasing length and packed greedily, so every batch costs at most
+    `max_tokens` padded tokens (a sequence longer than the budget gets a batch of its own).
+
+    Args:
+        lengths (array-like of int): Token length of each sequence, special tokens included.
+        max_tokens (int): Maximum number of padded tokens per batch (batch size * longest length).
+        max_batch_size (int, optional): Maximum number of sequences per batch.
+
+    Returns:
+        list of np.ndarray: Indices into `lengths` for each batch.
+    '''
+    lengths = np.asarray(lengths)
+    order = np.argsort(-lengths, kind='stable')
+    batches = []
+    current = []
+    for idx in order:
+        # Sorted by decreasing length, so the first sequence of a batch sets its padded length.
+        padded_length = lengths[current[0]] if current else lengths[idx]
+        full = max_batch_size is not None and len(current) >= max_batch_size
+        if current and (full or (len(current) + 1) * padded_length > max_tokens):
+            batches.append(np.array(current))
+            current = []
+        current.append(idx)
+    if current:
+        batches.append(np.array(current))
+    return batches
+
+def masked_mean(token_representations, mask):
+    '''
+    Averages token representations over the positions selected by a boolean mask.
+
+    Args:
+        token_representations (torch.Tensor): (B, T, D) token representations.
+        mask (torch.Tensor): (B, T) boolean mask of the tokens to average.
+
+    Returns:
+        torch.Tensor: (B, D) pooled representations.
+    '''
+    # Accumulate in fp32 so that reduced-precision activations do not lose accuracy in the sum.
+    token_representations = token_representations.float()
+    mask = mask.unsqueeze(-1).to(token_representations.dtype)
+    return (token_representations * mask).sum(1) / mask.sum(1).clamp(min=1)
+
+def parse_variant_id(variant_id, separator=':'):
+    '''
+    Parses a variant identifier such as 'A123G' or a multi-mutant such as 'A12G:L57P'.
+
+    The ID goes through `variant_ids.parse_variant_ids`, so both accept the same format.
+
+    Args:
+        variant_id (str): Variant identifier in the format produced by `ProteinVariantGenerator`.
+        separator (str): Separator between the single mutations of a multi-mutant.
+
+    Returns:
+        list of tuple: (wildtype residue, 1-based position, mutant residue) for each mutation.
+
+    Raises:
+        ValueError: If a mutation is not in the X123Y format.
+    '''
+    parsed = parse_variant_ids([variant_id], separator=separator, alphabet=string.ascii_uppercase)
+    _, wildtype, position, mutant = parsed.mutations()
+    return [(parsed.alphabet[wt], int(pos), parsed.alphabet[mut]) for wt, pos, mut in zip(wildtype, position, mutant)]
+
+def cached_embeddings(cache, model_id, layer, pooling, sequences, compute):
+    '''
+    Returns embeddings from a cache, running `compute` only on the sequences that are missing.
+
+    Missing sequences are deduplicated before being computed, and the new embeddings are stored.
+
+    Args:
+        cache (EmbeddingCache or None): Cache to look up; None always computes.
+        model_id (str): Identifier of the model checkpoint.
+        layer (int): Representation layer.
+        pooling (str): Pooling applied to the token representations.
+        sequences (list of str): Protein sequences.
+        compute (callable): Maps a list of sequences to an (n, D) array of embeddings.
+
+    Returns:
+        np.ndarray: (N, D) embeddings in the order of `sequences`.
+    '''
+    if cache is None or not sequences:
+        return compute(sequences)
+
+    found = cache.get_many(model_id, layer, pooling, sequences)
+    missing = list(dict.fromkeys(seq for seq, embedding in zip(sequences, found) if embedding is None))
+    if missing:
+        computed = compute(missing)
+        cache.put_many(model_id, layer, pooling, missing, computed)
+        computed = dict(zip(missing, computed))
+        found = [computed[seq] if embedding is None else embedding for seq, embedding in zip(sequences, found)]
+    return np.stack(found)
+
+def sliding_windows(length, window, stride):
+    '''
+    Splits a sequence into overlapping windows that cover every residue.
+
+    Windows start every `stride` residues and the last one is aligned with the end of the sequence,
+    so every window but possibly a single one has exactly `window` residues.
+
+    Args:
+        length (int): Sequence length.
+        window (int): Window length.
+        stride (int): Distance between the starts of consecutive windows.
+
+    Returns:
+        list of tuple: (start, stop) of each window.
+    '''
+    if window < 1 or not 0 < stride <= window:
+        raise ValueError('window must be positive and stride in [1, window].')
+    if length <= window:
+        return [(0, length)]
+    starts = list(range(0, length - window, stride)) + [length - window]
+    return [(start, start + window) for start in starts]
+
+
+def window_weights(length, windows):
+    '''
+    Computes the weights that stitch per-residue window representations into one per residue.
+
+    Inside a window, the weight of a residue grows linearly with its distance to the window edges that
+    cut the sequence (edges at the sequence ends do not count), so residues seen with little context
+    contribute least. The weights of each residue sum to one over the windows containing it.
+
+    Args:
+        length (int): Sequence length.
+        windows (list of tuple): (start, stop) windows covering the sequence.
+
+    Returns:
+        list of np.ndarray: Weights of the residues of each window.
+    '''
+    weights = []
+    total = np.zeros(length)
+    for start, stop in windows:
+        positions = np.arange(start, stop)
+        left = positions - start + 1 if start > 0 else np.full(len(positions), np.inf)
+        right = stop - positions if stop < length else np.full(len(positions), np.inf)
+        weight = np.minimum(np.minimum(left, right), stop - start).astype(np.float64)
+        weights.append(weight)
+        total[start:stop] += weight
+    return [weight / total[start:stop] for weight, (start, stop) in zip(weights, windows)]
+
+
+def windowed_embeddings(sequences, window, stride, residue_batches, dim, return_residues=False):
+    '''
+    Embeds sequences through overlapping windows and stitches the per-residue representations.
+
+    Every window of every sequence is run through `residue_batches`, which batches them like any other
+    short sequences, so the model never sees more than `window` residues at a time. Overlapping residues
+    are averaged with `window_weights`. The mean-pooled embedding is accumulated window by window,
+    which keeps the memory per sequence at O(D) unless the residues are returned.
+
+    Args:
+        sequences (list of str): Protein sequences.
+        window (int): Window length in residues.
+        stride (int): Distance between window starts.
+        residue_batches (callable): Maps a list of sequences to an iterable of (indices, list of (len, D)
+            per-residue arrays).
+        dim (int): Embedding dimension D.
+        return_residues (bool): Also return the stitched (L, D) representation of every sequence.
+
+    Returns:
+        np.ndarray or tuple: (N, D) float32 mean-pooled embeddings, and the list of per-residue arrays
+            if requested.
+    '''
+    tasks = []
+    for i, seq in enumerate(sequences):
+        windows = sliding_windows(len(seq), window, stride)
+        tasks.extend((i, start, stop, weight) for (start, stop), weight in zip(windows, window_weights(len(seq), windows)))
+
+    pooled = np.zeros((len(sequences), dim))
+    residues = [np.zeros((len(seq), dim), dtype=np.float32) for seq in sequences] if return_residues else None
+    for indices, representations in residue_batches([sequences[i][start:stop] for i, start, stop, _ in tasks]):
+        for task, representation in zip(indices, representations):
+            i, start, stop, weight = tasks[task]
+            weighted = weight[:, None] * representation
+            pooled[i] += weighted.sum(axis=0) / max(len(sequences[i]), 1)
+            if return_residues:
+                residues[i][start:stop] += weighted
+    pooled = pooled.astype(np.float32)
+    return (pooled, residues) if return_residues else pooled
+
+
+def pooled_embeddings(cache, model_id, layer, sequences, window, stride, compute, compute_windowed):
+    '''
+    Mean-pooled embeddings where only the sequences longer than `window` go through the windowed path.
+
+    Both paths are cached separately, the windowed one under a pooling key that includes the window
+    geometry.
+
+    Args:
+        cache (EmbeddingCache or None): Cache to look up.
+        model_id (str): Identifier of the model checkpoint.
+        layer (int): Representation layer.
+        sequences (list of str): Protein sequences.
+        window (int or None): Window length; None never uses windows.
+        stride (int): Distance between window starts.
+        compute (callable): Full-context embeddings of a list of sequences.
+        compute_windowed (callable): Windowed embeddings of a list of sequences.
+
+    Returns:
+        np.ndarray: (N, D) embeddings in the order of `sequences`.
+    '''
+    windowed = np.array([window is not None and len(seq) > window for seq in sequences], dtype=bool)
+    if not windowed.any():
+        return cached_embeddings(cache, model_id, layer, 'mean', sequences, compute)
+
+    long_embeddings = cached_embeddings(cache, model_id, layer, f'mean-window{window}-stride{stride}',
+                                       [seq for seq, flag in zip(sequences, windowed) if flag], compute_windowed)
+    embeddings = np.zeros((len(sequences), long_embeddings.shape[1]), dtype=np.float32)
+    embeddings[windowed] = long_embeddings
+    if not windowed.all():
+        embeddings[~windowed] = cached_embeddings(cache, model_id, layer, 'mean',
+                                                  [seq for seq, flag in zip(sequences, windowed) if not flag], compute)
+    return embeddings
+
+
+def compare_window_embeddings(embed, sequences, window, stride=None, **kwargs):
+    '''
+    Measures how far windowed embeddings drift from full-context embeddings.
+
+    Only the sequences longer than `window` are compared, since shorter ones are embedded identically;
+    they must still fit the model context so that the full-context reference can be computed.
+
+    Args:
+        embed (callable): Encoder method with `window` and `stride` arguments, e.g.
+            `encoder.calculate_esm1v_embeddings`.
+        sequences (list of str): Reference sequences.
+        window (int): Window length in residues.
+        stride (int, optional): Distance between window starts. Defaults to window // 2.
+        **kwargs: Passed to `embed`, e.g. max_tokens.
+
+    Returns:
+        dict: n_sequences compared, window, stride, mean and min cosine similarity, max absolute error
+            and the relative L2 error of the windowed embeddings.
+    '''
+    stride = stride or max(1, window // 2)
+    sequences = [seq for seq in sequences if len(seq) > window]
+    report = {'n_sequences': len(sequences), 'window': window, 'stride': stride}
+    if not sequences:
+        return report
+
+    full = embed(sequences, window=None, **kwargs).astype(np.float64)
+    windowed = embed(sequences, window=window, stride=stride, **kwargs).astype(np.float64)
+    cosine = (full * windowed).sum(axis=1) / (np.linalg.norm(full, axis=1) * np.linalg.norm(windowed, axis=1))
+    report.update({
+        'cosine_mean': float(cosine.mean()),
+        'cosine_min': float(cosine.min()),
+        'max_abs_error': float(np.abs(full - windowed).max()),
+        'relative_error': float(np.linalg.norm(full - windowed) / np.linalg.norm(full))
+    })
+    return report
+
+
+POOLINGS = ('mean', 'max', 'bos', 'mutated')
+
+
+class ExtractionSpec:
+    '''
+    The layers and poolings gathered from a single forward pass of a protein language model.
+
+    Every (layer, pooling) pair becomes its own (N, D) output named `layer{layer}_{pooling}`, so the
+    model cost is paid once per sequence whatever the number of outputs.
+
+    Parameters:
+        layers (iterable of int): Representation layers; 0 is the embedding layer and negative values
+            count from the last layer (-1 is the last one).
+        poolings (iterable of str): Poolings from `POOLINGS`:
+            'mean' and 'max' over the residues, 'bos' the BOS/CLS token, and 'mutated' the mean of the
+            residues at the positions mutated in the variant ID (e.g. 'A123G' or 'A12G:L57P').
+        offset (int): Position number of the first residue in the variant IDs.
+        separator (str): Separator between the single mutations of a multi-mutant.
+
+    Methods:
+        resolve_layers(num_layers): Maps the layers to non-negative layer numbers.
+        dataset_name(layer, pooling): Name of the output of a layer and pooling.
+        mutated_positions(sequences, variant_ids): 0-based mutated positions of each sequence.
+    '''
+
+    def __init__(self, layers=(-1,), poolings=('mean',), offset=1, separator=':'):
+        self.layers = [int(layer) for layer in layers]
+        self.poolings = list(dict.fromkeys(poolings))
+        unknown = [pooling for pooling in self.poolings if pooling not in POOLINGS]
+        if unknown or not self.layers or not self.poolings:
+            raise ValueError(f'An extraction needs at least one layer and poolings from {", ".join(POOLINGS)}, '
+                             f'got {unknown or self.poolings}.')
+        self.offset = offset
+        self.separator = separator
+
+    def resolve_layers(self, num_layers):
+        '''
+        Maps the requested layers to layer numbers between 0 and `num_layers`, without duplicates.
+
+        Raises:
+            ValueError: If a layer does not exist in the model.
+        '''
+        layers = []
+        for layer in self.layers:
+            resolved = layer + num_layers + 1 if layer < 0 else layer
+            if not 0 <= resolved <= num_layers:
+                raise ValueError(f'Layer {layer} does not exist in a model with {num_layers} layers.')
+            layers.append(resolved)
+        return list(dict.fromkeys(layers))
+
+    @staticmethod
+    def dataset_name(layer, pooling):
+        return f'layer{layer}_{pooling}'
+
+    def mutated_positions(self, sequences, variant_ids):
+        '''
+        Parses the mutated positions of each sequence from its variant ID.
+
+        Args:
+            sequences (list of str): Mutant sequences.
+            variant_ids (list or dict): Variant ID of each sequence, aligned with `sequences` or keyed by sequence.
+
+        Returns:
+            list of np.ndarray: 0-based mutated positions of each sequence.
+
+        Raises:
+            ValueError: If the IDs are missing, malformed, or a mutant residue does not match its sequence.
+        '''
+        if variant_ids is None:
+            raise ValueError("The 'mutated' pooling needs the variant ID of each sequence.")
+        if isinstance(variant_ids, dict):
+            variant_ids = [variant_ids[seq] for seq in sequences]
+        if len(variant_ids) != len(sequences):
+            raise ValueError(f'Got {len(variant_ids)} variant IDs for {len(sequences)} sequences.')
+
+        positions = []
+        for seq, variant_id in zip(sequences, variant_ids):
+            mutated = []
+            for wt, position, mut in parse_variant_id(variant_id, self.separator):
+                position -= self.offset
+                if not 0 <= position < len(seq) or seq[position] != mut:
+                    raise ValueError(f'Mutation {wt}{position + self.offset}{mut} of variant {variant_id!r} '
+                                     'does not match its sequence.')
+                mutated.append(position)
+            positions.append(np.unique(mutated))
+        return positions
+
+
+def pool_tokens(token_representations, residue_mask, pooling, mutated_mask=None):
+    '''
+    Pools token representations with one of the extraction poolings.
+
+    Args:
+        token_representations (torch.Tensor): (B, T, D) token representations.
+        residue_mask (torch.Tensor): (B, T) boolean mask of the residue tokens.
+        pooling (str): 'mean', 'max', 'bos' or 'mutated'.
+        mutated_mask (torch.Tensor, optional): (B, T) boolean mask of the mutated residues, for 'mutated'.
+
+    Returns:
+        torch.Tensor: (B, D) float32 pooled representations.
+    '''
+    if pooling == 'mean':
+        return masked_mean(token_representations, residue_mask)
+    if pooling == 'max':
+        return token_representations.float().masked_fill(~residue_mask.unsqueeze(-1), float('-inf')).amax(1)
+    if pooling == 'bos':
+        return token_representations[:, 0].float()
+    if pooling == 'mutated':
+        return masked_mean(token_representations, mutated_mask)
+    raise ValueError(f'Unknown pooling {pooling!r}. Choose from {", ".join(POOLINGS)}.')
+
+
+def _position_mask(positions, batch, width, token_offset):
+    import torch
+
+    mask = torch.zeros(len(batch), width, dtype=torch.bool)
+    for row, i in enumerate(batch):
+        mask[row, torch.as_tensor(positions[i] + token_offset, dtype=torch.long)] = True
+    return mask
+
+
 class Esm1v_Encoding:
+    '''
+    ESM-1v embeddings and variant-effect scores.
+
+    The pretrained checkpoint is only loaded when the model is first needed, and is shared by
+    every encoder of the same process and device (see `load_pretrained`). A `model` and
+    `alphabet` can be passed instead, e.g. a small randomly initialised one for testing; its
+    embeddings are only cached under an explicit `model_id`, so they never mix with the pretrained ones.
+
+    A `metrics` collector (see `instrumentation.Metrics`) receives the model loading time and the
+    token counts, tokenization and forward-pass times of every batch, and can profile some batches.
+    '''
+
+    PRETRAINED_MODEL_ID = 'esm1v_t33_650M_UR90S'
+    PRETRAINED_LAYERS = 33
+    PRETRAINED_CONTEXT = 1022
+
+    def __init__(self, device='cuda', model=None, alphabet=None, cache=None, model_id=None,
+                 precision='fp32', metrics=None):
+        if precision not in PRECISIONS:
+            raise ValueError(f'Unknown precision {precision!r}. Choose from {", ".join(PRECISIONS)}.')
+        if model is not None and cache is not None and model_id is None:
+            raise ValueError('A model_id is required to cache the embeddings of a custom model.')
+        self.requested_device = device
+        self.cache = cache
+        self.model_id = model_id if model_id is not None or model is not None else self.PRETRAINED_MODEL_ID
+        self.precision = precision
+        self.metrics = metrics if metrics is not None else _NO_METRICS
+        self._model, self._alphabet = model, alphabet
+        self.repr_layer = model.num_layers if model is not None else self.PRETRAINED_LAYERS
+        self._device = None
+        self._log_prob_cache = {}
+
+    def _load(self):
+        if self._device is None:
+            start = time.perf_counter()
+            self._device = resolve_device(self.requested_device)
+            if self._model is None:
+                self._model, self._alphabet = load_pretrained('esm1v', self.requested_device, self.precision)
+            else:
+                self._model = apply_precision(self._model.eval().to(self._device), self.precision)
+            self.metrics.add(model_load_s=time.perf_counter() - start)
+
+    @property
+    def device(self):
+        self._load()
+        return self._device
+
+    @property
+    def cache_model_id(self):
+        return self.model_id if self.precision == 'fp32' else f'{self.model_id}-{self.precision}'
+
+    @property
+    def model(self):
+        return self.esm_model
+
+    @property
+    def esm_model(self):
+        self._load()
+        return self._model
+
+    @property
+    def esm_alphabet(self):
+        self._load()
+        return self._alphabet
+
+    @property
+    def batch_converter(self):
+        return self.esm_alphabet.get_batch_converter()
+
+    @property
+    def special_tokens(self):
+        return [self.esm_alphabet.padding_idx, self.esm_alphabet.cls_idx, self.esm_alphabet.eos_idx]
+
+    @property
+    def amino_acid_tokens(self):
+        return [self.esm_alphabet.get_idx(aa) for aa in AMINO_ACIDS]
+
+    @property
+    def context_length(self):
+        # Learned positional embeddings cover max_positions tokens, BOS and EOS included. The context of
+        # the pretrained checkpoint is known without loading it, so fully cached runs never load the model.
+        if self._model is None:
+            return self.PRETRAINED_CONTEXT
+        return self._model.args.max_positions - int(self._alphabet.prepend_bos) - int(self._alphabet.append_eos)
+
+    def _window(self, window, stride):
+        # Explicit windows are capped at the context, which the model cannot exceed anyway.
+        window = self.context_length if window == 'auto' else window if window is None else min(window, self.context_length)
+        return window, (stride or max(1, window // 2)) if window is not None else None
+
+    def calculate_esm1v_embeddings(self, sequences, max_tokens=4096, max_batch_size=None, window='auto', stride=None):
+        '''
+        Computes mean-pooled ESM-1v embeddings with length-bucketed, padded batches.
+
+        Padding, BOS and EOS tokens are excluded from the mean. Sequences found in the encoder's
+        cache are not run through the model. Sequences longer than `window` are embedded through
+        overlapping windows whose per-residue representations are stitched before pooling
+        (see `windowed_embeddings`).
+
+        Args:
+            sequences (list of str): Protein sequences.
+            max_tokens (int): Maximum number of padded tokens per forward pass.
+            max_batch_size (int, optional): Maximum number of sequences per forward pass.
+            window (int, str or None): Window length in residues, at most the model context (1022
+                residues for ESM-1v). 'auto' uses the model context, None always embeds the full sequence.
+            stride (int, optional): Distance between window starts. Defaults to window // 2.
+
+        Returns:
+            np.ndarray: (N, D) embeddings in the order of `sequences`.
+        '''
+        sequences = list(sequences)
+        window, stride = self._window(window, stride)
+        return pooled_embeddings(
+            self.cache, self.cache_model_id, self.repr_layer, sequences, window, stride,
+            lambda missing: self._esm1v_embeddings(missing, max_tokens, max_batch_size),
+            lambda missing: windowed_embeddings(missing, window, stride,
+                                                lambda windows: self._esm1v_residue_batches(windows, max_tokens,
+                                                                                            max_batch_size),
+                                                self.esm_model.args.embed_dim))
+
+    def calculate_esm1v_residue_embeddings(self, sequence, window='auto', stride=None, max_tokens=4096):
+        '''
+        Computes the per-residue ESM-1v representations of one sequence, stitched from windows if needed.
+
+        Args:
+            sequence (str): Protein sequence.
+            window (int, str or None): Window length, as in `calculate_esm1v_embeddings`.
+            stride (int, optional): Distance between window starts. Defaults to window // 2.
+            max_tokens (int): Maximum number of padded tokens per forward pass.
+
+        Returns:
+            np.ndarray: (L, D) float32 representations.
+        '''
+        window, stride = self._window(window, stride)
+        window, stride = (len(sequence), len(sequence)) if window is None else (window, stride)
+        batches = lambda windows: self._esm1v_residue_batches(windows, max_tokens, None)
+        return windowed_embeddings([sequence], window, stride, batches, self.esm_model.args.embed_dim,
+                                   return_residues=True)[1][0]
+
+    def _esm1v_residue_batches(self, sequences, max_tokens, max_batch_size):
+        import torch
+
+        offset = int(self.esm_alphabet.prepend_bos)
+        lengths = [len(seq) + offset + int(self.esm_alphabet.append_eos) for seq in sequences]
+        for batch in length_batches(lengths, max_tokens, max_batch_size):
+            with self.metrics.batch('esm1v', [lengths[i] for i in batch]) as record:
+                batch_labels, batch_strs, batch_tokens = self.batch_converter([(f'seq{i}', sequences[i]) for i in batch])
+                record.tokenized()
+                with torch.no_grad(), precision_context(self.device, self.precision):
+                    results = self.esm_model(batch_tokens.to(self.device), repr_layers=[self.repr_layer],
+                                             return_contacts=False)
+                representations = results['representations'][self.repr_layer].float().cpu().numpy()
+            yield batch, [representations[row, offset:offset + len(sequences[i])] for row, i in enumerate(batch)]
+
+    def _esm1v_embeddings(self, sequences, max_tokens, max_batch_size):
+        import torch
+
+        special_tokens = int(self.esm_alphabet.prepend_bos) + int(self.esm_alphabet.append_eos)
+        lengths = [len(seq) + special_tokens for seq in sequences]
+        embeddings = np.zeros((len(sequences), self.esm_model.args.embed_dim), dtype=np.float32)
+
+        for batch in length_batches(lengths, max_tokens, max_batch_size):
+            with self.metrics.batch('esm1v', [lengths[i] for i in batch]) as record:
+                data = [(f'seq{i}', sequences[i]) for i in batch]
+                batch_labels, batch_strs, batch_tokens = self.batch_converter(data)
+                batch_tokens = batch_tokens.to(self.device)
+                record.tokenized()
+
+                with torch.no_grad(), precision_context(self.device, self.precision):
+                    results = self.esm_model(batch_tokens, repr_layers=[self.repr_layer], return_contacts=False)
+                    token_representations = results['representations'][self.repr_layer]
+                    residue_mask = ~torch.isin(batch_tokens, torch.tensor(self.special_tokens, device=self.device))
+                    embeddings[batch] = masked_mean(token_representations, residue_mask).float().cpu().numpy()
+        return embeddings
+
+    def extract_esm1v_features(self, sequences, spec, variant_ids=None, max_tokens=4096, max_batch_size=None):
+        '''
+        Extracts several layers and poolings of ESM-1v from one forward pass per batch.
+
+        Extracted features are not cached, and sequences must fit the model context.
+
+        Args:
+            sequences (list of str): Protein sequences.
+            spec (ExtractionSpec): Layers and poolings to extract.
+            variant_ids (list or dict, optional): Variant ID of each sequence, needed by the 'mutated' pooling.
+            max_tokens (int): Maximum number of padded tokens per forward pass.
+            max_batch_size (int, optional): Maximum number of sequences per forward pass.
+
+        Returns:
+            dict: Maps `spec.dataset_name(layer, pooling)` to (N, D) float32 features in the order of `sequences`.
+
+        Raises:
+            ValueError: If a sequence is longer than the model context, or a layer or variant ID is invalid.
+        '''
+        import torch
+
+        sequences = list(sequences)
+        layers = spec.resolve_layers(self.esm_model.num_layers)
+        too_long = [i for i, seq in enumerate(sequences) if len(seq) > self.context_length]
+        if too_long:
+            raise ValueError(f'Sequences {too_long[:10]} are longer than the {self.context_length}-residue context.')
+        positions = spec.mutated_positions(sequences, variant_ids) if 'mutated' in spec.poolings else None
+
+        offset = int(self.esm_alphabet.prepend_bos)
+        lengths = [len(seq) + offset + int(self.esm_alphabet.append_eos) for seq in sequences]
+        features = {spec.dataset_name(layer, pooling): np.zeros((len(sequences), self.esm_model.args.embed_dim),
+                                                                  dtype=np.float32)
+                    for layer in layers for pooling in spec.poolings}
 
-    def __init__(self, device='cuda'):
-        self.device = torch.device(device if torch.cuda.is_available() else 'cpu')
+        for batch in length_batches(lengths, max_tokens, max_batch_size):
+            with self.metrics.batch('esm1v', [lengths[i] for i in batch]) as record:
+                batch_labels, batch_strs, batch_tokens = self.batch_converter([(f'seq{i}', sequences[i]) for i in batch])
+                batch_tokens = batch_tokens.to(self.device)
+                residue_mask = ~torch.isin(batch_tokens, torch.tensor(self.special_tokens, device=self.device))
+                mutated_mask = (_position_mask(positions, batch, batch_tokens.shape[1], offset).to(self.device)
+                                if positions is not None else None)
+                record.tokenized()
 
-        self.esm_model, self.esm_alphabet = esm.pretrained.esm1v_t33_650M_UR90S()
-        self.esm_model = self.esm_model.to(self.device)
-        self.batch_converter = self.esm_alphabet.get_batch_converter()
+                with torch.no_grad(), precision_context(self.device, self.precision):
+                    results = self.esm_model(batch_tokens, repr_layers=layers, return_contacts=False)
+                    for layer in layers:
+                        for pooling in spec.poolings:
+                            pooled = pool_tokens(results['representations'][layer], residue_mask, pooling, mutated_mask)
+                            features[spec.dataset_name(layer, pooling)][batch] = pooled.float().cpu().numpy()
+        return features
+
+    def calculate_esm1v_library_embeddings(self, library, rows=None, max_tokens=4096):
+        '''
+        Computes mean-pooled ESM-1v embeddings of `MutantLibrary` rows from tokens built on the integer form.
+
+        Mutants of one wildtype share its length, so batches hold `max_tokens` tokens without padding
+        and the sequences are never materialized as strings. Library embeddings are not cached.
+
+        Args:
+            library (MutantLibrary): Library of mutants of one wildtype.
+            rows (array-like of int, optional): Library rows. Defaults to every row.
+            max_tokens (int): Maximum number of tokens per forward pass.
+
+        Returns:
+            np.ndarray: (n, D) embeddings in the order of `rows`.
+
+        Raises:
+            ValueError: If the wildtype is longer than the model context.
+        '''
+        import torch
+
+        if len(library.wildtype) > self.context_length:
+            raise ValueError(f'The wildtype is longer than the {self.context_length}-residue context.')
+        rows = np.arange(len(library)) if rows is None else np.asarray(rows, dtype=np.int64).reshape(-1)
+        alphabet = self.esm_alphabet
+        token_ids = [alphabet.get_idx(aa) for aa in library.alphabet]
+        prepend, append = [alphabet.cls_idx] * int(alphabet.prepend_bos), [alphabet.eos_idx] * int(alphabet.append_eos)
+        offset, length = len(prepend), len(library.wildtype)
+        batch_size = max(1, max_tokens // (len(prepend) + length + len(append)))
+
+        embeddings = np.zeros((len(rows), self.esm_model.args.embed_dim), dtype=np.float32)
+        for start in range(0, len(rows), batch_size):
+            tokens = torch.as_tensor(library.tokens(rows[start:start + batch_size], token_ids, prepend, append))
+            with torch.no_grad(), precision_context(self.device, self.precision):
+                results = self.esm_model(tokens.to(self.device), repr_layers=[self.repr_layer], return_contacts=False)
+                residues = results['representations'][self.repr_layer][:, offset:offset + length]
+                embeddings[start:start + batch_size] = residues.float().mean(1).cpu().numpy()
+        return embeddings
 
     def calculate_esm1v_embedding(self, sequence):
-        data = [(f'seq1', sequence)]
-        batch_labels, batch_strs, batch_tokens = self.batch_converter(data)
-        batch_tokens = batch_tokens.to(self.device)
-
-        with torch.no_grad():
-            results = self.esm_model(batch_tokens.to(self.device), repr_layers=[33], return_contacts=False)
-            token_representations = results['representations'][33]
-            sequence_embedding = token_representations.mean(1).cpu().numpy()
-        return sequence_embedding
+        return self.calculate_esm1v_embeddings([sequence])
+
+    def _amino_acid_log_probs(self, tokens, rows, token_positions):
+        import torch
+
+        with torch.no_grad(), precision_context(self.device, self.precision):
+            logits = self.esm_model(tokens.to(self.device))['logits']
+        log_probs = torch.log_softmax(logits.float(), dim=-1)[torch.as_tensor(rows), torch.as_tensor(token_positions)]
+        return log_probs[:, self.amino_acid_tokens].cpu().numpy()
+
+    def position_log_probabilities(self, wildtype, strategy='wt-marginal', positions=None, max_tokens=4096):
+        '''
+        Computes the per-position amino-acid log-probabilities of a wildtype sequence.
+
+        With 'wt-marginal' the unmasked wildtype is run once. With 'masked-marginal' each position is
+        masked in turn, one forward row per position; only the requested positions are computed and
+        the masked copies are batched under `max_tokens`. Results are cached per wildtype.
+
+        Args:
+            wildtype (str): Wildtype protein sequence.
+            strategy (str): 'wt-marginal' or 'masked-marginal'.
+            positions (iterable of int, optional): 0-based positions needed (masked-marginal only).
+                Defaults to every position.
+            max_tokens (int): Maximum number of padded tokens per forward pass.
+
+        Returns:
+            np.ndarray: (L, 20) log-probabilities over `AMINO_ACIDS`. Rows not computed yet in
+                masked-marginal mode are NaN.
+        '''
+        import torch
+
+        if strategy not in ('wt-marginal', 'masked-marginal'):
+            raise ValueError("strategy must be either 'wt-marginal' or 'masked-marginal'.")
+
+        key = (strategy, wildtype)
+        if key not in self._log_prob_cache:
+            self._log_prob_cache[key] = np.full((len(wildtype), len(AMINO_ACIDS)), np.nan, dtype=np.float32)
+        log_probs = self._log_prob_cache[key]
+
+        offset = int(self.esm_alphabet.prepend_bos)
+        batch_labels, batch_strs, wt_tokens = self.batch_converter([('wildtype', wildtype)])
+
+        if strategy == 'wt-marginal':
+            if np.isnan(log_probs).any():
+                log_probs[:] = self._amino_acid_log_probs(wt_tokens, np.zeros(len(wildtype), dtype=int),
+                                                          np.arange(len(wildtype)) + offset)
+            return log_probs
+
+        positions = np.arange(len(wildtype)) if positions is None else np.unique(np.asarray(positions, dtype=int))
+        missing = positions[np.isnan(log_probs[positions, 0])]
+        batch_size = max(1, max_tokens // wt_tokens.shape[1])
+        for start in range(0, len(missing), batch_size):
+            chunk = missing[start:start + batch_size]
+            tokens = wt_tokens.repeat(len(chunk), 1)
+            tokens[torch.arange(len(chunk)), torch.as_tensor(chunk + offset)] = self.esm_alphabet.mask_idx
+            log_probs[chunk] = self._amino_acid_log_probs(tokens, np.arange(len(chunk)), chunk + offset)
+        return log_probs
+
+    def score_variants(self, wildtype, variant_ids, strategy='wt-marginal', offset=1, max_tokens=4096):
+        '''
+        Scores variants of a wildtype by table lookup in its per-position log-probabilities.
+
+        The score of a variant is the sum over its mutations of log p(mutant) - log p(wildtype),
+        so a full saturation-mutagenesis library costs one forward pass ('wt-marginal') or at most
+        one masked row per mutated position ('masked-marginal').
+
+        Args:
+            wildtype (str): Wildtype protein sequence.
+            variant_ids (iterable of str): Variant IDs such as 'A123G' or 'A12G:L57P'.
+            strategy (str): 'wt-marginal' or 'masked-marginal'.
+            offset (int): Position number of the first residue of `wildtype` in the IDs.
+            max_tokens (int): Maximum number of padded tokens per forward pass.
+
+        Returns:
+            np.ndarray: One score per variant.
+
+        Raises:
+            ValueError: If a mutation is malformed, out of range, or its wildtype residue does not
+                match `wildtype`.
+        '''
+        variant_ids = list(variant_ids)
+        variant_idx, wt_idx, positions, mut_idx = parse_variant_ids(variant_ids, wildtype, offset).mutations()
+        positions = positions.astype(int) - offset
+        log_probs = self.position_log_probabilities(wildtype, strategy=strategy, positions=positions,
+                                                    max_tokens=max_tokens)
+        deltas = log_probs[positions, mut_idx] - log_probs[positions, wt_idx]
+        return np.bincount(np.asarray(variant_idx, dtype=int), weights=deltas, minlength=len(variant_ids))
     
     def generate_esm1v_embedding(self, sequence):
         esm1v_embedding = self.calculate_esm1v_embedding(sequence)
@@ -52,24 +1521,289 @@ class Esm1v_Encoding:
 
 
 class Prott5Encoding:
-    
-    def __init__(self, device='cuda'):
-        self.device = torch.device(device if torch.cuda.is_available() else 'cpu')
+    '''
+    ProtT5-XL embeddings.
 
-        self.t5_tokenizer = T5Tokenizer.from_pretrained('Rostlab/prot_t5_xl_uniref50')
-        self.t5_model = T5EncoderModel.from_pretrained('Rostlab/prot_t5_xl_uniref50')
-        self.t5_model = self.t5_model.to(self.device)
-    
-    def calculate_prott5_embedding(self, sequence):
-        inputs = self.t5_tokenizer(sequence, return_tensors='pt')
-        inputs = {key: val.to(self.device) for key, val in inputs.items()}
+    The pretrained checkpoint is only loaded when the model is first needed, and is shared by
+    every encoder of the same process and device (see `load_pretrained`). A `model` and
+    `tokenizer` can be passed instead, e.g. a small randomly initialised one for testing; its
+    embeddings are only cached under an explicit `model_id`, so they never mix with the pretrained ones.
+
+    A `metrics` collector (see `instrumentation.Metrics`) receives the model loading time and the
+    token counts, tokenization and forward-pass times of every batch, and can profile some batches.
+    '''
+
+    PRETRAINED_MODEL_ID = 'prot_t5_xl_uniref50'
+    PRETRAINED_LAYERS = 24
+
+    def __init__(self, device='cuda', model=None, tokenizer=None, cache=None, model_id=None,
+                 precision='fp32', metrics=None):
+        if precision not in PRECISIONS:
+            raise ValueError(f'Unknown precision {precision!r}. Choose from {", ".join(PRECISIONS)}.')
+        if model is not None and cache is not None and model_id is None:
+            raise ValueError('A model_id is required to cache the embeddings of a custom model.')
+        self.requested_device = device
+        self.cache = cache
+        self.model_id = model_id if model_id is not None or model is not None else self.PRETRAINED_MODEL_ID
+        self.precision = precision
+        self.metrics = metrics if metrics is not None else _NO_METRICS
+        self._model, self._tokenizer = model, tokenizer
+        self.repr_layer = model.config.num_layers if model is not None else self.PRETRAINED_LAYERS
+        self._device = None
+
+    def _load(self):
+        if self._device is None:
+            start = time.perf_counter()
+            self._device = resolve_device(self.requested_device)
+            if self._model is None:
+                self._model, self._tokenizer = load_pretrained('prott5', self.requested_device, self.precision)
+            else:
+                self._model = apply_precision(self._model.eval().to(self._device), self.precision)
+            self.metrics.add(model_load_s=time.perf_counter() - start)
+
+    @property
+    def device(self):
+        self._load()
+        return self._device
+
+    @property
+    def cache_model_id(self):
+        return self.model_id if self.precision == 'fp32' else f'{self.model_id}-{self.precision}'
+
+    @property
+    def model(self):
+        return self.t5_model
+
+    @property
+    def t5_model(self):
+        self._load()
+        return self._model
+
+    @property
+    def t5_tokenizer(self):
+        self._load()
+        return self._tokenizer
+
+    @staticmethod
+    def prepare_sequence(sequence):
+        # ProtT5 expects space-separated residues with the rare amino acids mapped to X.
+        return ' '.join(re.sub(r'[UZOB]', 'X', sequence))
+
+    def calculate_prott5_embeddings(self, sequences, max_tokens=4096, max_batch_size=None, window=None, stride=None):
+        '''
+        Computes mean-pooled ProtT5 embeddings with length-bucketed, padded batches.
+
+        Padding and the trailing </s> token are excluded from the mean through the attention
+        and special-tokens masks. Sequences found in the encoder's cache are not run through the model.
+        With a `window`, longer sequences are embedded through overlapping windows whose per-residue
+        representations are stitched before pooling, which bounds the quadratic attention cost
+        (see `windowed_embeddings`).
 
-        with torch.no_grad():
-            outputs = self.t5_model(**inputs)
+        Args:
+            sequences (list of str): Protein sequences.
+            max_tokens (int): Maximum number of padded tokens per forward pass.
+            max_batch_size (int, optional): Maximum number of sequences per forward pass.
+            window (int, optional): Window length in residues. None embeds the full sequence.
+            stride (int, optional): Distance between window starts. Defaults to window // 2.
 
-        sequence_embedding = outputs.last_hidden_state.mean(1).cpu().numpy()
-        return sequence_embedding
+        Returns:
+            np.ndarray: (N, D) embeddings in the order of `sequences`.
+        '''
+        sequences = list(sequences)
+        stride = (stride or max(1, window // 2)) if window is not None else None
+        return pooled_embeddings(
+            self.cache, self.cache_model_id, self.repr_layer, sequences, window, stride,
+            lambda missing: self._prott5_embeddings(missing, max_tokens, max_batch_size),
+            lambda missing: windowed_embeddings(missing, window, stride,
+                                                lambda windows: self._prott5_residue_batches(windows, max_tokens,
+                                                                                             max_batch_size),
+                                                self.t5_model.config.d_model))
+
+    def calculate_prott5_residue_embeddings(self, sequence, window=None, stride=None, max_tokens=4096):
+        '''
+        Computes the per-residue ProtT5 representations of one sequence, stitched from windows if needed.
+
+        Args:
+            sequence (str): Protein sequence.
+            window (int, optional): Window length in residues. None embeds the full sequence.
+            stride (int, optional): Distance between window starts. Defaults to window // 2.
+            max_tokens (int): Maximum number of padded tokens per forward pass.
+
+        Returns:
+            np.ndarray: (L, D) float32 representations.
+        '''
+        window = len(sequence) if window is None else window
+        stride = stride or max(1, window // 2)
+        batches = lambda windows: self._prott5_residue_batches(windows, max_tokens, None)
+        return windowed_embeddings([sequence], window, stride, batches, self.t5_model.config.d_model,
+                                   return_residues=True)[1][0]
+
+    def _prott5_residue_batches(self, sequences, max_tokens, max_batch_size):
+        import torch
+
+        lengths = [len(seq) + 1 for seq in sequences]
+        for batch in length_batches(lengths, max_tokens, max_batch_size):
+            with self.metrics.batch('prott5', [lengths[i] for i in batch]) as record:
+                inputs = self.t5_tokenizer([self.prepare_sequence(sequences[i]) for i in batch], padding='longest',
+                                           return_tensors='pt')
+                record.tokenized()
+                with torch.no_grad(), precision_context(self.device, self.precision):
+                    outputs = self.t5_model(input_ids=inputs['input_ids'].to(self.device),
+                                            attention_mask=inputs['attention_mask'].to(self.device))
+                representations = outputs.last_hidden_state.float().cpu().numpy()
+            yield batch, [representations[row, :len(sequences[i])] for row, i in enumerate(batch)]
+
+    def _prott5_embeddings(self, sequences, max_tokens, max_batch_size):
+        import torch
+
+        lengths = [len(seq) + 1 for seq in sequences]
+        embeddings = np.zeros((len(sequences), self.t5_model.config.d_model), dtype=np.float32)
+
+        for batch in length_batches(lengths, max_tokens, max_batch_size):
+            with self.metrics.batch('prott5', [lengths[i] for i in batch]) as record:
+                inputs = self.t5_tokenizer([self.prepare_sequence(sequences[i]) for i in batch], padding='longest',
+                                           return_special_tokens_mask=True, return_tensors='pt')
+                residue_mask = inputs['attention_mask'].bool() & ~inputs['special_tokens_mask'].bool()
+                record.tokenized()
+
+                with torch.no_grad(), precision_context(self.device, self.precision):
+                    outputs = self.t5_model(input_ids=inputs['input_ids'].to(self.device),
+                                            attention_mask=inputs['attention_mask'].to(self.device))
+
+                pooled = masked_mean(outputs.last_hidden_state, residue_mask.to(self.device))
+                embeddings[batch] = pooled.float().cpu().numpy()
+        return embeddings
+
+    def extract_prott5_features(self, sequences, spec, variant_ids=None, max_tokens=4096, max_batch_size=None):
+        '''
+        Extracts several layers and poolings of ProtT5 from one forward pass per batch.
+
+        Layer 0 is the embedding output and the last layer is `last_hidden_state`, the one pooled by
+        `calculate_prott5_embeddings`. Extracted features are not cached.
+
+        Args:
+            sequences (list of str): Protein sequences.
+            spec (ExtractionSpec): Layers and poolings to extract. ProtT5 has no BOS token, so 'bos' is not available.
+            variant_ids (list or dict, optional): Variant ID of each sequence, needed by the 'mutated' pooling.
+            max_tokens (int): Maximum number of padded tokens per forward pass.
+            max_batch_size (int, optional): Maximum number of sequences per forward pass.
+
+        Returns:
+            dict: Maps `spec.dataset_name(layer, pooling)` to (N, D) float32 features in the order of `sequences`.
+
+        Raises:
+            ValueError: If 'bos' is requested, or a layer or variant ID is invalid.
+        '''
+        import torch
+
+        if 'bos' in spec.poolings:
+            raise ValueError("ProtT5 has no BOS token, the 'bos' pooling is only available for ESM-1v.")
+        sequences = list(sequences)
+        layers = spec.resolve_layers(self.t5_model.config.num_layers)
+        positions = spec.mutated_positions(sequences, variant_ids) if 'mutated' in spec.poolings else None
+
+        lengths = [len(seq) + 1 for seq in sequences]
+        features = {spec.dataset_name(layer, pooling): np.zeros((len(sequences), self.t5_model.config.d_model),
+                                                                  dtype=np.float32)
+                    for layer in layers for pooling in spec.poolings}
+
+        for batch in length_batches(lengths, max_tokens, max_batch_size):
+            with self.metrics.batch('prott5', [lengths[i] for i in batch]) as record:
+                inputs = self.t5_tokenizer([self.prepare_sequence(sequences[i]) for i in batch], padding='longest',
+                                           return_special_tokens_mask=True, return_tensors='pt')
+                residue_mask = (inputs['attention_mask'].bool() & ~inputs['special_tokens_mask'].bool()).to(self.device)
+                mutated_mask = (_position_mask(positions, batch, residue_mask.shape[1], 0).to(self.device)
+                                if positions is not None else None)
+                record.tokenized()
+
+                with torch.no_grad(), precision_context(self.device, self.precision):
+                    outputs = self.t5_model(input_ids=inputs['input_ids'].to(self.device),
+                                            attention_mask=inputs['attention_mask'].to(self.device),
+                                            output_hidden_states=True)
+                    for layer in layers:
+                        for pooling in spec.poolings:
+                            pooled = pool_tokens(outputs.hidden_states[layer], residue_mask, pooling, mutated_mask)
+                            features[spec.dataset_name(layer, pooling)][batch] = pooled.float().cpu().numpy()
+        return features
+
+    def calculate_prott5_library_embeddings(self, library, rows=None, max_tokens=4096):
+        '''
+        Computes mean-pooled ProtT5 embeddings of `MutantLibrary` rows from tokens built on the integer form.
+
+        Mutants of one wildtype share its length, so batches hold `max_tokens` tokens without padding
+        and the sequences are never materialized as strings. Library embeddings are not cached.
+
+        Args:
+            library (MutantLibrary): Library of mutants of one wildtype.
+            rows (array-like of int, optional): Library rows. Defaults to every row.
+            max_tokens (int): Maximum number of tokens per forward pass.
+
+        Returns:
+            np.ndarray: (n, D) embeddings in the order of `rows`.
+        '''
+        import torch
+
+        rows = np.arange(len(library)) if rows is None else np.asarray(rows, dtype=np.int64).reshape(-1)
+        tokenizer = self.t5_tokenizer
+        # The vocabulary stores residues as SentencePiece pieces ('▁A', ...), so the IDs come from the tokenizer.
+        token_ids = tokenizer(self.prepare_sequence(library.alphabet), add_special_tokens=False).input_ids
+        if len(token_ids) != len(library.alphabet) or tokenizer.unk_token_id in token_ids:
+            raise ValueError(f'The tokenizer does not map the alphabet {library.alphabet!r} to one token per residue.')
+        length = len(library.wildtype)
+        batch_size = max(1, max_tokens // (length + 1))
+
+        embeddings = np.zeros((len(rows), self.t5_model.config.d_model), dtype=np.float32)
+        for start in range(0, len(rows), batch_size):
+            tokens = torch.as_tensor(library.tokens(rows[start:start + batch_size], token_ids,
+                                                    append=[tokenizer.eos_token_id]))
+            with torch.no_grad(), precision_context(self.device, self.precision):
+                outputs = self.t5_model(input_ids=tokens.to(self.device),
+                                        attention_mask=torch.ones_like(tokens).to(self.device))
+                embeddings[start:start + batch_size] = outputs.last_hidden_state[:, :length].float().mean(1).cpu().numpy()
+        return embeddings
+
+    def calculate_prott5_embedding(self, sequence):
+        return self.calculate_prott5_embeddings([sequence])
     
     def generate_prott5_embedding(self, sequence):
         prott5_embedding = self.calculate_prott5_embedding(sequence)
-        return prott5_embedding
\ No newline at end of file
+        return prott5_embedding
+
+
+ENCODERS = {
+    'one_hot': OneHotEncoding,
+    'ifeatpro': IfeatproEncoding,
+    'descriptors': DescriptorEncoding,
+    'esm1v': Esm1v_Encoding,
+    'prott5': Prott5Encoding
+}
+
+
+def register_encoder(name, encoder_class):
+    '''
+    Registers an encoder class under a feature-type name.
+
+    Args:
+        name (str): Feature-type name, e.g. 'esm1v'.
+        encoder_class (type): Encoder class, instantiated by `get_encoder`.
+    '''
+    ENCODERS[name] = encoder_class
+
+
+def get_encoder(name, *args, **kwargs):
+    '''
+    Builds a registered encoder by name. No model weights are loaded until they are first needed.
+
+    Args:
+        name (str): Feature-type name, e.g. 'one_hot', 'ifeatpro', 'esm1v' or 'prott5'.
+        *args, **kwargs: Passed to the encoder class.
+
+    Returns:
+        object: The encoder instance.
+
+    Raises:
+        ValueError: If no encoder is registered under `name`.
+    '''
+    if name not in ENCODERS:
+        raise ValueError(f'Unknown encoder {name!r}. Choose from {", ".join(ENCODERS)}.')
+    return ENCODERS[name](*args, **kwargs)
@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import time
+import numpy as np
+
+_worker = {}
+
+
+def length_balanced_shards(lengths, rows_per_shard=1024):
+    '''
+    Splits sequences into contiguous shards holding roughly the same number of residues.
+
+    The residue budget of a shard is `rows_per_shard` times the mean length, so shards of long
+    sequences hold fewer rows and every shard costs about the same model time. Shards stay
+    contiguous, which keeps the results in input order.
+
+    Args:
+        lengths (array-like of int): Length of each sequence.
+        rows_per_shard (int): Average number of sequences per shard.
+
+    Returns:
+        list of tuple: (start, stop) row ranges covering every sequence.
+    '''
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if len(lengths) == 0:
+        return []
+    n_shards = max(1, int(np.ceil(len(lengths) / rows_per_shard)))
+    cumulative = np.cumsum(lengths)
+    targets = cumulative[-1] * np.arange(1, n_shards) / n_shards
+    cuts = np.unique(np.searchsorted(cumulative, targets, side='left') + 1)
+    bounds = [0] + [int(cut) for cut in cuts if 0 < cut < len(lengths)] + [len(lengths)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _init_worker(counter, lock, n_workers, threads_per_worker, encoder_factory, method, method_kwargs):
+    import torch
+
+    with lock:
+        worker_id = counter.value
+        counter.value += 1
+
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    per_worker = max(1, len(cores) // n_workers)
+    start = (worker_id * per_worker) % len(cores)
+    worker_cores = cores[start:start + per_worker]
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, worker_cores)
+    torch.set_num_threads(threads_per_worker or len(worker_cores))
+
+    encoder = encoder_factory()
+    _worker.update(id=worker_id, cores=worker_cores, embed=getattr(encoder, method), method_kwargs=method_kwargs,
+                   cache=getattr(encoder, 'cache', None))
+
+
+def _embed_shard(task):
+    shard_idx, sequences = task
+    # Each worker looks up its own copy of the cache, so its counters are reported back per shard.
+    cache = _worker['cache']
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    start = time.perf_counter()
+    embeddings = _worker['embed'](sequences, **_worker['method_kwargs'])
+    elapsed = time.perf_counter() - start
+    if cache is not None:
+        hits, misses = cache.hits - hits, cache.misses - misses
+    return shard_idx, _worker['id'], embeddings, len(sequences), sum(len(seq) for seq in sequences), elapsed, hits, misses
+
+
+class ShardedEmbedder:
+    '''
+    Runs an encoder over shards of sequences in a pool of CPU worker processes.
+
+    Each worker loads the encoder once, is pinned to its own slice of the available cores and
+    uses an explicit number of torch threads. Shards are dispatched dynamically and their results
+    are yielded in submission order, so the output does not depend on scheduling.
+
+    Parameters:
+        encoder_factory (callable): Picklable callable building the encoder in each worker, e.g.
+            `functools.partial(Esm1v_Encoding, device='cpu')`.
+        method (str): Name of the encoder method mapping a list of sequences to an (n, D) array.
+        n_workers (int): Number of worker processes.
+        threads_per_worker (int, optional): Torch intra-op threads per worker. Defaults to the
+            number of cores pinned to the worker.
+        method_kwargs (dict, optional): Keyword arguments passed to `method`.
+        mp_context (str): Multiprocessing start method.
+
+    Methods:
+        imap(blocks): Embeds lists of sequences, yielding one array per list in order.
+        worker_stats(): Returns per-worker throughput.
+        cache_stats(): Returns the embedding cache hits and misses of all workers.
+    '''
+
+    def __init__(self, encoder_factory, method, n_workers, threads_per_worker=None, method_kwargs=None,
+                 mp_context='spawn'):
+        self.encoder_factory = encoder_factory
+        self.method = method
+        self.n_workers = n_workers
+        self.threads_per_worker = threads_per_worker
+        self.method_kwargs = method_kwargs or {}
+        self.mp_context = mp_context
+        self.stats = {}
+
+    def imap(self, blocks):
+        '''
+        Embeds blocks of sequences in the worker pool.
+
+        Args:
+            blocks (iterable of list of str): Shards of sequences.
+
+        Yields:
+            np.ndarray: (len(block), D) embeddings of each block, in the order of `blocks`.
+        '''
+        context = multiprocessing.get_context(self.mp_context)
+        counter = context.Value('i', 0)
+        lock = context.Lock()
+        init_args = (counter, lock, self.n_workers, self.threads_per_worker, self.encoder_factory, self.method,
+                     self.method_kwargs)
+
+        with context.Pool(self.n_workers, initializer=_init_worker, initargs=init_args) as pool:
+            tasks = ((shard_idx, list(block)) for shard_idx, block in enumerate(blocks))
+            for result in pool.imap(_embed_shard, tasks):
+                shard_idx, worker_id, embeddings, n_sequences, n_residues, elapsed, hits, misses = result
+                stats = self.stats.setdefault(worker_id, {'shards': 0, 'sequences': 0, 'residues': 0, 'seconds': 0.0,
+                                                          'cache_hits': 0, 'cache_misses': 0})
+                stats['shards'] += 1
+                stats['sequences'] += n_sequences
+                stats['residues'] += n_residues
+                stats['seconds'] += elapsed
+                stats['cache_hits'] += hits
+                stats['cache_misses'] += misses
+                yield embeddings
+
+    def worker_stats(self):
+        '''
+        Returns the throughput of each worker over the shards it processed.
+
+        Returns:
+            dict: Maps worker IDs to shards, sequences, residues, busy seconds, cache hits and misses,
+                sequences_per_s and residues_per_s.
+        '''
+        report = {}
+        for worker_id, stats in sorted(self.stats.items()):
+            seconds = stats['seconds'] or float('nan')
+            report[worker_id] = dict(stats, sequences_per_s=stats['sequences'] / seconds,
+                                     residues_per_s=stats['residues'] / seconds)
+        return report
+
+    def cache_stats(self):
+        '''
+        Returns the embedding cache lookups of all workers, named like the cache fields of a metrics stage.
+
+        Returns:
+            dict: cache_hits, cache_misses and cache_hit_rate (None without lookups).
+        '''
+        hits = sum(stats['cache_hits'] for stats in self.stats.values())
+        misses = sum(stats['cache_misses'] for stats in self.stats.values())
+        return {'cache_hits': hits, 'cache_misses': misses,
+                'cache_hit_rate': hits / (hits + misses) if hits + misses else None}
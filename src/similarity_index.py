@@ -0,0 +1,272 @@
+import time
+import numpy as np
+
+METRICS = ('cosine', 'l2')
+
+
+class SimilarityIndex:
+    '''
+    Nearest-neighbour search and diversity selection over a stored (N, D) embedding matrix.
+
+    The features are only read `block_rows` rows at a time, so they can be an in-memory array, a
+    memory-mapped `FeatureStore` representation or an h5py dataset of `esm1v.h5` / `prott5.h5`, and
+    memory stays bounded by the block size and the number of queries instead of N².
+
+    Exact search scores every block against the queries and merges the block's top-k into a running
+    top-k. The optional approximate mode is an inverted file (IVF): k-means centroids are fitted on a
+    sample of rows, every row is assigned to its nearest centroid, and a query only scores the rows
+    of its `n_probe` nearest lists.
+
+    Parameters:
+        features (array-like): (N, D) embeddings supporting `shape` and row slicing.
+        metric (str): 'cosine' (scores are cosine similarities, higher is closer) or 'l2' (scores
+            are Euclidean distances, lower is closer).
+        block_rows (int): Number of feature rows read and scored at a time.
+
+    Methods:
+        search(queries, k, n_probe): Top-k rows of each query, exact or approximate.
+        build_ivf(n_lists, sample_size, n_iter, seed): Fits the inverted file of the approximate mode.
+        compare_to_exact(queries, k, n_probe): Recall and timings of the approximate mode.
+        farthest_point_selection(n, seed_rows, seed_vectors, start): Greedy maximin (k-center) selection.
+    '''
+
+    def __init__(self, features, metric='cosine', block_rows=16384):
+        if metric not in METRICS:
+            raise ValueError(f'Unknown metric {metric!r}. Choose from {", ".join(METRICS)}.')
+        if len(features.shape) != 2:
+            raise ValueError(f'features must be an (N, D) matrix, got shape {features.shape}.')
+        self.features = features
+        self.metric = metric
+        self.block_rows = block_rows
+        self.centroids = None
+        self.list_offsets = None
+        self.list_rows = None
+
+    def __len__(self):
+        return self.features.shape[0]
+
+    def _prepare(self, vectors):
+        # Cosine works on unit vectors; L2 keeps the vectors and their squared norms.
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            return vectors / np.maximum(norms, np.finfo(np.float32).tiny), None
+        return vectors, np.einsum('ij,ij->i', vectors, vectors)
+
+    def _blocks(self):
+        for start in range(0, len(self), self.block_rows):
+            stop = min(start + self.block_rows, len(self))
+            yield start, self._prepare(self.features[start:stop])
+
+    def _scores(self, queries, block):
+        # Higher is closer: cosine similarities, or negative squared distances for L2.
+        (query_vectors, query_norms), (vectors, norms) = queries, block
+        products = query_vectors @ vectors.T
+        if self.metric == 'cosine':
+            return products
+        return -np.maximum(query_norms[:, None] + norms[None, :] - 2 * products, 0)
+
+    def _output(self, scores):
+        return scores if self.metric == 'cosine' else np.sqrt(-scores)
+
+    @staticmethod
+    def _merge_top_k(best_scores, best_rows, scores, rows, k):
+        scores = np.concatenate([best_scores, scores], axis=1)
+        rows = np.concatenate([best_rows, np.broadcast_to(rows, (len(scores), rows.shape[-1]))], axis=1)
+        if scores.shape[1] > k:
+            keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores, rows = np.take_along_axis(scores, keep, axis=1), np.take_along_axis(rows, keep, axis=1)
+        return scores, rows
+
+    @staticmethod
+    def _sorted(scores, rows):
+        order = np.lexsort((rows, -scores), axis=1)
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+    def search(self, queries, k=10, n_probe=None):
+        '''
+        Finds the k nearest rows of each query.
+
+        Args:
+            queries (array-like): (Q, D) query vectors, or a single (D,) vector.
+            k (int): Number of neighbours.
+            n_probe (int, optional): Number of inverted lists scanned per query. None runs the exact
+                blockwise search; otherwise `build_ivf` must have been called.
+
+        Returns:
+            tuple of np.ndarray: (Q, k) rows and (Q, k) scores, closest first. Scores are cosine
+                similarities or L2 distances; rows are -1 where fewer than k candidates were found.
+        '''
+        queries = np.atleast_2d(queries)
+        if n_probe is not None:
+            return self._search_ivf(queries, k, n_probe)
+
+        prepared = self._prepare(queries)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start, block in self._blocks():
+            scores = self._scores(prepared, block)
+            rows = np.arange(start, start + scores.shape[1])
+            best_scores, best_rows = self._merge_top_k(best_scores, best_rows, scores, rows[None, :], k)
+        return self._finish(best_scores, best_rows, k)
+
+    def _finish(self, scores, rows, k):
+        missing = k - scores.shape[1]
+        if missing > 0:
+            scores = np.pad(scores, ((0, 0), (0, missing)), constant_values=-np.inf)
+            rows = np.pad(rows, ((0, 0), (0, missing)), constant_values=-1)
+        scores, rows = self._sorted(scores, rows)
+        return rows, self._output(scores)
+
+    def _sample(self, sample_size, seed):
+        rows = np.sort(np.random.default_rng(seed).choice(len(self), size=min(sample_size, len(self)), replace=False))
+        # The sample is read block by block with contiguous slices, which h5py datasets also support.
+        blocks = []
+        for start in range(0, len(self), self.block_rows):
+            chunk = rows[(rows >= start) & (rows < start + self.block_rows)]
+            if len(chunk):
+                blocks.append(self.features[start:start + self.block_rows][chunk - start])
+        return self._prepare(np.concatenate(blocks))
+
+    def _nearest_centroid(self, prepared):
+        return np.argmax(self._scores(prepared, self._prepare(self.centroids)), axis=1)
+
+    def build_ivf(self, n_lists=None, sample_size=None, n_iter=20, seed=0):
+        '''
+        Fits the inverted file of the approximate search with k-means on a sample of rows.
+
+        Centroids are fitted with Lloyd iterations (spherical k-means for cosine), then every row is
+        assigned to its nearest centroid in one streamed pass over the features.
+
+        Args:
+            n_lists (int, optional): Number of inverted lists. Defaults to sqrt(N).
+            sample_size (int, optional): Number of rows used to fit the centroids. Defaults to 64 per list.
+            n_iter (int): Number of k-means iterations.
+            seed (int): Seed of the sample and of the initial centroids.
+
+        Returns:
+            np.ndarray: Number of rows in each list.
+        '''
+        n_lists = min(n_lists or max(1, int(np.sqrt(len(self)))), len(self))
+        sample, sample_norms = self._sample(sample_size or 64 * n_lists, seed)
+        rng = np.random.default_rng(seed)
+        self.centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignments = self._nearest_centroid((sample, sample_norms))
+            counts = np.bincount(assignments, minlength=n_lists)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignments, sample)
+            # Empty lists keep their previous centroid.
+            filled = counts > 0
+            self.centroids[filled] = sums[filled] / counts[filled, None]
+
+        assignments = np.concatenate([self._nearest_centroid(block) for start, block in self._blocks()])
+        self.list_rows = np.argsort(assignments, kind='stable')
+        self.list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=n_lists), out=self.list_offsets[1:])
+        return np.diff(self.list_offsets)
+
+    def _search_ivf(self, queries, k, n_probe):
+        if self.centroids is None:
+            raise ValueError('Call build_ivf before searching with n_probe.')
+        prepared = self._prepare(queries)
+        n_probe = min(n_probe, len(self.centroids))
+        centroid_scores = self._scores(prepared, self._prepare(self.centroids))
+        probed = np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+
+        # Each list is read once and scored against every query probing it.
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        for j in np.unique(probed):
+            asked = np.flatnonzero((probed == j).any(axis=1))
+            subset = (prepared[0][asked], None if prepared[1] is None else prepared[1][asked])
+            rows = self.list_rows[self.list_offsets[j]:self.list_offsets[j + 1]]
+            for start in range(0, len(rows), self.block_rows):
+                chunk = rows[start:start + self.block_rows]
+                scores = self._scores(subset, self._prepare(self.features[chunk]))
+                best_scores[asked], best_rows[asked] = self._merge_top_k(best_scores[asked], best_rows[asked], scores,
+                                                                         chunk[None, :], k)
+        return self._finish(best_scores, best_rows, k)
+
+    def compare_to_exact(self, queries, k=10, n_probe=8):
+        '''
+        Benchmarks the approximate search against the exact brute-force answer.
+
+        Args:
+            queries (array-like): (Q, D) query vectors.
+            k (int): Number of neighbours.
+            n_probe (int): Number of inverted lists scanned per query.
+
+        Returns:
+            dict: recall (fraction of the exact top-k rows found), exact_seconds, approximate_seconds and speedup.
+        '''
+        start = time.perf_counter()
+        exact_rows, exact_scores = self.search(queries, k)
+        exact_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        approximate_rows, approximate_scores = self.search(queries, k, n_probe=n_probe)
+        approximate_seconds = time.perf_counter() - start
+        found = sum(len(np.intersect1d(exact, approximate)) for exact, approximate in zip(exact_rows, approximate_rows))
+        return {
+            'n_queries': len(exact_rows),
+            'k': k,
+            'n_probe': n_probe,
+            'recall': found / exact_rows.size,
+            'exact_seconds': exact_seconds,
+            'approximate_seconds': approximate_seconds,
+            'speedup': exact_seconds / approximate_seconds if approximate_seconds else float('inf')
+        }
+
+    def _distances(self, prepared, block):
+        scores = self._scores(prepared, block)
+        return 1 - scores if self.metric == 'cosine' else np.sqrt(-scores)
+
+    def farthest_point_selection(self, n, seed_rows=None, seed_vectors=None, start=0):
+        '''
+        Greedily selects rows that are as far as possible from each other and from the seeds (k-center).
+
+        Each step picks the row farthest from everything selected so far, then streams over the
+        features once to update the distance of every row to its nearest selected point, so memory
+        is one float per row plus one block. Seeds, e.g. the measured variants, are never selected.
+
+        Args:
+            n (int): Number of rows to select.
+            seed_rows (array-like of int, optional): Rows already covered.
+            seed_vectors (array-like, optional): (S, D) covered points that are not rows of the features.
+            start (int): First row selected when there are no seeds.
+
+        Returns:
+            tuple of np.ndarray: Selected rows, and the distance of each of them to the points selected
+                before it (the covering radius of the previous selection, non-increasing).
+                Distances are 1 - cosine similarity or L2 distances.
+        '''
+        nearest = np.full(len(self), np.inf, dtype=np.float32)
+        seeds = []
+        if seed_rows is not None and len(seed_rows):
+            rows = np.unique(np.asarray(seed_rows, dtype=np.int64))
+            seeds.append(np.asarray(self.features[rows], dtype=np.float32))
+        if seed_vectors is not None and len(seed_vectors):
+            seeds.append(np.atleast_2d(np.asarray(seed_vectors, dtype=np.float32)))
+
+        if seeds:
+            prepared = self._prepare(np.concatenate(seeds))
+            for block_start, block in self._blocks():
+                distances = self._distances(block, prepared).min(axis=1)
+                nearest[block_start:block_start + len(distances)] = distances
+            if seed_rows is not None and len(seed_rows):
+                nearest[rows] = -np.inf
+
+        selected, radii = [], []
+        for _ in range(min(n, len(self))):
+            row = int(np.argmax(nearest)) if seeds or selected else start
+            if nearest[row] == -np.inf:
+                break
+            selected.append(row)
+            radii.append(float(nearest[row]))
+            nearest[row] = -np.inf
+            center = self._prepare(np.asarray(self.features[row:row + 1], dtype=np.float32))
+            for block_start, block in self._blocks():
+                distances = self._distances(center, block)[0]
+                window = nearest[block_start:block_start + len(distances)]
+                np.minimum(window, distances, out=window)
+        return np.array(selected, dtype=np.int64), np.array(radii)
@@ -0,0 +1,250 @@
+import numpy as np
+import pandas as pd
+
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+PAD_RESIDUE = 255
+GROUPINGS = ('position', 'wildtype', 'mutant', 'mutation', 'order')
+
+
+class ParsedVariants:
+    '''
+    Variant IDs such as 'A123G' or 'A12G:L57P' parsed into integer arrays.
+
+    Row i holds the mutations of the i-th ID in the order they are written, padded up to the
+    highest order with position -1 and residue `PAD_RESIDUE`.
+
+    Attributes:
+        wildtype (np.ndarray): (N, k) uint8 indices into `alphabet` of the wildtype residues.
+        position (np.ndarray): (N, k) int16 positions, numbered as in the IDs.
+        mutant (np.ndarray): (N, k) uint8 indices into `alphabet` of the mutant residues.
+        order (np.ndarray): (N,) uint8 number of mutations of each ID.
+        alphabet (str): Residue alphabet of the indices.
+
+    Methods:
+        mutations(): Flat (row, wildtype, position, mutant) arrays, one entry per mutation.
+        index(): Builds a VariantIndex over the variants.
+    '''
+
+    def __init__(self, wildtype, position, mutant, order, alphabet=AMINO_ACIDS):
+        self.wildtype = wildtype
+        self.position = position
+        self.mutant = mutant
+        self.order = order
+        self.alphabet = alphabet
+
+    def __len__(self):
+        return len(self.order)
+
+    def mutations(self):
+        rows, slots = np.nonzero(self.position >= 0)
+        return rows, self.wildtype[rows, slots], self.position[rows, slots], self.mutant[rows, slots]
+
+    def index(self):
+        return VariantIndex(self)
+
+
+def parse_variant_ids(variant_ids, wildtype=None, offset=1, separator=':', alphabet=AMINO_ACIDS):
+    '''
+    Parses a column of variant IDs into integer arrays without a Python loop over the rows.
+
+    Each distinct ID is parsed once, so categorical or repetitive ID columns (several replicates
+    or measurements per variant) cost as much as their distinct values.
+
+    Args:
+        variant_ids (array-like of str): IDs in the format produced by `ProteinVariantGenerator`,
+            multi-mutants joined by `separator`.
+        wildtype (str, optional): Wildtype sequence the wildtype residues are checked against.
+        offset (int): Position number of the first residue of `wildtype` in the IDs.
+        separator (str): Separator between the single mutations of a multi-mutant.
+        alphabet (str): Residue alphabet of the indices, at most 255 residues.
+
+    Returns:
+        ParsedVariants: The parsed variants, in the order of `variant_ids`.
+
+    Raises:
+        ValueError: If an ID is missing or malformed, a residue is not in `alphabet`, a position does
+            not fit int16, or a mutation does not match `wildtype`.
+    '''
+    codes, uniques = pd.factorize(pd.Series(variant_ids, copy=False))
+    if (codes < 0).any():
+        raise ValueError(f'Missing variant IDs at rows {np.flatnonzero(codes < 0)[:10].tolist()}.')
+
+    if len(uniques) == 0:
+        empty = np.empty((0, 0), dtype=np.uint8)
+        return ParsedVariants(empty, empty.astype(np.int16), empty, np.empty(0, dtype=np.uint8), alphabet)
+
+    # The distinct IDs are parsed together as one byte buffer: IDs end with a newline and their
+    # mutations with a unit separator, so each mutation is the byte range between two boundaries.
+    uniques = pd.Index(uniques).astype(str)
+    text = '\n'.join(uniques).replace(separator, '\x1f').replace(' ', '') + '\n'
+    try:
+        buffer = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    except UnicodeEncodeError:
+        raise ValueError('Variant IDs must be ASCII strings.') from None
+    boundaries = np.flatnonzero((buffer == ord('\n')) | (buffer == 0x1f))
+    starts = np.concatenate([[0], boundaries[:-1] + 1])
+    owners = np.concatenate([[0], np.cumsum(buffer[boundaries[:-1]] == ord('\n'))])
+
+    # Bytes strictly between the wildtype and the mutant letter must be 1 to 5 digits.
+    token = np.cumsum(np.concatenate([[0], (buffer[:-1] == ord('\n')) | (buffer[:-1] == 0x1f)]))
+    inner = (np.arange(len(buffer)) > starts[token]) & (np.arange(len(buffer)) < boundaries[token] - 1)
+    digits = buffer.astype(np.int64) - ord('0')
+    is_digit = (digits >= 0) & (digits <= 9)
+    n_inner = boundaries - starts - 2
+    is_letter = lambda values: (values >= ord('A')) & (values <= ord('Z'))
+    valid = ((n_inner >= 1) & (n_inner <= 5) & is_letter(buffer[starts]) & is_letter(buffer[boundaries - 1])
+             & (np.bincount(token[inner & ~is_digit], minlength=len(starts)) == 0))
+    if not valid.all():
+        listing = ', '.join(repr(uniques[i]) for i in np.unique(owners[~valid])[:10])
+        raise ValueError(f'Invalid variant IDs, expected the X123Y format: {listing}.')
+
+    lookup = np.full(256, PAD_RESIDUE, dtype=np.uint8)
+    lookup[np.frombuffer(alphabet.encode('ascii'), dtype=np.uint8)] = np.arange(len(alphabet))
+    wt = lookup[buffer[starts]]
+    mut = lookup[buffer[boundaries - 1]]
+    place_values = 10.0 ** (boundaries[token] - 2 - np.arange(len(buffer)))
+    positions = np.bincount(token[inner], weights=(digits * place_values)[inner], minlength=len(starts)).astype(np.int64)
+
+    unknown = (wt == PAD_RESIDUE) | (mut == PAD_RESIDUE)
+    if unknown.any():
+        raise ValueError(f'Residues outside the alphabet in variant IDs: {sorted(set(uniques[owners[unknown]]))[:10]}.')
+    if positions.max(initial=0) > np.iinfo(np.int16).max:
+        raise ValueError(f'Positions are limited to {np.iinfo(np.int16).max}.')
+    if wildtype is not None:
+        expected = np.frombuffer(wildtype.encode('ascii'), dtype=np.uint8)
+        in_range = (positions >= offset) & (positions < len(wildtype) + offset)
+        matches = in_range.copy()
+        matches[in_range] = lookup[expected[positions[in_range] - offset]] == wt[in_range]
+        if not matches.all():
+            raise ValueError(f'Wildtype residue does not match the wildtype sequence in variant IDs: {sorted(set(uniques[owners[~matches]]))[:10]}.')
+
+    # The mutations of an ID are contiguous, so the slot of a mutation is its rank in the ID.
+    order = np.bincount(owners, minlength=len(uniques))
+    slots = np.arange(len(owners)) - np.repeat(np.cumsum(order) - order, order)
+    width = int(order.max(initial=0))
+    unique_wt = np.full((len(uniques), width), PAD_RESIDUE, dtype=np.uint8)
+    unique_position = np.full((len(uniques), width), -1, dtype=np.int16)
+    unique_mut = np.full((len(uniques), width), PAD_RESIDUE, dtype=np.uint8)
+    unique_wt[owners, slots] = wt
+    unique_position[owners, slots] = positions
+    unique_mut[owners, slots] = mut
+    return ParsedVariants(unique_wt[codes], unique_position[codes], unique_mut[codes], order.astype(np.uint8)[codes],
+                          alphabet)
+
+
+class VariantIndex:
+    '''
+    Index from positions and residues to the rows of a variant table, for O(1) group lookups.
+
+    Every grouping is stored like a CSR matrix: the rows sorted by group key and an offsets array
+    over the whole key space, so the rows of a group are the slice `rows[offsets[key]:offsets[key + 1]]`
+    and no lookup scans the table. A multi-mutant belongs to every group of its mutations, once per
+    group. Groupings are built on first use.
+
+    - 'position': position number, as in the IDs.
+    - 'wildtype' / 'mutant': wildtype or mutant residue.
+    - 'mutation': (position, mutant residue) pair.
+    - 'order': number of mutations.
+
+    Parameters:
+        variants (ParsedVariants): Parsed variant IDs of the table rows.
+
+    Methods:
+        rows(by, key): Row numbers of one group.
+        at_position(position): Rows mutating a position.
+        to_residue(residue) / from_residue(residue): Rows with a mutation to / from a residue.
+        with_mutation(position, residue): Rows with a given substitution.
+        groups(by): (labels, offsets, rows) arrays of every non-empty group, for grouped statistics.
+    '''
+
+    def __init__(self, variants):
+        self.variants = variants
+        self.alphabet = variants.alphabet
+        self._groupings = {}
+
+    def _keys(self, by):
+        rows, wildtype, position, mutant = self.variants.mutations()
+        n_residues = len(self.alphabet)
+        n_positions = int(position.max(initial=-1)) + 1
+        if by == 'position':
+            return rows, position.astype(np.int64), n_positions
+        if by == 'wildtype':
+            return rows, wildtype.astype(np.int64), n_residues
+        if by == 'mutant':
+            return rows, mutant.astype(np.int64), n_residues
+        if by == 'mutation':
+            return rows, position.astype(np.int64) * n_residues + mutant, n_positions * n_residues
+        if by == 'order':
+            order = self.variants.order.astype(np.int64)
+            return np.arange(len(order)), order, int(order.max(initial=0)) + 1
+        raise ValueError(f'Unknown grouping {by!r}. Choose from {", ".join(GROUPINGS)}.')
+
+    def _grouping(self, by):
+        if by not in self._groupings:
+            rows, keys, n_keys = self._keys(by)
+            # Sorting (key, row) pairs also drops a row repeated within a group, e.g. A1P:G5P for 'mutant'.
+            pairs = np.unique(keys * len(self.variants) + rows)
+            keys, rows = np.divmod(pairs, len(self.variants)) if len(self.variants) else (pairs, pairs)
+            offsets = np.zeros(n_keys + 1, dtype=np.int64)
+            np.cumsum(np.bincount(keys, minlength=n_keys), out=offsets[1:])
+            self._groupings[by] = (offsets, rows)
+        return self._groupings[by]
+
+    def rows(self, by, key):
+        '''
+        Returns the rows of one group.
+
+        Args:
+            by (str): Grouping, from GROUPINGS.
+            key (int): Group key: position number, residue index, position * len(alphabet) + residue
+                index or order.
+
+        Returns:
+            np.ndarray: Sorted row numbers, empty for a key outside the index.
+        '''
+        offsets, rows = self._grouping(by)
+        if not 0 <= key < len(offsets) - 1:
+            return rows[:0]
+        return rows[offsets[key]:offsets[key + 1]]
+
+    def _residue(self, residue):
+        if residue not in self.alphabet:
+            raise ValueError(f'Residue {residue!r} is not in the alphabet.')
+        return self.alphabet.index(residue)
+
+    def at_position(self, position):
+        return self.rows('position', position)
+
+    def to_residue(self, residue):
+        return self.rows('mutant', self._residue(residue))
+
+    def from_residue(self, residue):
+        return self.rows('wildtype', self._residue(residue))
+
+    def with_mutation(self, position, residue):
+        return self.rows('mutation', position * len(self.alphabet) + self._residue(residue))
+
+    def groups(self, by='position'):
+        '''
+        Returns every non-empty group as CSR arrays, the form consumed by the grouped statistics of
+        `data_processing` (`OutlierEngine.score_groups`, `MeanAndStd.group_mean_and_std`).
+
+        Args:
+            by (str): Grouping, from GROUPINGS.
+
+        Returns:
+            tuple: (labels, offsets, rows). The rows of group g are rows[offsets[g]:offsets[g + 1]];
+                labels are position numbers or orders (int), residues or mutations such as '57P'
+                (str).
+        '''
+        offsets, rows = self._grouping(by)
+        keys = np.flatnonzero(np.diff(offsets))
+        compact = np.concatenate([offsets[keys], offsets[-1:]])
+        if by in ('position', 'order'):
+            labels = keys
+        elif by in ('wildtype', 'mutant'):
+            labels = np.array([self.alphabet[key] for key in keys], dtype=object)
+        else:
+            n_residues = len(self.alphabet)
+            labels = np.array([f'{key // n_residues}{self.alphabet[key % n_residues]}' for key in keys], dtype=object)
+        return labels, compact, rows